@@ -0,0 +1,347 @@
+import collections
+import glob
+import json
+import os
+import platform
+import shlex
+import shutil
+import threading
+
+import fuzzy
+from intents import TOKEN_PATTERN
+from launcher import FAILED, Launcher
+from lazy import Lazy, LazyModule
+from tts import CACHE_ROOT
+
+webbrowser = LazyModule('webbrowser')  # Loads the browser registry, so defer it
+
+# Get system information
+SYSTEM = platform.system().lower()
+
+# Where Linux desktop environments keep their .desktop launchers
+DESKTOP_DIRS = [
+    '/usr/share/applications',
+    '/usr/local/share/applications',
+    '/var/lib/flatpak/exports/share/applications',
+    '/var/lib/snapd/desktop/applications',
+    os.path.expanduser('~/.local/share/applications'),
+]
+
+MAC_APP_DIRS = ['/Applications', '/System/Applications', '/System/Applications/Utilities',
+                os.path.expanduser('~/Applications')]
+
+# Parsed .desktop files, reused until one of DESKTOP_DIRS changes
+DESKTOP_CACHE = os.path.join(CACHE_ROOT, 'desktop_entries.json')
+
+# User-defined extra names: {"alias": "application name", ...}
+ALIASES_PATH = os.path.join(os.environ.get('XDG_CONFIG_HOME', os.path.expanduser('~/.config')),
+                            'ai_agents', 'app_aliases.json')
+
+# Lowest fuzzy score find_app() accepts for a misheard name
+FUZZY_CUTOFF = 0.75
+
+# App name -> times asked for (main shares the session log's counts); breaks near-ties between matches
+usage = collections.Counter()
+USAGE_WEIGHT = 0.05
+
+
+class AppEntry:
+    """One launchable application and how to start it on this system"""
+
+    def __init__(self, name, kind, target, aliases=()):
+        self.name = name
+        self.kind = kind  # 'url', 'exec', 'mac', 'uri' or 'browser'
+        self.target = target
+        self.aliases = list(aliases)
+        self.command = None  # Fully resolved command line, filled in by resolve()
+
+    @property
+    def available(self):
+        return self.kind in ('url', 'uri', 'browser') or self.command is not None
+
+    def __repr__(self):
+        return f"AppEntry({self.name!r}, {self.kind!r}, available={self.available})"
+
+
+def url(name, address, aliases=()):
+    return AppEntry(name, 'url', address, aliases)
+
+def exe(name, program, aliases=()):
+    return AppEntry(name, 'exec', program, aliases)
+
+def mac(name, bundle, aliases=()):
+    return AppEntry(name, 'mac', bundle, aliases)
+
+
+def build_launch_table(system):
+    """Declarative application table for the given platform"""
+    common = [
+        url('youtube', 'https://www.youtube.com'),
+        url('gmail', 'https://mail.google.com', aliases=['email', 'mail']),
+    ]
+    if system == "windows":
+        return common + [
+            AppEntry('whatsapp', 'uri', 'whatsapp:'),
+            exe('calculator', 'calc.exe', aliases=['calc']),
+            exe('chrome', 'chrome.exe', aliases=['google chrome']),
+            exe('notepad', 'notepad.exe', aliases=['note pad']),
+            exe('file explorer', 'explorer.exe', aliases=['explorer', 'files']),
+            exe('control panel', 'control.exe'),
+            exe('paint', 'mspaint.exe', aliases=['ms paint']),
+            exe('word', 'winword.exe', aliases=['microsoft word']),
+            exe('excel', 'excel.exe', aliases=['microsoft excel']),
+            exe('powerpoint', 'powerpnt.exe', aliases=['power point']),
+            exe('spotify', 'spotify.exe'),
+            exe('discord', 'discord.exe'),
+            exe('steam', 'steam.exe'),
+            exe('vlc', 'vlc.exe', aliases=['vlc media player']),
+            AppEntry('firefox', 'browser', 'firefox', aliases=['mozilla firefox']),
+            exe('edge', 'msedge.exe', aliases=['microsoft edge']),
+        ]
+    elif system == "darwin":  # macOS
+        return common + [
+            mac('whatsapp', 'WhatsApp'),
+            mac('calculator', 'Calculator', aliases=['calc']),
+            mac('safari', 'Safari'),
+            mac('chrome', 'Google Chrome', aliases=['google chrome']),
+            mac('finder', 'Finder', aliases=['files']),
+            mac('textedit', 'TextEdit', aliases=['text edit', 'text editor']),
+            mac('spotify', 'Spotify'),
+            mac('discord', 'Discord'),
+            mac('vlc', 'VLC', aliases=['vlc media player']),
+        ]
+    else:  # Linux
+        return common + [
+            exe('whatsapp', 'whatsapp-desktop'),
+            exe('calculator', 'gnome-calculator', aliases=['calc']),
+            exe('firefox', 'firefox', aliases=['mozilla firefox']),
+            exe('chrome', 'google-chrome', aliases=['google chrome']),
+            exe('file manager', 'nautilus', aliases=['files', 'file explorer']),
+            exe('terminal', 'gnome-terminal', aliases=['console']),
+            exe('text editor', 'gedit', aliases=['editor']),
+            exe('spotify', 'spotify'),
+            exe('discord', 'discord'),
+            exe('vlc', 'vlc', aliases=['vlc media player']),
+        ]
+
+
+def parse_desktop_file(path):
+    """Read the Name and Exec keys of a .desktop file's main section"""
+    name = command = None
+    in_entry = False
+    try:
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('['):
+                    in_entry = line == '[Desktop Entry]'
+                elif in_entry and line.startswith('Name=') and name is None:
+                    name = line[5:]
+                elif in_entry and line.startswith('Exec=') and command is None:
+                    command = line[5:]
+    except OSError:
+        return None
+    if not command:
+        return None
+    # Drop field codes such as %U and %f that the launcher would substitute
+    args = [arg for arg in shlex.split(command) if not arg.startswith('%')]
+    return name, args
+
+
+def scan_desktop_entries(dirs=DESKTOP_DIRS):
+    """(Name, file stem, Exec command line) of every installed .desktop launcher"""
+    entries = []
+    for directory in dirs:
+        for path in sorted(glob.glob(os.path.join(directory, '*.desktop'))):
+            parsed = parse_desktop_file(path)
+            if parsed is None or not parsed[1]:
+                continue
+            name, args = parsed
+            stem = os.path.basename(path)[:-len('.desktop')]
+            entries.append((name or stem, stem, args))
+    return entries
+
+
+def _directory_stamps(dirs):
+    return {directory: os.stat(directory).st_mtime_ns for directory in dirs if os.path.isdir(directory)}
+
+
+def load_desktop_entries(dirs=DESKTOP_DIRS, path=DESKTOP_CACHE):
+    """scan_desktop_entries(), served from disk while no launcher directory has changed
+
+    Installing or removing an application touches its directory's mtime,
+    which invalidates the cache.
+    """
+    stamps = _directory_stamps(dirs)
+    try:
+        with open(path, encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached['stamps'] == stamps:
+            return [tuple(entry) for entry in cached['entries']]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    entries = scan_desktop_entries(dirs)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.tmp"
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump({'stamps': stamps, 'entries': entries}, f)
+        os.replace(partial, path)
+    except OSError:
+        pass  # A read-only cache directory only costs a rescan next time
+    return entries
+
+
+def load_aliases(path=ALIASES_PATH):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return {str(alias): str(target) for alias, target in json.load(f).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def find_mac_app(bundle):
+    for directory in MAC_APP_DIRS:
+        if os.path.isdir(os.path.join(directory, f"{bundle}.app")):
+            return True
+    return False
+
+
+def resolve(table, system, installed=()):
+    """Resolve every executable once so launches never search PATH again"""
+    # .desktop launchers by file stem and by executable name
+    launchers = {}
+    for _, stem, args in installed:
+        launchers.setdefault(stem.lower(), args)
+        launchers.setdefault(os.path.basename(args[0]).lower(), args)
+    for entry in table:
+        if entry.kind == 'exec':
+            path = shutil.which(entry.target)
+            if path:
+                entry.command = [path]
+            elif system == 'linux':
+                args = launchers.get(entry.target.lower())
+                if args:
+                    entry.command = args
+        elif entry.kind == 'mac' and find_mac_app(entry.target):
+            entry.command = ['open', '-a', entry.target]
+    return table
+
+
+def installed_apps(installed, table):
+    """Entries for installed launchers the declarative table doesn't already cover"""
+    known = {os.path.basename(entry.command[0]) for entry in table if entry.command}
+    extra = []
+    for name, _, args in installed:
+        if os.path.basename(args[0]) in known:
+            continue
+        known.add(os.path.basename(args[0]))
+        entry = AppEntry(name.lower(), 'exec', args[0],
+                         aliases=[os.path.basename(args[0]).replace('-', ' ').replace('_', ' ')])
+        entry.command = args
+        extra.append(entry)
+    return extra
+
+
+def normalize_name(name):
+    return ' '.join(TOKEN_PATTERN.findall(name.lower()))
+
+
+class LaunchTable:
+    """Resolved entries plus exact and fuzzy name/alias lookup indexes"""
+
+    def __init__(self, entries, aliases=None):
+        self.entries = entries
+        self.index = {}
+        for entry in entries:
+            for key in [entry.name] + entry.aliases:
+                self.index.setdefault(normalize_name(key), entry)
+        for alias, target in (aliases or {}).items():
+            entry = self.index.get(normalize_name(target))
+            if entry is not None:
+                self.index.setdefault(normalize_name(alias), entry)
+        self.index.pop('', None)
+        self.keys = sorted(self.index, key=len, reverse=True)
+        self.longest = max((key.count(' ') + 1 for key in self.keys), default=0)
+        self.fuzzy = fuzzy.FuzzyIndex(self.keys)
+
+
+def build_table(system=SYSTEM):
+    table = build_launch_table(system)
+    installed = load_desktop_entries() if system == 'linux' else []
+    resolve(table, system, installed)
+    return LaunchTable(table + installed_apps(installed, table), load_aliases())
+
+
+# Resolved once, on first use (or by warm_up() on a background thread at start-up)
+_table = Lazy(build_table)
+
+
+def get_table():
+    return _table.get()
+
+
+def warm_up():
+    """Resolve the launch table off the main thread"""
+    threading.Thread(target=get_table, name="app-table", daemon=True).start()
+
+
+def match_app(app_name, cutoff=FUZZY_CUTOFF):
+    """(entry, score) of the closest known application scoring at least cutoff, or (None, 0.0)"""
+    tokens = TOKEN_PATTERN.findall(app_name.lower())
+    if not tokens:
+        return None, 0.0
+    table = get_table()
+
+    # An exact name, or a known name inside the phrase ("the calculator app"), longest first
+    for size in range(min(len(tokens), table.longest), 0, -1):
+        for start in range(len(tokens) - size + 1):
+            entry = table.index.get(' '.join(tokens[start:start + size]))
+            if entry is not None:
+                return entry, 1.0
+
+    # Misheard names: "what's up" for WhatsApp, "v l c", "note pad"; the usual app wins a near-tie
+    key, score = table.fuzzy.match(' '.join(tokens), cutoff, prior=_usage_prior(table))
+    if key is None:
+        return None, 0.0
+    return table.index[key], score
+
+
+def _usage_prior(table):
+    if not usage:
+        return None
+    top = max(list(usage.values()))  # list() copies in one step; the voice loop may be adding to it
+    return lambda key: USAGE_WEIGHT * usage[table.index[key].name] / top
+
+
+def find_app(app_name, cutoff=FUZZY_CUTOFF):
+    """Look up an application by exact name, alias, contained key, spelling or sound"""
+    return match_app(app_name, cutoff)[0]
+
+
+# Spawns, dedupes and reaps applications off the voice loop
+launcher = Launcher()
+
+
+def launch(entry, on_failure=None):
+    """Start an application entry; returns False when it isn't installed
+
+    Nothing is waited for: applications are spawned on the launcher's
+    thread, and on_failure() is called from there if the spawn fails.
+    """
+    if not entry.available:
+        return False
+    if entry.kind == 'url':
+        webbrowser.open(entry.target)
+    elif entry.kind == 'browser':
+        webbrowser.get(entry.target).open('')
+    else:
+        def spawned(future):
+            if not future.cancelled() and future.result() == FAILED:
+                on_failure()
+
+        future = launcher.launch(entry)
+        if on_failure is not None:
+            future.add_done_callback(spawned)
+    return True
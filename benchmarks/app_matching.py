@@ -0,0 +1,99 @@
+"""Misheard application names: difflib close matches vs the phonetic/n-gram index
+
+Run from the repository root:
+    python -m benchmarks.app_matching --installed 5000 --results app_matching.json
+
+The launch table is padded with synthetic installed applications so lookup
+cost can be measured at the scale of a well-stocked desktop.
+"""
+import argparse
+import difflib
+import random
+import statistics
+import time
+
+import apps
+from benchmarks.common import percentile, write_results
+
+# (what the recognizer heard, the application that was meant)
+MISHEARD = [
+    ("what's up", 'whatsapp'), ("whats app", 'whatsapp'), ("v l c", 'vlc'), ("note pad", 'notepad'),
+    ("spot if i", 'spotify'), ("crome", 'chrome'), ("fire fox", 'firefox'), ("calculater", 'calculator'),
+    ("calculate her", 'calculator'), ("g mail", 'gmail'), ("you tube", 'youtube'), ("dis cord", 'discord'),
+    ("steam", 'steam'), ("excell", 'excel'), ("power point", 'powerpoint'), ("terminal", 'terminal'),
+    ("facebook", None), ("weird", None), ("the news", None), ("tube", None),
+]
+
+SYLLABLES = ['ka', 'lo', 'mi', 'tra', 'zen', 'vox', 'pli', 'der', 'qua', 'sto', 'ne', 'bu', 'ri', 'fan', 'gel']
+
+
+def synthetic_names(count, seed=7):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        words = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+        names.add(' '.join(words))
+    return sorted(names)
+
+
+def build_table(installed):
+    entries = apps.build_launch_table('windows') + apps.build_launch_table('linux')
+    entries += [apps.exe(name, name.replace(' ', '-')) for name in synthetic_names(installed)]
+    return apps.LaunchTable(entries)
+
+
+def legacy_match(table, name):
+    """What find_app did before: exact key, contained key, then difflib at 0.8"""
+    name = ' '.join(name.lower().split())
+    if name in table.index:
+        return table.index[name]
+    padded = f" {name} "
+    for key in table.keys:
+        if f" {key} " in padded:
+            return table.index[key]
+    close = difflib.get_close_matches(name, table.keys, n=1, cutoff=0.8)
+    return table.index[close[0]] if close else None
+
+
+def indexed_match(table, name):
+    apps._table = apps.Lazy(lambda: table)
+    return apps.find_app(name)
+
+
+def evaluate(table, matcher, repeat):
+    correct, timings = 0, []
+    for heard, meant in MISHEARD:
+        entry = matcher(table, heard)
+        names = {entry.name, *entry.aliases} if entry else set()
+        correct += (meant in names) if meant else entry is None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            matcher(table, heard)
+            timings.append(time.perf_counter() - start)
+    return {'accuracy': correct / len(MISHEARD), 'p50': percentile(timings, 50),
+            'p95': percentile(timings, 95), 'mean': statistics.mean(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--installed', type=int, default=5000, help="Synthetic installed applications")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--results', default='app_matching_results.json')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = build_table(args.installed)
+    build_seconds = time.perf_counter() - start
+    print(f"📇 {len(table.keys)} names indexed in {build_seconds * 1000:.0f} ms")
+
+    results = {'installed': args.installed, 'keys': len(table.keys), 'build_seconds': build_seconds}
+    for label, matcher in (('difflib', legacy_match), ('index', indexed_match)):
+        result = results[label] = evaluate(table, matcher, args.repeat)
+        print(f"   {label:<8} accuracy {result['accuracy']:6.1%}   "
+              f"p50 {result['p50'] * 1000:8.3f}ms  p95 {result['p95'] * 1000:8.3f}ms")
+    write_results(args.results, results)
+    print(f"💾 Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
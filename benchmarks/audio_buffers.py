@@ -0,0 +1,136 @@
+"""Audio buffers: peak memory and CPU per turn, copying every stage vs one shared clip
+
+    python -m benchmarks.audio_buffers --turns 20 --rate 44100 --results audio_buffers.json
+    python -m benchmarks.audio_buffers --wav recording.wav
+
+Each turn captures a phrase chunk by chunk, endpoints it with the VAD,
+fingerprints it and hands it to three recognizers the way the default
+chain does: Google en-US and en-IN (FLAC at the capture rate) and Sphinx
+(16 kHz PCM). Nothing is sent anywhere; only the audio handling is timed.
+
+"copying" is how phrases used to travel: a bytes object per VAD frame,
+joined into a new AudioData, encoded again by every recognizer. "shared"
+is the phrase buffer handed off as a Clip. CPU includes the FLAC encoder
+subprocesses.
+"""
+import argparse
+import resource
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+import speech_recognition as sr
+
+import clips
+import vad
+from benchmarks.common import format_ms, summarize, write_results
+from cache import audio_fingerprint
+
+CHUNK = 1024
+
+
+def synthesize(rate, seconds=2.5, seed=5):
+    """Half a second of room noise, a voiced phrase, then a second of noise"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    pitch = 2 * np.pi * np.cumsum(140 + 30 * np.sin(2 * np.pi * 0.7 * t)) / rate
+    voice = sum(np.sin(k * pitch) / k for k in range(1, 6)) * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t) ** 2)
+    signal = np.concatenate((np.zeros(rate // 2), 0.3 * voice / np.abs(voice).max(), np.zeros(rate)))
+    signal += rng.normal(0, 0.003, len(signal))
+    return np.clip(signal * 32767, -32768, 32767).astype('<i2').tobytes()
+
+
+def read_wav(path):
+    with wave.open(path, 'rb') as f:
+        if f.getsampwidth() != 2 or f.getnchannels() != 1:
+            raise SystemExit(f"{path}: expected mono 16-bit PCM")
+        return f.readframes(f.getnframes()), f.getframerate()
+
+
+def recognizers(audio):
+    """The encodings the default recognizer chain asks for"""
+    flac_rate = None if audio.sample_rate >= 8000 else 8000
+    audio.get_flac_data(convert_rate=flac_rate, convert_width=2)  # google:en-US
+    audio.get_flac_data(convert_rate=flac_rate, convert_width=2)  # google:en-IN
+    audio.get_raw_data(convert_rate=16000, convert_width=2)       # sphinx
+
+
+def phrases(stream, rate):
+    segmenter = vad.VadSegmenter(rate, 2)
+    view = memoryview(stream)
+    for offset in range(0, len(stream), CHUNK * 2):
+        chunk = bytes(view[offset:offset + CHUNK * 2])  # A fresh buffer per read, like a microphone
+        event, frames = segmenter.feed(chunk)
+        if event == 'phrase':
+            yield frames
+    while True:
+        event, frames = segmenter.flush()
+        if event != 'phrase':
+            break
+        yield frames
+
+
+def copying_turn(stream, rate):
+    frame = int(rate * 0.02) * 2
+    for frames in phrases(stream, rate):
+        pieces = [bytes(frames[i:i + frame]) for i in range(0, len(frames), frame)]
+        audio = sr.AudioData(b"".join(pieces), rate, 2)
+        audio_fingerprint(audio)
+        recognizers(audio)
+
+
+def shared_turn(stream, rate):
+    for frames in phrases(stream, rate):
+        audio = clips.Clip(frames, rate, 2)
+        audio_fingerprint(audio)
+        recognizers(audio)
+
+
+def cpu_seconds():
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def run(label, turn, stream, rate, turns):
+    turn(stream, rate)  # Warm up imports and the FLAC binary lookup
+    cpu, wall = [], []
+    for _ in range(turns):
+        start_cpu, start = cpu_seconds(), time.perf_counter()
+        turn(stream, rate)
+        cpu.append(cpu_seconds() - start_cpu)
+        wall.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(min(turns, 5)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        turn(stream, rate)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    result = {'cpu_seconds': summarize(cpu), 'wall_seconds': summarize(wall), 'peak_bytes': max(peaks)}
+    print(f"   {label:<8} cpu {format_ms(result['cpu_seconds'])}  peak {max(peaks) / 1024:7.0f} KiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--wav', help="Mono 16-bit recording to use instead of a synthesized phrase")
+    parser.add_argument('--rate', type=int, default=44100, help="Sample rate of the synthesized phrase")
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--results', default='audio_buffers_results.json')
+    args = parser.parse_args()
+
+    stream, rate = read_wav(args.wav) if args.wav else (synthesize(args.rate), args.rate)
+    print(f"🎙 {len(stream) / 2 / rate:.1f} s of {rate} Hz audio per turn, {args.turns} turns")
+    results = {'rate': rate, 'audio_seconds': len(stream) / 2 / rate, 'turns': args.turns}
+    for label, turn in (('copying', copying_turn), ('shared', shared_turn)):
+        results[label] = run(label, turn, stream, rate, args.turns)
+    write_results(args.results, results)
+    print(f"💾 Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
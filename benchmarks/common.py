@@ -0,0 +1,81 @@
+"""Helpers shared by the benchmark scripts"""
+import json
+import math
+import os
+import struct
+import wave
+
+from intents import TOKEN_PATTERN
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (pct in 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values):
+    """p50/p95/p99, mean and max of a list of seconds"""
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'mean': sum(values) / len(values),
+        'max': max(values),
+    }
+
+
+def word_errors(reference, hypothesis):
+    """(word-level edit distance, reference length) after lowercasing and dropping punctuation"""
+    ref = TOKEN_PATTERN.findall(reference.lower())
+    hyp = TOKEN_PATTERN.findall((hypothesis or '').lower())
+    row = list(range(len(hyp) + 1))
+    for i, word in enumerate(ref, 1):
+        previous, row[0] = row[0], i
+        for j, other in enumerate(hyp, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (word != other))
+    return row[-1], len(ref)
+
+
+def format_ms(summary):
+    if not summary.get('count'):
+        return "n/a"
+    return "  ".join(f"{key} {summary[key] * 1000:7.1f}ms" for key in ('p50', 'p95', 'p99'))
+
+
+def load_manifest(directory):
+    """Read manifest.jsonl ({"file", "transcript", "intent"} per line) from a WAV directory"""
+    entries = []
+    with open(os.path.join(directory, 'manifest.jsonl'), encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entry['path'] = os.path.join(directory, entry['file'])
+                entries.append(entry)
+    return entries
+
+
+def write_tone_wav(path, segments, rate=16000, frequency=220):
+    """Write a mono 16-bit WAV of (seconds, amplitude) tone/silence segments"""
+    frames = bytearray()
+    for seconds, amplitude in segments:
+        for i in range(int(seconds * rate)):
+            sample = amplitude * math.sin(2 * math.pi * frequency * i / rate)
+            frames += struct.pack('<h', int(sample))
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(bytes(frames))
+
+
+def write_results(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,145 @@
+"""Endpointing benchmark: fixed pause_threshold timing vs the streaming VAD
+
+For each WAV the segmenters are fed microphone-sized chunks exactly as the
+capture pipeline would. Reports time-to-endpoint (how long after the speaker
+stopped the phrase was released to recognition) and truncation rate (phrases
+cut before the speaker finished or split in two). The directory needs a
+manifest.jsonl with {"file": ..., "speech_end": seconds} per line.
+
+    python -m benchmarks.endpointing --make-fixtures vad_wavs
+    python -m benchmarks.endpointing vad_wavs --results endpointing.json
+"""
+import argparse
+import json
+import os
+import wave
+
+import numpy as np
+import speech_recognition as sr
+
+from benchmarks.common import format_ms, load_manifest, summarize, write_results
+from pipeline import EnergySegmenter
+from vad import VadSegmenter
+
+CHUNK = 1024  # sr.Microphone's default chunk size
+
+
+def legacy_segmenter(samples, rate):
+    """EnergySegmenter configured exactly like main.listen_and_recognize"""
+    recognizer = sr.Recognizer()
+    # Stand-in for adjust_for_ambient_noise: the leading half second is silence
+    lead = samples[:rate // 2].astype(np.float64)
+    recognizer.energy_threshold = float(np.sqrt(np.mean(lead * lead))) * recognizer.dynamic_energy_ratio
+    recognizer.energy_threshold = max(recognizer.energy_threshold, 300)
+    recognizer.dynamic_energy_adjustment_ratio = 1.15
+    recognizer.pause_threshold = 0.8
+    recognizer.phrase_threshold = 0.3
+    recognizer.non_speaking_duration = 0.5
+    return EnergySegmenter(recognizer, rate, 2, CHUNK, phrase_time_limit=15)
+
+
+def run_segmenter(segmenter, samples):
+    """Feed chunks and return the stream time at which each phrase was released"""
+    released = []
+    for offset in range(0, len(samples), CHUNK):
+        event, _ = segmenter.feed(samples[offset:offset + CHUNK].tobytes())
+        if event == 'phrase':
+            released.append(segmenter.clock)
+    while True:
+        event, _ = segmenter.flush()
+        if event != 'phrase':
+            break
+        released.append(segmenter.clock)
+    return released
+
+
+def evaluate(entries, make_segmenter):
+    results = []
+    for entry in entries:
+        with wave.open(entry['path'], 'rb') as f:
+            rate = f.getframerate()
+            samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+        released = run_segmenter(make_segmenter(samples, rate), samples)
+        speech_end = entry['speech_end']
+        truncated = len(released) != 1 or released[0] < speech_end
+        results.append({
+            'file': entry['file'],
+            'phrases': len(released),
+            'truncated': truncated,
+            'time_to_endpoint': (released[-1] - speech_end) if released else None,
+        })
+    return results
+
+
+def synth_utterance(rng, rate):
+    """Speech-like audio: voiced syllables, fricative bursts and word gaps over noise"""
+    noise_level = rng.uniform(30, 400)
+    parts = [np.zeros(int(rng.uniform(0.6, 1.0) * rate))]
+    for word in range(rng.integers(2, 6)):
+        for syllable in range(rng.integers(1, 4)):
+            n = int(rng.uniform(0.12, 0.25) * rate)
+            t = np.arange(n) / rate
+            pitch = rng.uniform(100, 220)
+            envelope = np.sin(np.pi * np.arange(n) / n) ** 0.5
+            voiced = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+            parts.append(rng.uniform(3000, 9000) * envelope * voiced / 2)
+            if rng.random() < 0.3:  # An "s" or "f"
+                parts.append(rng.normal(0, rng.uniform(600, 1500), int(0.08 * rate)))
+            parts.append(np.zeros(int(rng.uniform(0.03, 0.1) * rate)))
+        parts.append(np.zeros(int(rng.uniform(0.1, 0.3) * rate)))  # Gap between words
+    speech_end = sum(len(p) for p in parts) / rate
+    parts.append(np.zeros(int(1.5 * rate)))
+    signal = np.concatenate(parts) + rng.normal(0, noise_level, sum(len(p) for p in parts))
+    return np.clip(signal, -32767, 32767).astype(np.int16), speech_end
+
+
+def make_fixtures(directory, count=40, rate=16000, seed=0):
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'manifest.jsonl'), 'w', encoding='utf-8') as manifest:
+        for i in range(count):
+            samples, speech_end = synth_utterance(rng, rate)
+            name = f"utterance_{i:03d}.wav"
+            with wave.open(os.path.join(directory, name), 'wb') as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(rate)
+                f.writeframes(samples.tobytes())
+            manifest.write(json.dumps({'file': name, 'speech_end': round(speech_end, 4)}) + '\n')
+    print(f"📁 Wrote {count} synthetic utterances to {directory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', nargs='?')
+    parser.add_argument('--make-fixtures', metavar='DIR')
+    parser.add_argument('--results', default='endpointing_results.json')
+    args = parser.parse_args()
+    if args.make_fixtures:
+        make_fixtures(args.make_fixtures)
+        return
+    if not args.directory:
+        parser.error("a WAV directory is required")
+
+    entries = load_manifest(args.directory)
+    candidates = {
+        'pause_threshold': legacy_segmenter,
+        'vad': lambda samples, rate: VadSegmenter(rate, 2),
+    }
+    report = {}
+    for name, factory in candidates.items():
+        results = evaluate(entries, factory)
+        delays = [r['time_to_endpoint'] for r in results if r['time_to_endpoint'] is not None]
+        report[name] = {
+            'time_to_endpoint': summarize(delays),
+            'truncation_rate': sum(r['truncated'] for r in results) / len(results),
+            'files': results,
+        }
+        print(f"{name:<16} endpoint {format_ms(report[name]['time_to_endpoint'])}   "
+              f"truncated {report[name]['truncation_rate']:.1%}")
+    write_results(args.results, report)
+    print(f"💾 Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Micro-benchmark: legacy if/elif substring chain vs the compiled IntentRouter
+
+Run from the repository root:
+    python -m benchmarks.intent_router --utterances 100000 --extra-intents 300
+"""
+import argparse
+import random
+import time
+
+from intents import INTENTS, Intent, IntentRouter
+
+# The trigger checks process_command used to run, in their original order
+LEGACY_CHAIN = [
+    ('greeting', ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']),
+    ('how_are_you', ['how are you', 'how do you do', 'how are things']),
+    ('thanks', ['thank you', 'thanks', 'appreciate']),
+    ('open', ['open']),
+    ('time', ['time', 'clock']),
+    ('date', ['date', 'today', 'day']),
+    ('search', ['search', 'google', 'find']),
+    ('weather', ['weather']),
+    ('news', ['news']),
+    ('music', ['music', 'song', 'play']),
+    ('social', ['facebook', 'instagram', 'twitter']),
+    ('help', ['help', 'what can you do']),
+    ('exit', ['goodbye', 'bye', 'stop assistant', 'quit', 'exit']),
+]
+
+TEMPLATES = [
+    "open {app}", "please open {app} for me", "what time is it", "what's the date today",
+    "search for {thing}", "play some music", "play today's news", "how are you doing",
+    "thank you so much", "what's the weather like", "open facebook", "goodbye",
+    "tell me something about {thing}", "help", "hello there",
+]
+APPS = ['youtube', 'whatsapp', 'calculator', 'spotify', 'vlc', 'discord', 'notepad']
+THINGS = ['python tutorials', 'cheap flights', 'the moon landing', 'pasta recipes']
+
+def legacy_classify(text, chain):
+    """Classify the way the old if/elif chain did: first substring hit wins"""
+    text = text.lower().strip()
+    for name, words in chain:
+        if any(word in text for word in words):
+            return name
+    return 'chat'
+
+def synthetic_intents(count):
+    """Generate made-up intents with unique multi-word triggers"""
+    return [
+        Intent(f'custom_{i}', [f'zorb{i} action', f'custom command {i}'], priority=5)
+        for i in range(count)
+    ]
+
+def make_utterances(count, extra, seed=0):
+    """Mix built-in commands with utterances aimed at the synthetic intents"""
+    rng = random.Random(seed)
+    utterances = []
+    for _ in range(count):
+        if extra and rng.random() < 0.3:
+            utterances.append(f"please run {rng.choice(extra).triggers[0]} now")
+        else:
+            utterances.append(rng.choice(TEMPLATES).format(app=rng.choice(APPS), thing=rng.choice(THINGS)))
+    return utterances
+
+def router_name(router, text):
+    match = router.classify(text)
+    return match.name if match else 'chat'
+
+def run(label, func, utterances):
+    start = time.perf_counter()
+    for text in utterances:
+        func(text)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:8.3f} s total   {elapsed / len(utterances) * 1e6:8.2f} µs/utterance")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--utterances', type=int, default=100_000)
+    parser.add_argument('--extra-intents', type=int, default=0,
+                        help="Synthetic intents added to both routers to simulate growth")
+    args = parser.parse_args()
+
+    extra = synthetic_intents(args.extra_intents)
+    chain = LEGACY_CHAIN + [(intent.name, intent.triggers) for intent in extra]
+    router = IntentRouter(INTENTS + extra)
+    utterances = make_utterances(args.utterances, extra)
+
+    print(f"📊 Routing {len(utterances):,} utterances across {len(chain)} intents")
+    legacy = run('legacy', lambda text: legacy_classify(text, chain), utterances)
+    compiled = run('router', router.classify, utterances)
+    print(f"⚡ Speed-up: {legacy / compiled:.2f}x")
+
+    disagreements = sorted(
+        text for text in set(utterances)
+        if legacy_classify(text, chain) != router_name(router, text)
+    )
+    print(f"🔀 Distinct utterances routed differently (word boundaries + priorities): {len(disagreements)}")
+    for text in disagreements[:10]:
+        print(f"   '{text}': {legacy_classify(text, chain)} -> {router_name(router, text)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Load test for server.py: N simultaneous speakers streaming WAV files over localhost
+
+    python -m benchmarks.replay --make-fixtures bench_wavs
+    python -m benchmarks.load_test bench_wavs --speakers 32 --stub-latency 0.3
+    python -m benchmarks.load_test bench_wavs --connect 127.0.0.1:8765   # an already running server
+
+Without --connect a server is started in a subprocess with stub backends.
+Each speaker streams every clip at real-time pace (--speed), marks its end
+and waits until the server is done with it. Turn latency runs from the end
+marker to the server's done frame.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+import wave
+
+from benchmarks.common import format_ms, summarize, write_results
+from server import AUDIO, DONE, END, ERROR, HELLO, QUIT, REPLY, WAV, read_frame, write_frame
+
+CHUNK = 1024
+# The server is started by path, so the benchmark runs from any directory
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server.py')
+
+
+def load_clips(directory):
+    """(name, sample_rate, sample_width, pcm) for each mono WAV in the directory"""
+    clips = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.wav'))):
+        with wave.open(path, 'rb') as f:
+            if f.getnchannels() != 1:
+                print(f"⚠ Skipping {path}: only mono audio is streamed")
+                continue
+            clips.append((os.path.basename(path), f.getframerate(), f.getsampwidth(),
+                          f.readframes(f.getnframes())))
+    return clips
+
+
+async def speaker(index, host, port, clips, speed, want_audio, records):
+    reader, writer = await asyncio.open_connection(host, port)
+    _, rate, width, _ = clips[0]
+    write_frame(writer, HELLO, {'sample_rate': rate, 'sample_width': width, 'chunk': CHUNK, 'audio': want_audio})
+    step = CHUNK * width
+    try:
+        for turn in range(len(clips)):
+            # Rotate the clip order so speakers don't all say the same thing at once
+            name, _, _, pcm = clips[(index + turn) % len(clips)]
+            started = time.perf_counter()
+            for offset in range(0, len(pcm), step):
+                chunk = pcm[offset:offset + step]
+                write_frame(writer, AUDIO, chunk)
+                await writer.drain()
+                if speed:
+                    await asyncio.sleep(len(chunk) / width / rate / speed)
+            write_frame(writer, END)
+            await writer.drain()
+            ended = time.perf_counter()
+
+            record = {'speaker': index, 'clip': name, 'stream_seconds': ended - started,
+                      'replies': 0, 'audio_bytes': 0, 'first_reply': None, 'error': None}
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind is None:
+                    record['error'] = 'disconnected'
+                    break
+                if kind == REPLY:
+                    record['replies'] += 1
+                    if record['first_reply'] is None:
+                        record['first_reply'] = time.perf_counter() - ended
+                    record['transcript'] = json.loads(payload)['transcript']
+                elif kind == WAV:
+                    record['audio_bytes'] += len(payload)
+                elif kind == ERROR:
+                    record['error'] = json.loads(payload)['error']
+                    break
+                elif kind == DONE:
+                    break
+            record['turn'] = time.perf_counter() - ended
+            records.append(record)
+            if record['error']:
+                return
+        write_frame(writer, QUIT)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def run(host, port, clips, speakers, speed, want_audio):
+    records = []
+    start = time.perf_counter()
+    await asyncio.gather(*(speaker(i, host, port, clips, speed, want_audio, records) for i in range(speakers)))
+    return records, time.perf_counter() - start
+
+
+def spawn_server(args):
+    command = [sys.executable, SERVER, '--port', '0', '--backends', 'stub',
+               '--stub-latency', str(args.stub_latency), '--workers', str(args.workers),
+               '--max-sessions', str(max(64, args.speakers))]
+    if args.no_audio_cache:
+        command.append('--no-audio-cache')
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if 'Listening on' in line:
+            host, port = line.split()[-1].rsplit(':', 1)
+            return process, host, int(port)
+    raise RuntimeError("Server exited before it started listening")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', help="Directory of mono 16-bit WAV files")
+    parser.add_argument('--speakers', type=int, default=8)
+    parser.add_argument('--speed', type=float, default=1.0, help="Streaming speed relative to real time; 0 = unpaced")
+    parser.add_argument('--connect', metavar='HOST:PORT', help="Use a running server instead of spawning one")
+    parser.add_argument('--workers', type=int, default=4, help="Worker threads of the spawned server")
+    parser.add_argument('--stub-latency', type=float, default=0.3, help="Recognition time of the spawned server's stub")
+    parser.add_argument('--no-audio-cache', action='store_true', help="Make the spawned server recognize every clip")
+    parser.add_argument('--audio', action='store_true', help="Ask for synthesized audio with each reply")
+    parser.add_argument('--results', default='load_test_results.json')
+    args = parser.parse_args()
+
+    clips = load_clips(args.directory)
+    if not clips:
+        parser.error(f"no mono WAV files in {args.directory}")
+
+    process = None
+    if args.connect:
+        host, port = args.connect.rsplit(':', 1)
+        port = int(port)
+    else:
+        process, host, port = spawn_server(args)
+    try:
+        records, wall_time = asyncio.run(run(host, port, clips, args.speakers, args.speed, args.audio))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    turns = [r['turn'] for r in records if not r['error']]
+    summary = {
+        'speakers': args.speakers,
+        'turns': len(records),
+        'errors': sum(1 for r in records if r['error']),
+        'unanswered': sum(1 for r in records if not r['error'] and not r['replies']),
+        'turns_per_second': len(records) / wall_time if wall_time else None,
+        'turn_latency': summarize(turns),
+        'first_reply_latency': summarize([r['first_reply'] for r in records if r['first_reply'] is not None]),
+    }
+    print(f"📊 {summary['speakers']} speakers, {summary['turns']} turns, "
+          f"{summary['errors']} errors, {summary['unanswered']} unanswered")
+    print(f"   turn        {format_ms(summary['turn_latency'])}")
+    print(f"   first reply {format_ms(summary['first_reply_latency'])}")
+    print(f"⚡ Throughput: {summary['turns_per_second']:.2f} turns/s over {wall_time:.1f}s")
+
+    write_results(args.results, {
+        'config': {'directory': args.directory, 'speakers': args.speakers, 'speed': args.speed,
+                   'connect': args.connect, 'workers': args.workers, 'stub_latency': args.stub_latency,
+                   'audio_cache': not args.no_audio_cache, 'audio': args.audio},
+        'summary': summary,
+        'turns': records,
+    })
+    print(f"💾 Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,137 @@
+"""Offline recognition: open Sphinx dictation vs the command grammar, on recorded audio
+
+    python -m benchmarks.offline --make-fixtures offline_wavs   # synthesized with pyttsx3
+    python -m benchmarks.offline offline_wavs --results offline.json
+
+The directory needs a manifest.jsonl of {"file", "transcript", "intent"}
+lines; "free_form": true marks requests the grammar can't list (searches,
+chat), which are expected to go through dictation. Real recordings of
+your own voice give far more telling numbers than synthesized speech.
+"""
+import argparse
+import os
+import json
+import time
+
+import speech_recognition as sr
+
+import main
+from benchmarks.common import format_ms, load_manifest, summarize, word_errors, write_results
+
+FIXTURES = [
+    ("open youtube", 'open', False), ("open calculator", 'open', False), ("open whatsapp", 'open', False),
+    ("open the terminal please", 'open', False), ("open chrome", 'open', False), ("open firefox", 'open', False),
+    ("what time is it", 'time', False), ("what's the date today", 'date', False), ("hello", 'greeting', False),
+    ("good morning", 'greeting', False), ("thank you", 'thanks', False), ("how are you", 'how_are_you', False),
+    ("what's the weather like", 'weather', False), ("play some music", 'music', False),
+    ("what's the news", 'news', False), ("help", 'help', False), ("what can you do", 'help', False),
+    ("goodbye", 'exit', False), ("open facebook", 'open', False), ("stop assistant", 'exit', False),
+    ("search for python tutorials", 'search', True), ("google the weather in paris", 'search', True),
+    ("tell me a story about a dragon", 'chat', True), ("who wrote the lord of the rings", 'chat', True),
+]
+
+
+def make_fixtures(directory, rate=150):
+    """Speak FIXTURES to WAV files with the assistant's own text-to-speech engine"""
+    import pyttsx3
+
+    engine = pyttsx3.init()
+    engine.setProperty('rate', rate)
+    for voice in engine.getProperty('voices'):
+        if voice.id.lower().endswith(('en-us', 'en_us')) or 'united states' in (voice.name or '').lower():
+            engine.setProperty('voice', voice.id)
+            break
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'manifest.jsonl'), 'w', encoding='utf-8') as manifest:
+        for i, (transcript, intent, free_form) in enumerate(FIXTURES):
+            name = f"{i:03d}_{transcript.replace(' ', '_').replace(chr(39), '')}.wav"
+            engine.save_to_file(transcript, os.path.join(directory, name))
+            engine.runAndWait()  # One file per run; queued saves can clobber each other
+            manifest.write(json.dumps({'file': name, 'transcript': transcript, 'intent': intent,
+                                       'free_form': free_form}) + '\n')
+    print(f"📁 Wrote {len(FIXTURES)} fixtures to {directory}")
+
+
+class DictationBackend:
+    """The old offline path: recognize_sphinx, which loads the models on every call"""
+
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+
+    def transcribe(self, audio):
+        try:
+            return self.recognizer.recognize_sphinx(audio), None
+        except sr.UnknownValueError:
+            return '', None
+
+
+def evaluate(entries, backend):
+    recognizer = sr.Recognizer()
+    records = []
+    for entry in entries:
+        with sr.AudioFile(entry['path']) as source:
+            audio = recognizer.record(source)
+        start = time.perf_counter()
+        text, confidence = backend.transcribe(audio)
+        elapsed = time.perf_counter() - start
+        errors, words = word_errors(entry['transcript'], text)
+        intent = main.resolve_command(text)[0] if text else None
+        records.append({'file': entry['file'], 'transcript': entry['transcript'], 'heard': text,
+                        'free_form': entry.get('free_form', False), 'seconds': elapsed,
+                        'errors': errors, 'words': words, 'intent': intent,
+                        'correct': intent == entry.get('intent')})
+    return records
+
+
+def score(records):
+    def wer(subset):
+        words = sum(r['words'] for r in subset)
+        return sum(r['errors'] for r in subset) / words if words else None
+
+    commands = [r for r in records if not r['free_form']]
+    free_form = [r for r in records if r['free_form']]
+    return {
+        'wer': wer(records),
+        'wer_commands': wer(commands),
+        'wer_free_form': wer(free_form),
+        'intent_accuracy': sum(r['correct'] for r in records) / len(records) if records else None,
+        'latency': summarize([r['seconds'] for r in records]),
+        'latency_commands': summarize([r['seconds'] for r in commands]),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', nargs='?', help="Directory with WAV files and manifest.jsonl")
+    parser.add_argument('--make-fixtures', metavar='DIR', help="Synthesize the fixture commands and exit")
+    parser.add_argument('--results', default='offline_results.json')
+    args = parser.parse_args()
+
+    if args.make_fixtures:
+        make_fixtures(args.make_fixtures)
+        return
+    if not args.directory:
+        parser.error("a fixture directory is required")
+
+    entries = load_manifest(args.directory)
+    start = time.perf_counter()
+    backend = main.make_backends(None, 'offline')[0]
+    grammar = backend.grammar
+    setup = time.perf_counter() - start
+    print(f"📖 Grammar of {grammar.stats()} built and models loaded in {setup * 1000:.0f} ms")
+
+    results = {'clips': len(entries), 'grammar_setup_seconds': setup, 'grammar': grammar.stats()}
+    for label, candidate in (('dictation', DictationBackend(sr.Recognizer())), ('grammar', backend)):
+        records = evaluate(entries, candidate)
+        summary = score(records)
+        results[label] = {'summary': summary, 'clips': records}
+        print(f"   {label:<10} WER {summary['wer']:6.1%} (commands {summary['wer_commands']:6.1%}, "
+              f"free-form {summary['wer_free_form'] or 0:6.1%})  intents {summary['intent_accuracy']:6.1%}")
+        print(f"   {'':<10} {format_ms(summary['latency'])}")
+    results['grammar']['backend'] = backend.stats()
+    write_results(args.results, results)
+    print(f"💾 Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main_cli()
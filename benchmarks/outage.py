@@ -0,0 +1,94 @@
+"""A bad network minute: time per turn, backend calls and prompts with and without circuit breakers
+
+    python -m benchmarks.outage --turns 20 --results outage.json
+
+Both online recognizers hang until their timeout; the offline one makes
+out the command on some turns and hears nothing on the rest. Listening is
+replaced by a fixed clip so only recognition, retries and backoff count.
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+from unittest import mock
+
+import speech_recognition as sr
+
+import main
+import recognition
+import retry
+from benchmarks.common import format_ms, summarize, write_results
+
+
+def build_chain(timeout, hit_rate, rng):
+    def offline(audio):
+        return 'open youtube' if rng.random() < hit_rate else ''
+
+    return [
+        recognition.StubBackend('google:en-US', delay=timeout * 2, error=sr.RequestError("unreachable"),
+                                timeout=timeout),
+        recognition.StubBackend('google:en-IN', delay=timeout * 2, error=sr.RequestError("unreachable"),
+                                timeout=timeout),
+        recognition.StubBackend('sphinx', offline, delay=0.05, timeout=2.0),
+    ]
+
+
+def run(label, turns, timeout, hit_rate, breakers, seed):
+    rng = random.Random(seed)
+    dispatcher = recognition.RecognitionDispatcher(
+        build_chain(timeout, hit_rate, rng), policy=main.RECOGNITION_POLICY, confident=main.CONFIDENT,
+        breaker=(lambda name: retry.CircuitBreaker(name, cooldown=60.0)) if breakers else None)
+    policy = retry.RetryPolicy(attempts=5, budget=20.0, backoff=retry.Backoff(rng=rng))
+    limiter = retry.PromptLimiter(interval=main.PROMPT_INTERVAL)
+    spoken = []
+    clip = sr.AudioData(b'\0\0' * 1600, 16000, 2)
+
+    timings, recognized = [], 0
+    with mock.patch.object(main, 'listen_for_phrase', lambda *args, **kwargs: clip), \
+            mock.patch.object(main, 'speak', spoken.append), \
+            mock.patch.object(main, 'retry_policy', policy), \
+            mock.patch.object(main, 'prompt_limiter', limiter), \
+            contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(turns):
+            start = time.perf_counter()
+            text = main.listen_and_recognize(sr.Recognizer(), None, dispatcher=dispatcher)
+            timings.append(time.perf_counter() - start)
+            recognized += text is not None
+    dispatcher.close()
+
+    stats = summarize(timings)
+    result = {
+        'turn_seconds': stats,
+        'recognized': recognized,
+        'backend_calls': dict(dispatcher.calls),
+        'prompts_spoken': len(spoken),
+        'prompts_suppressed': limiter.suppressed,
+        'retries': policy.stats(),
+        'breakers': dispatcher.stats()['breakers'],
+    }
+    print(f"   {label:<12} turn {format_ms(stats)}  recognized {recognized}/{turns}  online calls "
+          f"{sum(n for name, n in dispatcher.calls.items() if name.startswith('google'))}  "
+          f"prompts {len(spoken)} (+{limiter.suppressed} suppressed)")
+    return result
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=0.5, help="Seconds an unreachable backend hangs")
+    parser.add_argument('--hit-rate', type=float, default=0.6, help="Share of turns the offline recognizer gets")
+    parser.add_argument('--seed', type=int, default=3)
+    parser.add_argument('--results', default='outage_results.json')
+    args = parser.parse_args()
+
+    print(f"📡 {args.turns} turns with both online recognizers down ({args.timeout}s timeouts)")
+    results = {'turns': args.turns, 'timeout': args.timeout, 'hit_rate': args.hit_rate}
+    for label, breakers in (('no breakers', False), ('breakers', True)):
+        results[label.replace(' ', '_')] = run(label, args.turns, args.timeout, args.hit_rate, breakers, args.seed)
+    write_results(args.results, results)
+    print(f"💾 Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main_cli()
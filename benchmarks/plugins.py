@@ -0,0 +1,112 @@
+"""Plugin handlers: start-up and per-turn dispatch cost as the plugin count grows
+
+    python -m benchmarks.plugins --counts 0 10 100 500 --results plugins.json
+
+Writes N generated plugins (manifest plus module) to a temporary
+directory, discovers them into a fresh intent router, then routes a mix of
+built-in and plugin commands through main.resolve_command and the
+registry. Start-up only reads manifests, so no plugin module should be
+imported until its trigger is first heard.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import intents
+import main
+import plugins
+from benchmarks.common import format_ms, summarize, write_results
+
+BUILT_IN = ['what time is it', 'open youtube', "what's the weather like", 'play some music', 'hello there',
+            'thank you', 'tell me a joke about cats']
+
+MODULE = '''def handle(args):
+    return True
+'''
+
+ASYNC_MODULE = '''import time
+
+def handle(args):
+    time.sleep(0.05)  # A slow action: a web request, a smart-home call
+    return True
+'''
+
+
+def write_plugins(directory, count):
+    for i in range(count):
+        slow = i % 10 == 0
+        manifest = {'name': f'plugin_{i}', 'triggers': [f'gadget {i}', f'switch gadget {i} on'],
+                    'module': f'plugin_{i}', 'async': slow}
+        with open(os.path.join(directory, f'plugin_{i}.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        with open(os.path.join(directory, f'plugin_{i}.py'), 'w', encoding='utf-8') as f:
+            f.write(ASYNC_MODULE if slow else MODULE)
+
+
+def run(count, turns, rng):
+    with tempfile.TemporaryDirectory() as directory:
+        write_plugins(directory, count)
+        router = intents.IntentRouter(intents.INTENTS)
+        registry = plugins.PluginRegistry([directory], router=router)
+        start = time.perf_counter()
+        registry.discover()
+        discovery = time.perf_counter() - start
+        imported = sum(1 for name in sys.modules if name.startswith('assistant_plugins.'))
+
+        said = [rng.choice(BUILT_IN) if not count or rng.random() < 0.5 else f"please switch gadget {rng.randrange(count)} on"
+                for _ in range(turns)]
+        routing, dispatch, first_use = [], [], []
+        with mock.patch.object(intents, 'router', router), mock.patch.object(main, 'plugin_registry', registry):
+            for text in said:
+                start = time.perf_counter()
+                intent, args = main.resolve_command(text)
+                routed = time.perf_counter()
+                if intent in registry:
+                    fresh = not registry.plugins[intent].loaded
+                    registry.run(intent, args)
+                    (first_use if fresh else dispatch).append(time.perf_counter() - routed)
+                routing.append(routed - start)
+        registry.close()
+        for name in [name for name in sys.modules if name.startswith('assistant_plugins.')]:
+            del sys.modules[name]
+
+    result = {
+        'plugins': count,
+        'discovery_seconds': discovery,
+        'imported_at_startup': imported,
+        'loaded_after_turns': registry.stats()['loaded'],
+        'route_seconds': summarize(routing),
+        'dispatch_seconds': summarize(dispatch),
+        'first_use_seconds': summarize(first_use),
+    }
+    print(f"   {count:>4} plugins  discovery {discovery * 1000:7.2f} ms  imported {imported}  "
+          f"route p50 {result['route_seconds']['p50'] * 1e6:5.1f}µs  "
+          f"dispatch p50 {(result['dispatch_seconds'].get('p50') or 0) * 1e6:5.1f}µs  "
+          f"loaded {result['loaded_after_turns']}")
+    return result
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[0, 10, 100, 500])
+    parser.add_argument('--turns', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=4)
+    parser.add_argument('--results', default='plugins_results.json')
+    args = parser.parse_args()
+
+    print(f"🧩 {args.turns} turns per plugin count, half of them plugin commands")
+    results = [run(count, args.turns, random.Random(args.seed)) for count in args.counts]
+    first = results[-1]['first_use_seconds']
+    if first.get('count'):
+        print(f"   First use of a plugin (import on match): {format_ms(first)}")
+    write_results(args.results, {'turns': args.turns, 'runs': results})
+    print(f"💾 Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,249 @@
+"""Offline replay harness for the full listen -> recognize -> act loop
+
+Feeds a directory of labelled WAV files through sr.AudioFile into
+main.listen_and_recognize and main.process_command, with browser and process
+launches replaced by recording fakes. The directory needs a manifest.jsonl
+with one {"file": ..., "transcript": ..., "intent": ...} object per line.
+
+    python -m benchmarks.replay --make-fixtures bench_wavs
+    python -m benchmarks.replay bench_wavs --results results.json
+    python -m benchmarks.replay bench_wavs --backends default   # real recognizers
+    python -m benchmarks.replay bench_wavs --baseline           # no rescoring, every backend every turn
+
+A manifest line may also carry "alternatives": [[text, confidence or null], ...],
+the n-best list the stub primary recognizer answers with instead of the label.
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+from unittest import mock
+
+import speech_recognition as sr
+
+import apps
+import main
+import recognition
+from benchmarks.common import format_ms, load_manifest, summarize, write_results, write_tone_wav
+
+FIXTURE_COMMANDS = [
+    ("open youtube", 'open'), ("what time is it", 'time'), ("what's the date today", 'date'),
+    ("search for python tutorials", 'search'), ("play some music", 'music'),
+    ("hello there", 'greeting'), ("thank you", 'thanks'), ("open calculator", 'open'),
+    ("what's the weather like", 'weather'), ("play today's news", 'news'),
+    ("open instagram", 'open'), ("how are you", 'how_are_you'), ("help", 'help'),
+    ("open spotify", 'open'), ("tell me a story", 'chat'),
+]
+
+# What a recognizer might plausibly hear instead: the label only as a lower alternative
+FIXTURE_NBEST = {
+    "open calculator": [("oven calculator", 0.71), ("open calculator", None)],
+    "what's the weather like": [("what's the whether like", 0.64), ("what's the weather like", None)],
+    "open spotify": [("open spot if i", 0.62), ("open spotify", None)],
+    "hello there": [("hello bear", 0.58), ("hello there", None)],
+}
+
+
+class LabelBackend(recognition.Backend):
+    """Deterministic recognizer that answers with the label of the clip being replayed"""
+
+    def __init__(self, latency=0.0, name='label', confidence=0.92, nbest=True):
+        super().__init__(timeout=max(5.0, latency * 2))
+        self.name = name
+        self.latency = latency
+        self.confidence = confidence
+        self.nbest = nbest  # Answer with the manifest's alternatives when it has them
+        self.expected = ''
+        self.alternatives = None
+
+    def transcribe(self, audio):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.nbest and self.alternatives:
+            return [tuple(alternative) for alternative in self.alternatives]
+        return self.expected, self.confidence
+
+
+class Recorder:
+    """Stands in for webbrowser.open, subprocess.Popen and speak, remembering each call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def fake(self, kind):
+        def record(*args, **kwargs):
+            self.calls.append((kind, args[0] if args else None))
+            return mock.MagicMock(pid=0)
+        return record
+
+
+class TimedDispatcher:
+    """Wraps a dispatcher to time the recognition stage separately from capture"""
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.elapsed = 0.0
+
+    def recognize(self, audio):
+        start = time.perf_counter()
+        try:
+            return self.dispatcher.recognize(audio)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+    def __getattr__(self, name):
+        return getattr(self.dispatcher, name)
+
+
+def make_fixtures(directory):
+    """Write tone-burst WAVs labelled with FIXTURE_COMMANDS (for stub backends)"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'manifest.jsonl'), 'w', encoding='utf-8') as manifest:
+        for i, (transcript, intent) in enumerate(FIXTURE_COMMANDS):
+            name = f"{i:03d}_{transcript.replace(' ', '_').replace(chr(39), '')}.wav"
+            # Vary the burst length so every clip has its own fingerprint
+            write_tone_wav(os.path.join(directory, name),
+                           [(0.3, 0), (0.6 + 0.05 * i, 8000), (1.2, 0)])
+            entry = {'file': name, 'transcript': transcript, 'intent': intent}
+            if transcript in FIXTURE_NBEST:
+                entry['alternatives'] = FIXTURE_NBEST[transcript]
+            manifest.write(json.dumps(entry) + '\n')
+    print(f"📁 Wrote {len(FIXTURE_COMMANDS)} fixtures to {directory}")
+
+
+@contextlib.contextmanager
+def recording_fakes(recorder):
+    with mock.patch('webbrowser.open', recorder.fake('browser')), \
+            mock.patch('webbrowser.get', lambda *a: mock.MagicMock(open=recorder.fake('browser'))), \
+            mock.patch('subprocess.Popen', recorder.fake('popen')), \
+            mock.patch.object(apps.launcher, 'launch', recorder.fake('launch')), \
+            mock.patch.object(main, 'speak', recorder.fake('speak')):
+        yield
+
+
+def replay(entries, dispatcher, label_backends=(), keep_caches=False):
+    recognizer = sr.Recognizer()
+    timed = TimedDispatcher(dispatcher)
+    recorder = Recorder()
+    records = []
+
+    with recording_fakes(recorder):
+        for entry in entries:
+            if not keep_caches:
+                main.command_cache.clear()
+                if dispatcher.cache is not None:
+                    dispatcher.cache.clear()
+            for backend in label_backends:
+                backend.expected = entry['transcript']
+                backend.alternatives = entry.get('alternatives')
+            timed.elapsed = 0.0
+            recorder.calls.clear()
+
+            start = time.perf_counter()
+            with sr.AudioFile(entry['path']) as source:
+                text = main.listen_and_recognize(recognizer, source, retries=1, dispatcher=timed)
+            heard = time.perf_counter()
+            intent = main.resolve_command(text)[0] if text else None
+            routed = time.perf_counter()
+            if text:
+                main.process_command(text)
+            acted = time.perf_counter()
+
+            records.append({
+                'file': entry['file'],
+                'expected_transcript': entry.get('transcript'),
+                'transcript': text,
+                'expected_intent': entry.get('intent'),
+                'intent': intent,
+                'correct': entry.get('intent') is None or intent == entry.get('intent'),
+                'side_effects': [call for call in recorder.calls if call[0] != 'speak'],
+                'seconds': {
+                    'capture': heard - start - timed.elapsed,
+                    'recognize': timed.elapsed,
+                    'route': routed - heard,
+                    'act': acted - routed,
+                    'total': acted - start,
+                },
+            })
+    return records
+
+
+def report(records, wall_time, dispatcher):
+    stages = ('capture', 'recognize', 'route', 'act', 'total')
+    labelled = [r for r in records if r['expected_intent'] is not None]
+    summary = {
+        'utterances': len(records),
+        'recognized': sum(1 for r in records if r['transcript']),
+        'intent_accuracy': (sum(r['correct'] for r in labelled) / len(labelled)) if labelled else None,
+        'throughput_per_second': len(records) / wall_time if wall_time else None,
+        'backend_calls': dict(dispatcher.calls),
+        'backend_calls_per_turn': sum(dispatcher.calls.values()) / dispatcher.turns if dispatcher.turns else None,
+        'latency': {stage: summarize([r['seconds'][stage] for r in records]) for stage in stages},
+    }
+    print(f"📊 {summary['utterances']} utterances, {summary['recognized']} recognized")
+    for stage in stages:
+        print(f"   {stage:<10} {format_ms(summary['latency'][stage])}")
+    if summary['intent_accuracy'] is not None:
+        print(f"🎯 Intent accuracy: {summary['intent_accuracy']:.1%}")
+    print(f"⚡ Throughput: {summary['throughput_per_second']:.2f} utterances/s")
+    if summary['backend_calls_per_turn'] is not None:
+        print(f"📞 Backend calls per turn: {summary['backend_calls_per_turn']:.2f} {summary['backend_calls']}")
+    for r in records:
+        if not r['correct']:
+            print(f"   ❌ {r['file']}: heard {r['transcript']!r} -> {r['intent']} (expected {r['expected_intent']})")
+    return summary
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', nargs='?', help="Directory with WAV files and manifest.jsonl")
+    parser.add_argument('--make-fixtures', metavar='DIR', help="Generate a labelled stub fixture set and exit")
+    parser.add_argument('--backends', choices=('stub', 'default'), default='stub',
+                        help="stub: answer with the manifest label; default: the real recognizer chain")
+    parser.add_argument('--stub-latency', type=float, default=0.0, help="Simulated recognition time in seconds")
+    parser.add_argument('--stub-fallbacks', type=int, default=2,
+                        help="Stub fallback backends behind the primary (clean label, lower confidence)")
+    parser.add_argument('--baseline', action='store_true',
+                        help="Old behaviour: no n-best rescoring and every backend on every turn")
+    parser.add_argument('--policy', choices=recognition.POLICIES, default=recognition.ORDERED)
+    parser.add_argument('--keep-caches', action='store_true', help="Don't clear caches between utterances")
+    parser.add_argument('--results', default='replay_results.json', help="Machine-readable results file")
+    args = parser.parse_args()
+
+    if args.make_fixtures:
+        make_fixtures(args.make_fixtures)
+        return
+    if not args.directory:
+        parser.error("a WAV directory is required")
+
+    entries = load_manifest(args.directory)
+    label_backends = []
+    if args.backends == 'stub':
+        label_backends = [LabelBackend(args.stub_latency)] + [
+            LabelBackend(args.stub_latency, name=f'label-fallback-{i + 1}', confidence=0.6, nbest=False)
+            for i in range(args.stub_fallbacks)]
+        backends = label_backends
+    else:
+        backends = recognition.default_backends(sr.Recognizer())
+    tuning = {} if args.baseline else {'rescorer': main.command_fit, 'confident': main.CONFIDENT}
+    dispatcher = recognition.RecognitionDispatcher(backends, policy=args.policy, cache=main.audio_cache, **tuning)
+
+    start = time.perf_counter()
+    records = replay(entries, dispatcher, label_backends, keep_caches=args.keep_caches)
+    wall_time = time.perf_counter() - start
+    summary = report(records, wall_time, dispatcher)
+
+    write_results(args.results, {
+        'config': {'directory': args.directory, 'backends': args.backends, 'policy': args.policy,
+                   'stub_latency': args.stub_latency, 'stub_fallbacks': args.stub_fallbacks,
+                   'baseline': args.baseline, 'keep_caches': args.keep_caches},
+        'summary': summary,
+        'utterances': records,
+    })
+    print(f"💾 Results written to {args.results}")
+    dispatcher.close()
+
+
+if __name__ == "__main__":
+    main_cli()
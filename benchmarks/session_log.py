@@ -0,0 +1,86 @@
+"""Session log: cost of a turn append on the voice loop, start-up replay time and file size
+
+    python -m benchmarks.session_log --turns 20000 --results session_log.json
+
+Appends a long history of turns and app launches to a log in a temporary
+directory, compacting as it goes, then reopens it the way start-up does and
+times the replay. A JSON-lines history of the same turns is written too,
+for the size comparison.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import sessionlog
+from benchmarks.common import format_ms, summarize, write_results
+
+COMMANDS = ['open youtube', 'what time is it', 'open firefox', 'play some music', 'hello',
+            'open the calculator', 'search for python tutorials', 'what is the weather like']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', type=int, default=20000)
+    parser.add_argument('--keep', type=int, default=1000, help="Turns kept by compaction")
+    parser.add_argument('--compact-kib', type=int, default=256)
+    parser.add_argument('--seed', type=int, default=2)
+    parser.add_argument('--results', default='session_log_results.json')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'session.log')
+        log = sessionlog.SessionLog(path, keep_turns=args.keep, compact_bytes=args.compact_kib * 1024).open()
+        appends, history = [], []
+        for _ in range(args.turns):
+            text = rng.choice(COMMANDS)
+            turn = (text, text.split()[0], 'google:en-US', rng.uniform(0.3, 1.5), rng.uniform(0.001, 0.05))
+            start = time.perf_counter()
+            log.record_turn(*turn)
+            if text.startswith('open'):
+                log.record_launch(text.split()[-1])
+            appends.append(time.perf_counter() - start)
+            history.append(turn)
+        start = time.perf_counter()
+        log.flush(timeout=60)
+        drained = time.perf_counter() - start
+        log.close()
+        written = log.stats()
+
+        replays = []
+        for _ in range(5):
+            start = time.perf_counter()
+            reopened = sessionlog.SessionLog(path, keep_turns=args.keep).open()
+            replays.append(time.perf_counter() - start)
+            reopened.close()
+
+        jsonl = os.path.join(directory, 'history.jsonl')
+        with open(jsonl, 'w', encoding='utf-8') as f:
+            for text, intent, backend, recognize, handle in history[-args.keep:]:
+                f.write(json.dumps({'time': time.time(), 'transcript': text, 'intent': intent, 'backend': backend,
+                                    'recognize_seconds': recognize, 'handle_seconds': handle}) + '\n')
+        results = {
+            'turns': args.turns,
+            'append_seconds': summarize(appends),
+            'drain_seconds': drained,
+            'replay_seconds': summarize(replays),
+            'log_bytes': os.path.getsize(path),
+            'jsonl_bytes_same_turns': os.path.getsize(jsonl),
+            'writer': written,
+            'restored': {'turns': len(reopened.turns), 'apps': dict(reopened.app_usage)},
+        }
+
+    append = results['append_seconds']
+    print(f"✍ Append on the voice loop: p50 {append['p50'] * 1e6:.1f}µs  p99 {append['p99'] * 1e6:.1f}µs")
+    print(f"📂 Replay of {results['restored']['turns']} turns at start-up: {format_ms(results['replay_seconds'])}")
+    print(f"🗜 {written['compactions']} compactions; {results['log_bytes'] / 1024:.0f} KiB on disk "
+          f"vs {results['jsonl_bytes_same_turns'] / 1024:.0f} KiB as JSON lines")
+    write_results(args.results, results)
+    print(f"💾 Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Speculation: time from the end of speech to the action, waiting for the final transcript vs acting on partials
+
+    python -m benchmarks.offline --make-fixtures offline_wavs
+    python -m benchmarks.speculation offline_wavs --cloud-latency 0.6 --results speculation.json
+
+The fixture clips are joined, over faint noise, and played into the
+capture pipeline at real-time speed, with the VAD endpointer and the
+grammar decoder following each phrase for partial transcripts. The final
+transcript comes from a second grammar decoder given the whole phrase,
+held back by --cloud-latency to stand in for an online recognizer's
+round trip.
+Launches, URLs and speech are recorded, not performed. Every launchable
+entry in the table counts as installed.
+
+"waiting" is when process_command acts on the final transcript. That is
+all the assistant could do before. "speculative" is when the action
+actually started: the early launch if the final transcript kept it,
+otherwise the same as waiting.
+"""
+import argparse
+import audioop
+import concurrent.futures
+import time
+import wave
+from unittest import mock
+
+import numpy as np
+
+import apps
+import launcher
+import main
+import offline
+import pipeline
+import recognition
+import speculation
+import vad
+from benchmarks.common import format_ms, load_manifest, summarize, write_results
+from lazy import Lazy
+
+CHUNK = 1024
+
+
+class CloudStandIn(recognition.Backend):
+    """The whole phrase through a grammar decoder, answered after a network-sized delay"""
+
+    name = 'cloud-stand-in'
+
+    def __init__(self, backend, delay):
+        super().__init__()
+        self.backend = backend
+        self.delay = delay
+
+    def transcribe(self, audio):
+        stream = self.backend.stream(audio.sample_rate, audio.sample_width)
+        try:
+            text = stream.feed(audio.get_raw_data())
+        finally:
+            stream.close()
+        time.sleep(self.delay)
+        return text, None
+
+
+class PacedStream:
+    """Hands out a recording no faster than it would come off a microphone"""
+
+    def __init__(self, frames, rate, width):
+        self.frames = frames
+        self.bytes_per_second = rate * width
+        self.position = 0
+        self.started = None  # perf_counter() of the first read: stream time zero
+
+    def read(self, size):
+        if self.started is None:
+            self.started = time.perf_counter()
+        data = self.frames[self.position:self.position + size * 2]
+        self.position += len(data)
+        delay = self.started + self.position / self.bytes_per_second - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return data
+
+
+class PacedSource:
+    """What AudioPipeline needs of a source; named like a file so no audio is dropped"""
+
+    def __init__(self, frames, rate):
+        self.SAMPLE_RATE = rate
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = CHUNK
+        self.filename_or_fileobject = None
+        self.stream = PacedStream(frames, rate, 2)
+
+
+def read_clip(path, rate=None):
+    with wave.open(path, 'rb') as f:
+        frames, width, channels, clip_rate = f.readframes(f.getnframes()), f.getsampwidth(), f.getnchannels(), \
+            f.getframerate()
+    if channels != 1:
+        frames = audioop.tomono(frames, width, 0.5, 0.5)
+    if width != 2:
+        frames = audioop.lin2lin(frames, width, 2)
+    if rate and clip_rate != rate:
+        frames, _ = audioop.ratecv(frames, 2, 1, clip_rate, rate, None)
+        clip_rate = rate
+    return frames, clip_rate
+
+
+def speech_end(frames, rate, frame_ms=20):
+    """Seconds into the clip where the last frame louder than a tenth of the loudest one ends"""
+    step = int(rate * frame_ms / 1000) * 2
+    levels = [audioop.rms(frames[i:i + step], 2) for i in range(0, len(frames), step)]
+    loud = max(levels, default=0) / 10
+    last = max((i for i, level in enumerate(levels) if level > loud), default=0)
+    return (last + 1) * step / 2 / rate
+
+
+def join(entries, gap, seed):
+    """One recording of every clip, gap seconds apart, over faint room noise; clip spans in seconds"""
+    rate = None
+    pieces, offset = [], 0.0
+    for entry in entries:
+        frames, rate = read_clip(entry['path'], rate)
+        if not pieces:
+            pieces.append(bytes(int(gap * rate) * 2))
+            offset = gap
+        entry['start'] = offset
+        entry['speech_end'] = offset + speech_end(frames, rate)
+        offset += len(frames) / 2 / rate
+        entry['end'] = offset
+        pieces += [frames, bytes(int(gap * rate) * 2)]
+        offset += len(pieces[-1]) / 2 / rate
+    frames = np.frombuffer(b''.join(pieces), dtype='<i2').astype(np.int32)
+    # Synthesized clips are digitally silent between words, which no microphone is
+    frames += np.random.default_rng(seed).normal(0, 20, len(frames)).astype(np.int32)
+    return np.clip(frames, -32768, 32767).astype('<i2').tobytes(), rate
+
+
+class Recorder:
+    """Stands in for the launcher, the browser and the voice, noting when each was asked for"""
+
+    def __init__(self):
+        self.effects = []  # (perf_counter, kind, what)
+        self.cancelled = []
+
+    def note(self, kind, what):
+        self.effects.append((time.perf_counter(), kind, what))
+
+    def launch(self, entry):
+        self.note('launch', entry.name)
+        future = concurrent.futures.Future()
+        future.set_result(launcher.STARTED)
+        return future
+
+    def cancel(self, future):
+        self.cancelled.append(time.perf_counter())
+
+    def since(self, start):
+        return [effect for effect in self.effects if effect[0] >= start]
+
+
+def run(entries, rate, frames, cloud_latency, hold):
+    grammar = main.command_grammar()
+    final = offline.GrammarBackend(grammar, dictation=False, partials_only=True)
+    dispatcher = recognition.RecognitionDispatcher([CloudStandIn(final, cloud_latency)])
+    partials = offline.GrammarBackend(grammar, dictation=False, partials_only=True)
+    speculator = speculation.Speculator(Lazy(lambda: partials), main.speculative_action, rate, 2, CHUNK, hold=hold)
+    source = PacedSource(frames, rate)
+    audio_pipeline = pipeline.AudioPipeline(source, None, dispatcher, segmenter=vad.VadSegmenter(rate, 2),
+                                            speculator=speculator)
+    recorder = Recorder()
+    records = []
+    with mock.patch.object(apps, 'launcher', recorder), \
+            mock.patch.object(main, 'speak', lambda text, *a, **k: recorder.note('speak', text)), \
+            mock.patch.object(main, 'open_url', lambda url: recorder.note('url', url)), \
+            mock.patch.object(main.voice, 'prerender', lambda phrases, **kwargs: recorder.note('render', phrases[0])):
+        with audio_pipeline:
+            for utterance in audio_pipeline.utterances():
+                entry = next((e for e in entries if e['start'] - 0.3 <= utterance.started <= e['end']), None)
+                if entry is None:
+                    continue
+                spoken = source.stream.started + entry['speech_end']
+                final_at = time.perf_counter()
+                text = utterance.text or ''
+                kept = utterance.speculation.settle(text) if utterance.speculation else False
+                if text:
+                    main.process_command(text)
+                acted = [effect for effect in recorder.since(final_at) if effect[1] != 'render']
+                waiting = acted[0][0] if acted else None
+                early = utterance.speculation.started if kept else waiting
+                records.append({
+                    'file': entry['file'], 'intent': entry['intent'], 'heard': text,
+                    'correct': bool(text) and main.resolve_command(text)[0] == entry['intent'],
+                    'action': acted[0][1] if acted else None,
+                    'speculated': utterance.speculation.key if utterance.speculation else None,
+                    'outcome': utterance.speculation.state if utterance.speculation else None,
+                    'final_seconds': final_at - spoken,
+                    'waiting_seconds': waiting - spoken if waiting else None,
+                    'speculative_seconds': early - spoken if early else None,
+                })
+    return records, speculator.stats(), len(recorder.cancelled)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', help="Directory with WAV files and manifest.jsonl")
+    parser.add_argument('--cloud-latency', type=float, default=0.6,
+                        help="Seconds added to each final recognition, as an online recognizer would")
+    parser.add_argument('--gap', type=float, default=1.5, help="Seconds of silence between clips")
+    parser.add_argument('--hold', type=float, default=main.SPECULATION_HOLD)
+    parser.add_argument('--seed', type=int, default=6)
+    parser.add_argument('--results', default='speculation_results.json')
+    args = parser.parse_args()
+
+    entries = load_manifest(args.directory)
+    for entry in apps.get_table().entries:
+        if entry.kind == 'exec' and entry.command is None:
+            entry.command = [entry.target]  # Nothing is spawned; the recorder stands in for the launcher
+    frames, rate = join(entries, args.gap, args.seed)
+    print(f"🎙 {len(entries)} clips, {len(frames) / 2 / rate:.0f} s of audio at {rate} Hz played in real time; "
+          f"final transcript {args.cloud_latency:.1f} s after the grammar decoder's")
+    records, stats, cancelled = run(entries, rate, frames, args.cloud_latency, args.hold)
+
+    launches = [r for r in records if r['action'] == 'launch']
+    results = {
+        'clips': len(entries), 'utterances': len(records), 'cloud_latency': args.cloud_latency, 'hold': args.hold,
+        'intent_accuracy': sum(r['correct'] for r in records) / len(records) if records else None,
+        'final': summarize([r['final_seconds'] for r in records]),
+        'launch_waiting': summarize([r['waiting_seconds'] for r in launches]),
+        'launch_speculative': summarize([r['speculative_seconds'] for r in launches]),
+        'speculator': stats, 'cancelled_launches': cancelled, 'records': records,
+    }
+    print(f"   final transcript after end of speech  {format_ms(results['final'])}")
+    print(f"   launch, waiting for it ({len(launches)})        {format_ms(results['launch_waiting'])}")
+    print(f"   launch, speculative                   {format_ms(results['launch_speculative'])}")
+    print(f"   {stats['speculated']} speculated, {stats['committed']} kept, {stats['rolled_back']} rolled back "
+          f"({cancelled} launches cancelled); intents {results['intent_accuracy']:.0%}")
+    for r in records:
+        if r['speculated']:
+            print(f"      {r['file']:<36} {r['speculated']} -> {r['outcome']} (heard {r['heard']!r})")
+    write_results(args.results, results)
+    print(f"💾 Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main_cli()
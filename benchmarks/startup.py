@@ -0,0 +1,121 @@
+"""Start-up benchmark: import cost and wall-clock time to the first listen
+
+    python -m benchmarks.startup --runs 5 --results startup.json
+
+Import time comes from `python -X importtime -c "import main"`. Time to first
+listen is measured from process spawn until the capture pipeline has read its
+first chunk from a real-time paced WAV source, for the current start-up path
+and for the old blocking 2 s adjust_for_ambient_noise calibration.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import write_results, write_tone_wav
+
+
+def import_times(runs):
+    """Cumulative microseconds to import main, plus the heaviest modules of the last run"""
+    totals = []
+    modules = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                                   capture_output=True, text=True, check=True)
+        modules = []
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            modules.append((int(cumulative), name.rstrip()))
+            if name.strip() == 'main':
+                totals.append(int(cumulative))
+    heaviest = sorted(modules, reverse=True)[:10]
+    return totals, [{'module': name.strip(), 'depth': (len(name) - len(name.lstrip())) // 2,
+                     'cumulative_us': us} for us, name in heaviest]
+
+
+def time_to_first_listen(mode, wav, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        child = subprocess.Popen([sys.executable, '-m', 'benchmarks.startup', '--child', mode, wav],
+                                 stdout=subprocess.PIPE, text=True)
+        for line in child.stdout:
+            if line.strip() == 'LISTENING':
+                timings.append(time.perf_counter() - start)
+                break
+        child.kill()
+        child.wait()
+    return timings
+
+
+def child(mode, wav):
+    """Runs in the spawned process: start up like main() and report the first listen"""
+    import main
+    import speech_recognition as sr
+
+    class RealtimeSource(sr.AudioSource):
+        """Paces reads from a WAV file like a microphone would"""
+
+        def __init__(self, source):
+            self.SAMPLE_RATE, self.SAMPLE_WIDTH, self.CHUNK = source.SAMPLE_RATE, source.SAMPLE_WIDTH, 1024
+            self.stream = self
+            self._source = source
+
+        def read(self, size):
+            time.sleep(size / self.SAMPLE_RATE)
+            return self._source.stream.read(size)
+
+    main.voice.prerender = lambda phrases, **kwargs: None  # No TTS driver needed here
+    main.speak = lambda *args, **kwargs: None
+    recognizer = sr.Recognizer()
+    with sr.AudioFile(wav) as wav_source:
+        source = RealtimeSource(wav_source)
+        if mode == 'legacy':
+            main.setup_microphone_calibration(recognizer, source)
+            source.stream.read(source.CHUNK)
+        else:
+            audio_pipeline = main.prepare_listening(recognizer, source)
+            audio_pipeline.start()
+            while audio_pipeline.chunks_captured == 0:
+                time.sleep(0.001)
+        print('LISTENING', flush=True)
+        time.sleep(60)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--results', default='startup_results.json')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'WAV'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    totals, heaviest = import_times(args.runs)
+    print(f"📦 import main: median {statistics.median(totals) / 1000:.1f} ms over {len(totals)} runs")
+    for module in heaviest:
+        print(f"   {'  ' * module['depth']}{module['module']:<30} {module['cumulative_us'] / 1000:7.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        wav = os.path.join(tmp, 'room.wav')
+        write_tone_wav(wav, [(5.0, 0)])
+        first_listen = {mode: time_to_first_listen(mode, wav, args.runs) for mode in ('legacy', 'current')}
+    for mode, timings in first_listen.items():
+        print(f"🎙 first listen ({mode}): median {statistics.median(timings) * 1000:.0f} ms")
+
+    write_results(args.results, {
+        'import_main_us': totals,
+        'heaviest_imports': heaviest,
+        'first_listen_seconds': first_listen,
+    })
+    print(f"💾 Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main_cli()
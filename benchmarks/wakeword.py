@@ -0,0 +1,197 @@
+"""Wake-word gate: false-accept / false-reject rates and CPU cost on a recorded set
+
+    python -m benchmarks.wakeword --make-fixtures wake_wavs
+    python -m benchmarks.wakeword wake_wavs --results wakeword.json
+
+The directory needs enroll/*.wav recordings of the wake word and a
+manifest.jsonl of test clips with {"file": ..., "wake": true|false}. Each
+clip runs through the VAD endpointer and a fresh WakeGate. A clip counts
+as accepted when the gate hears the wake word in any of its phrases.
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import random
+import time
+import wave
+
+import numpy as np
+
+import vad
+import wakeword
+from benchmarks.common import load_manifest, write_results
+
+RATE = 16000
+CHUNK = 1024
+
+# Synthetic "words": (start Hz, end Hz, seconds) glides standing in for syllables
+WAKE_WORD = [(300, 600, 0.18), (900, 850, 0.12), (500, 250, 0.20)]
+
+
+def render_word(word, rng, jitter=0.05):
+    """Voiced syllable glides with a few harmonics, slightly different on every take"""
+    out = []
+    for start, end, seconds in word:
+        seconds *= 1 + rng.uniform(-0.15, 0.15)
+        scale = 1 + rng.uniform(-jitter, jitter)
+        t = np.arange(int(seconds * RATE)) / RATE
+        freq = scale * (start + (end - start) * t / seconds)
+        phase = 2 * np.pi * np.cumsum(freq) / RATE
+        voice = sum(np.sin(k * phase) / k for k in (1, 2, 3))
+        out.append(voice * np.hanning(len(t)))
+        out.append(np.zeros(int(0.03 * RATE)))
+    return np.concatenate(out)
+
+
+def random_word(rng, syllables=None):
+    return [(rng.uniform(200, 1000), rng.uniform(200, 1000), rng.uniform(0.1, 0.22))
+            for _ in range(syllables or rng.randint(2, 4))]
+
+
+def write_clip(path, speech, rng, level=None, noise=0.01):
+    level = level or rng.uniform(0.2, 0.5)
+    signal = np.concatenate((np.zeros(int(0.4 * RATE)), level * speech / max(1e-9, np.abs(speech).max()),
+                             np.zeros(int(1.0 * RATE))))
+    signal += np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, noise, len(signal))
+    samples = np.clip(signal * 32767, -32768, 32767).astype('<i2')
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        f.writeframes(samples.tobytes())
+
+
+def make_fixtures(directory, count=40, seed=11):
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(directory, 'enroll'), exist_ok=True)
+    for i in range(3):
+        write_clip(os.path.join(directory, 'enroll', f'wake_{i}.wav'), render_word(WAKE_WORD, rng), rng)
+
+    cases = []
+    for i in range(count // 2):
+        cases.append((f'wake_alone_{i:02d}', render_word(WAKE_WORD, rng), True))
+        command = np.concatenate((render_word(WAKE_WORD, rng), np.zeros(int(0.1 * RATE)),
+                                  render_word(random_word(rng), rng)))
+        cases.append((f'wake_command_{i:02d}', command, True))
+    for i in range(count // 2):
+        cases.append((f'other_{i:02d}', render_word(random_word(rng), rng), False))
+        # Near misses: the wake word's syllables in another order, or only part of it
+        near = rng.choice([WAKE_WORD[::-1], WAKE_WORD[1:], WAKE_WORD[:1] + WAKE_WORD[2:]])
+        cases.append((f'near_miss_{i:02d}', render_word(near, rng), False))
+
+    with open(os.path.join(directory, 'manifest.jsonl'), 'w', encoding='utf-8') as manifest:
+        for name, speech, wake in cases:
+            write_clip(os.path.join(directory, f'{name}.wav'), speech, rng)
+            manifest.write(json.dumps({'file': f'{name}.wav', 'wake': wake}) + '\n')
+    print(f"📁 Wrote 3 enrollment clips and {len(cases)} test clips to {directory}")
+
+
+def read_wav(path):
+    with wave.open(path, 'rb') as f:
+        return np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16), f.getframerate()
+
+
+def phrases(samples, rate):
+    """Phrases the pipeline's VAD endpointer would hand to the gate"""
+    segmenter = vad.VadSegmenter(rate, 2)
+    found = []
+    data = samples.tobytes()
+    step = CHUNK * 2
+    for offset in range(0, len(data), step):
+        event, frames = segmenter.feed(data[offset:offset + step])
+        if event == 'phrase':
+            found.append((frames, segmenter.phrase_start, segmenter.clock))
+    while True:
+        event, frames = segmenter.flush()
+        if event != 'phrase':
+            break
+        found.append((frames, segmenter.phrase_start, segmenter.clock))
+    return found
+
+
+class _Audio:
+    """The bits of sr.AudioData the gate reads"""
+
+    def __init__(self, frame_data, sample_rate):
+        self.frame_data = frame_data
+        self.sample_rate = sample_rate
+        self.sample_width = 2
+
+
+def evaluate(entries, detector):
+    records = []
+    cpu = audio_seconds = 0.0
+    for entry in entries:
+        samples, rate = read_wav(entry['path'])
+        audio_seconds += len(samples) / rate
+        segments = phrases(samples, rate)
+        gate = wakeword.WakeGate(detector)
+        start = time.process_time()
+        for frames, started, ended in segments:
+            gate.admit(_Audio(frames, rate), started, ended)
+        cpu += time.process_time() - start
+        costs = [detector.score(np.frombuffer(frames, dtype=np.int16), rate)[0] for frames, _, _ in segments]
+        records.append({'file': entry['file'], 'wake': entry['wake'], 'phrases': len(segments),
+                        'accepted': gate.woken > 0, 'cost': min(costs, default=math.inf),
+                        'recognizer_calls': gate.admitted})
+    return records, cpu, audio_seconds
+
+
+def rates(records, threshold):
+    positives = [r for r in records if r['wake']]
+    negatives = [r for r in records if not r['wake']]
+    false_reject = sum(1 for r in positives if r['cost'] > threshold) / len(positives) if positives else 0.0
+    false_accept = sum(1 for r in negatives if r['cost'] <= threshold) / len(negatives) if negatives else 0.0
+    return false_accept, false_reject
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', nargs='?', help="Directory with enroll/*.wav and manifest.jsonl")
+    parser.add_argument('--make-fixtures', metavar='DIR', help="Generate a synthetic fixture set and exit")
+    parser.add_argument('--results', default='wakeword_results.json')
+    args = parser.parse_args()
+
+    if args.make_fixtures:
+        make_fixtures(args.make_fixtures)
+        return
+    if not args.directory:
+        parser.error("a fixture directory is required")
+
+    clips = [read_wav(path)[0] for path in sorted(glob.glob(os.path.join(args.directory, 'enroll', '*.wav')))]
+    enrollment = [np.frombuffer(p[0], dtype=np.int16) for clip in clips for p in phrases(clip, RATE)[:1]]
+    detector = wakeword.TemplateDetector.enroll(enrollment, RATE)
+    records, cpu, audio_seconds = evaluate(load_manifest(args.directory), detector)
+
+    false_accept, false_reject = rates(records, detector.threshold)
+    sweep = [(t, *rates(records, t)) for t in sorted({r['cost'] for r in records if math.isfinite(r['cost'])})]
+    equal_error = min(sweep, key=lambda row: abs(row[1] - row[2])) if sweep else None
+    phrases_total = sum(r['phrases'] for r in records)
+    calls = sum(r['recognizer_calls'] for r in records)
+    summary = {
+        'clips': len(records),
+        'threshold': detector.threshold,
+        'false_accept_rate': false_accept,
+        'false_reject_rate': false_reject,
+        'equal_error': {'threshold': equal_error[0], 'false_accept_rate': equal_error[1],
+                        'false_reject_rate': equal_error[2]} if equal_error else None,
+        'cpu_seconds': cpu,
+        'audio_seconds': audio_seconds,
+        'cpu_percent_of_one_core': 100 * cpu / audio_seconds if audio_seconds else None,
+        'phrases': phrases_total,
+        'recognizer_calls': calls,
+    }
+    print(f"🎯 Threshold {detector.threshold:.2f}: false accepts {false_accept:.1%}, false rejects {false_reject:.1%}")
+    if equal_error:
+        print(f"   Equal error around {equal_error[0]:.2f}: FA {equal_error[1]:.1%} / FR {equal_error[2]:.1%}")
+    print(f"⚙ Gate CPU: {cpu * 1000:.0f} ms for {audio_seconds:.0f} s of audio "
+          f"({summary['cpu_percent_of_one_core']:.2f}% of one core)")
+    print(f"📞 Recognizer calls: {calls} instead of {phrases_total} phrases")
+    write_results(args.results, {'summary': summary, 'clips': records})
+    print(f"💾 Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import collections
+import hashlib
+import threading
+import time
+
+from intents import TOKEN_PATTERN
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, maxsize=256, ttl=3600, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = collections.OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if self.clock() >= expires_at:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        item = self._data.get(key)
+        return item is not None and self.clock() < item[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+def normalize_transcript(text):
+    """Cache key for a transcript: lowercase words without punctuation or extra spaces"""
+    return ' '.join(TOKEN_PATTERN.findall(text.lower()))
+
+
+def audio_fingerprint(audio):
+    """Exact key for an AudioData: a digest of its samples plus the format they are in
+
+    Only a replay of the very same audio matches. Two live utterances of
+    equal length never do, however alike they sound.
+    """
+    return audio.sample_rate, audio.sample_width, hashlib.blake2b(audio.frame_data, digest_size=16).digest()
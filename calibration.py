@@ -0,0 +1,101 @@
+import audioop
+import json
+import os
+import time
+
+from tts import CACHE_ROOT
+
+# Where profiles were kept before they moved into the session log
+PROFILE_PATH = os.path.join(CACHE_ROOT, 'noise_profile.json')
+
+
+def load_profile(log, path=PROFILE_PATH):
+    """Noise profile saved by the previous session, or {} on first run"""
+    if log.calibration:
+        return log.calibration
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def apply_profile(profile, recognizer, segmenter):
+    """Start from last session's levels so listening can begin before calibration finishes"""
+    if 'energy_threshold' in profile:
+        recognizer.energy_threshold = profile['energy_threshold']
+    if profile.get('noise_floor') is not None and hasattr(segmenter, 'noise_floor'):
+        segmenter.noise_floor = profile['noise_floor']
+
+
+class BackgroundCalibration:
+    """Learns the ambient noise level from the first seconds the pipeline captures
+
+    Replaces the blocking adjust_for_ambient_noise(duration=2) call: the
+    segmenter stage (or a TappedStream, for Recognizer.listen) feeds it
+    chunks while the assistant is already listening, and once enough quiet
+    audio has been seen the result is applied and saved for the next start-up.
+    """
+
+    def __init__(self, recognizer, segmenter, sample_rate, sample_width, chunk_size,
+                 duration=2.0, minimum_threshold=300, log=None):
+        self.recognizer = recognizer
+        self.segmenter = segmenter
+        self.sample_width = sample_width
+        self.seconds_per_buffer = chunk_size / sample_rate
+        self.duration = duration
+        self.minimum_threshold = minimum_threshold
+        self.log = log  # SessionLog the result is saved to for the next start-up
+        self.energies = []
+        self.done = False
+
+    def feed(self, chunk):
+        if self.done:
+            return
+        energy = audioop.rms(chunk, self.sample_width)
+        # Speech says nothing about the ambient level; without a segmenter, speech is what would start a phrase
+        if self.segmenter.in_phrase if self.segmenter is not None else energy > self.recognizer.energy_threshold:
+            return
+        self.energies.append(energy)
+        if len(self.energies) * self.seconds_per_buffer >= self.duration:
+            self.finish()
+
+    def finish(self):
+        # Same asymmetric weighted average as Recognizer.adjust_for_ambient_noise
+        r = self.recognizer
+        damping = r.dynamic_energy_adjustment_damping ** self.seconds_per_buffer
+        threshold = r.energy_threshold
+        for energy in self.energies:
+            threshold = threshold * damping + energy * r.dynamic_energy_ratio * (1 - damping)
+        threshold = max(threshold, self.minimum_threshold)
+        if not hasattr(self.segmenter, 'noise_floor'):
+            r.energy_threshold = threshold
+        self.done = True
+        if self.log is not None:
+            self.log.record_calibration({
+                'energy_threshold': threshold,
+                'noise_floor': getattr(self.segmenter, 'noise_floor', None),
+                'saved_at': time.time(),
+            })
+        print(f"✅ Microphone calibrated in the background. Energy threshold: {threshold:.0f}")
+
+
+class TappedStream:
+    """A source's stream that also hands every chunk read from it to feed
+
+    Background calibration for code that listens with Recognizer.listen
+    rather than through the capture pipeline.
+    """
+
+    def __init__(self, stream, feed):
+        self.stream = stream
+        self.feed = feed
+
+    def read(self, size):
+        data = self.stream.read(size)
+        if data:
+            self.feed(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
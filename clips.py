@@ -0,0 +1,75 @@
+"""One phrase's audio, shared by every stage that reads it
+
+A Clip is an sr.AudioData over a view of the segmenter's phrase buffer.
+The wake gate, the fingerprint and every recognizer read the same samples,
+and each encoding a recognizer asks for (FLAC for Google, 16 kHz PCM for
+Sphinx) is made once per clip: the en-US and en-IN attempts send the same
+FLAC bytes instead of running the encoder twice.
+"""
+import threading
+
+import speech_recognition as sr
+
+import metrics
+
+
+class Clip(sr.AudioData):
+    """AudioData whose samples are shared, not copied, and whose encodings are memoized"""
+
+    def __init__(self, frame_data, sample_rate, sample_width):
+        super().__init__(frame_data, sample_rate, sample_width)
+        self._encoded = {}  # (format, rate, width) -> [lock, bytes]
+        self._lock = threading.Lock()
+        self.encodings = self.reused = 0
+
+    @classmethod
+    def of(cls, audio):
+        """audio itself if it is already a Clip, else a Clip over the same frame data"""
+        if isinstance(audio, cls):
+            return audio
+        return cls(audio.frame_data, audio.sample_rate, audio.sample_width)
+
+    def _memo(self, key, encode):
+        with self._lock:
+            slot = self._encoded.setdefault(key, [threading.Lock(), None])
+        # Backends racing on the same clip wait for the first one's encoding rather than redo it
+        with slot[0]:
+            if slot[1] is None:
+                with metrics.span('encode', format=key[0]):
+                    slot[1] = encode()
+                self.encodings += 1
+            else:
+                self.reused += 1
+            return slot[1]
+
+    def get_raw_data(self, convert_rate=None, convert_width=None):
+        if (convert_rate in (None, self.sample_rate) and convert_width in (None, self.sample_width)
+                and self.sample_width != 1):
+            return self.frame_data  # Nothing to convert: the shared samples themselves
+        return self._memo(('raw', convert_rate, convert_width),
+                          lambda: super(Clip, self).get_raw_data(convert_rate, convert_width))
+
+    def get_wav_data(self, convert_rate=None, convert_width=None):
+        return self._memo(('wav', convert_rate, convert_width),
+                          lambda: super(Clip, self).get_wav_data(convert_rate, convert_width))
+
+    def get_aiff_data(self, convert_rate=None, convert_width=None):
+        return self._memo(('aiff', convert_rate, convert_width),
+                          lambda: super(Clip, self).get_aiff_data(convert_rate, convert_width))
+
+    def get_flac_data(self, convert_rate=None, convert_width=None):
+        return self._memo(('flac', convert_rate, convert_width),
+                          lambda: super(Clip, self).get_flac_data(convert_rate, convert_width))
+
+    def get_segment(self, start_ms=None, end_ms=None):
+        segment = super().get_segment(start_ms, end_ms)
+        return Clip(segment.frame_data, segment.sample_rate, segment.sample_width)
+
+    def tail(self, start):
+        """The clip from sample `start` on, over the same buffer"""
+        return Clip(memoryview(self.frame_data)[start * self.sample_width:], self.sample_rate, self.sample_width)
+
+    def stats(self):
+        return {'encodings': self.encodings, 'reused': self.reused,
+                'formats': sorted(f"{kind}:{rate or self.sample_rate}:{width or self.sample_width}"
+                                  for kind, rate, width in self._encoded)}
@@ -0,0 +1,127 @@
+import collections
+import math
+import re
+
+_NOT_ALNUM = re.compile(r'[^a-z0-9]+')
+
+# Metaphone-style rewrites, applied in order to a squashed lowercase name
+_PHONETIC_RULES = [(re.compile(pattern), replacement) for pattern, replacement in (
+    (r'^(kn|gn|pn|wr|ps)', lambda m: m.group()[1]),
+    (r'^wh', 'w'),
+    (r'^x', 's'),
+    (r'x', 'ks'),
+    (r'ph', 'f'),
+    (r'ck', 'k'),
+    (r'sch', 'sk'),
+    (r'ch(?=r)', 'k'),
+    (r'(sh|tch|ch)', 'x'),
+    (r'th', '0'),
+    (r'gh(?![aeiou])', ''),
+    (r'dg(?=[eiy])', 'j'),
+    (r'g(?=[eiy])', 'j'),
+    (r'c(?=[eiy])', 's'),
+    (r'[cq]', 'k'),
+    (r'z', 's'),
+    (r'v', 'f'),
+    (r'd', 't'),
+    (r'(?<=.)h', ''),
+    (r'[wy](?![aeiou])', ''),
+)]
+_VOWELS = re.compile(r'[aeiou]')
+_REPEATS = re.compile(r'(.)\1+')
+
+# Share of the score that comes from sounding alike rather than being spelt alike
+PHONETIC_WEIGHT = 0.6
+
+
+def squash(text):
+    """Lowercase text without spaces or punctuation: "V L C" and "vlc" become the same"""
+    return _NOT_ALNUM.sub('', text.lower())
+
+
+def phonetic_key(text):
+    """Consonant skeleton of text, so "what's up" and "WhatsApp" share a key"""
+    word = squash(text)
+    if not word:
+        return ''
+    for pattern, replacement in _PHONETIC_RULES:
+        word = pattern.sub(replacement, word)
+    if not word:
+        return ''
+    # Keep a leading vowel, drop the others and collapse doubled sounds
+    return _REPEATS.sub(r'\1', word[0] + _VOWELS.sub('', word[1:]))
+
+
+def ngrams(text, n=3):
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class _GramIndex:
+    """Inverted n-gram index for Dice similarity with prefix filtering"""
+
+    def __init__(self, strings, n=3):
+        self.n = n
+        self.grams = [frozenset(ngrams(string, n)) for string in strings]
+        self.postings = collections.defaultdict(list)
+        for i, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings[gram].append(i)
+
+    def candidates(self, grams, threshold):
+        """Ids of every key that could reach a Dice coefficient of threshold with grams
+
+        Such a key shares at least `needed` n-grams with the query, so it must
+        contain one of the query's q - needed + 1 rarest n-grams; the long
+        posting lists of common n-grams are never read.
+        """
+        needed = max(1, math.ceil(threshold * len(grams) / (2 - threshold) - 1e-9))
+        rarest = sorted(grams, key=lambda gram: len(self.postings.get(gram, ())))
+        found = set()
+        for gram in rarest[:max(1, len(grams) - needed + 1)]:
+            found.update(self.postings.get(gram, ()))
+        return found
+
+    def dice(self, i, grams):
+        key_grams = self.grams[i]
+        return 2 * len(grams & key_grams) / (len(grams) + len(key_grams))
+
+
+class FuzzyIndex:
+    """Precomputed spelling and sound index over a fixed set of names
+
+    Built once; a lookup scores only the few names that can still reach the
+    cutoff, so it stays well under a millisecond with thousands of names.
+    """
+
+    def __init__(self, keys, n=3):
+        self.keys = list(dict.fromkeys(keys))
+        self._spelling = _GramIndex([squash(key) for key in self.keys], n)
+        self._sound = _GramIndex([phonetic_key(key) for key in self.keys], n)
+
+    def match(self, query, cutoff=0.0, prior=None):
+        """(key, score in 0-1) of the closest name scoring at least cutoff, or (None, 0.0)
+
+        prior(key), if given, is a small bonus that only decides the ranking
+        among candidates; the score returned is the match score alone.
+        """
+        squashed = squash(query)
+        if not squashed:
+            return None, 0.0
+        spelling = ngrams(squashed, self._spelling.n)
+        sound = ngrams(phonetic_key(query), self._sound.n)
+        # Sounding alike can only make up PHONETIC_WEIGHT of the score
+        sound_cutoff = max(0.0, (cutoff - (1 - PHONETIC_WEIGHT)) / PHONETIC_WEIGHT)
+        candidates = self._spelling.candidates(spelling, cutoff) | self._sound.candidates(sound, sound_cutoff)
+
+        best, best_rank = None, None
+        for i in candidates:
+            spelt = self._spelling.dice(i, spelling)
+            score = max(spelt, (1 - PHONETIC_WEIGHT) * spelt + PHONETIC_WEIGHT * self._sound.dice(i, sound))
+            # Equal scores go to the name closest in length to what was said
+            rank = (score + (prior(self.keys[i]) if prior else 0.0), -abs(len(self.keys[i]) - len(query)), score)
+            if score >= cutoff and (best_rank is None or rank > best_rank):
+                best, best_rank = i, rank
+        if best is None:
+            return None, 0.0
+        return self.keys[best], best_rank[2]
@@ -0,0 +1,125 @@
+import re
+
+# Utterances are matched on whole words only, so "this" no longer triggers "hi"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens with their character spans"""
+    return [(m.group(), m.start(), m.end()) for m in TOKEN_PATTERN.finditer(text.lower())]
+
+
+class Intent:
+    """A named command with its trigger words/phrases and a routing priority"""
+
+    def __init__(self, name, triggers, priority=0):
+        self.name = name
+        self.triggers = list(triggers)
+        self.priority = priority
+
+    def __repr__(self):
+        return f"Intent({self.name!r}, priority={self.priority})"
+
+
+class Match:
+    """Result of classifying an utterance"""
+
+    def __init__(self, intent, trigger, text, first, last):
+        self.intent = intent
+        self.trigger = trigger
+        self.text = text
+        self.first = first  # Token indices covered by the trigger
+        self.last = last
+
+    @property
+    def name(self):
+        return self.intent.name
+
+    @property
+    def start(self):
+        """Character offset where the trigger begins"""
+        return tokenize(self.text)[self.first][1]
+
+    @property
+    def end(self):
+        """Character offset just past the trigger"""
+        return tokenize(self.text)[self.last][2]
+
+    def __repr__(self):
+        return f"Match({self.intent.name!r}, trigger={self.trigger!r})"
+
+
+class IntentRouter:
+    """Compiles every trigger into one token trie and classifies in a single pass"""
+
+    def __init__(self, intents=()):
+        self.intents = {}
+        self._trie = {}
+        self._max_depth = 0
+        for intent in intents:
+            self.add(intent)
+
+    def add(self, intent):
+        """Register an intent and compile its triggers into the trie"""
+        if intent.name in self.intents:
+            raise ValueError(f"Intent {intent.name!r} is already registered")
+        self.intents[intent.name] = intent
+        for trigger in intent.triggers:
+            words = [word for word, _, _ in tokenize(trigger)]
+            if not words:
+                continue
+            node = self._trie
+            for word in words:
+                node = node.setdefault(word, {})
+            # A phrase shared by two intents resolves to the higher priority one
+            current = node.get(None)
+            if current is None or intent.priority > current[0].priority:
+                node[None] = (intent, trigger)
+            self._max_depth = max(self._max_depth, len(words))
+        return intent
+
+    def classify(self, text):
+        """Return the best Match for text, or None when no trigger is present"""
+        words = TOKEN_PATTERN.findall(text.lower())
+        trie = self._trie
+        depth = self._max_depth
+        count = len(words)
+        best = None
+        best_priority = best_first = best_last = -1
+        for i in range(count):
+            node = trie.get(words[i])
+            j = i
+            while node is not None:
+                hit = node.get(None)
+                if hit is not None:
+                    priority = hit[0].priority
+                    # Highest priority wins; ties go to the earliest, then longest, trigger
+                    if priority > best_priority or (priority == best_priority and i == best_first):
+                        best, best_priority, best_first, best_last = hit, priority, i, j
+                j += 1
+                if j >= count or j - i >= depth:
+                    break
+                node = node.get(words[j])
+        if best is None:
+            return None
+        return Match(best[0], best[1], text, best_first, best_last)
+
+
+# Built-in command grammar for process_command, highest priority first
+INTENTS = [
+    Intent('open', ['open'], priority=90),
+    Intent('search', ['search', 'google', 'find'], priority=80),
+    Intent('weather', ['weather'], priority=75),
+    Intent('news', ['news'], priority=75),
+    Intent('social', ['facebook', 'instagram', 'twitter'], priority=75),
+    Intent('music', ['music', 'song', 'play'], priority=70),
+    Intent('time', ['time', 'clock'], priority=50),
+    Intent('how_are_you', ['how are you', 'how do you do', 'how are things'], priority=45),
+    Intent('date', ['date', 'today', 'day'], priority=40),
+    Intent('help', ['help', 'what can you do'], priority=30),
+    Intent('thanks', ['thank you', 'thanks', 'appreciate'], priority=20),
+    Intent('exit', ['goodbye', 'bye', 'stop assistant', 'quit', 'exit'], priority=15),
+    Intent('greeting', ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening'], priority=10),
+]
+
+router = IntentRouter(INTENTS)
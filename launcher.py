@@ -0,0 +1,281 @@
+import concurrent.futures
+import functools
+import os
+import platform
+import queue
+import shutil
+import signal
+import subprocess
+import threading
+import time
+
+import metrics
+
+SYSTEM = platform.system().lower()
+
+STARTED = 'started'
+RUNNING = 'running'  # Already up; nothing was spawned
+FAILED = 'failed'
+
+_STOP = object()
+
+
+def _normalize_process(name):
+    name = os.path.basename(name).lower()
+    if name.endswith(('.exe', '.app')):
+        name = name[:-4]
+    return name[:15]  # Linux keeps only 15 characters of a process name
+
+
+def process_names(entry):
+    """Process names an application entry shows up as in the process table"""
+    if entry.kind == 'mac':
+        return {_normalize_process(entry.target)}
+    if entry.kind == 'exec' and entry.command:
+        return {_normalize_process(entry.command[0])}
+    return {_normalize_process(entry.name)}
+
+
+def running_processes():
+    """Normalized names of every visible process (empty if the table can't be read)"""
+    try:
+        import psutil
+        return {_normalize_process(p.info['name']) for p in psutil.process_iter(['name']) if p.info['name']}
+    except ImportError:
+        pass
+    names = set()
+    if os.path.isdir('/proc'):
+        for pid in os.listdir('/proc'):
+            if pid.isdigit():
+                try:
+                    with open(f'/proc/{pid}/comm', encoding='utf-8', errors='ignore') as f:
+                        names.add(_normalize_process(f.read().strip()))
+                except OSError:
+                    continue
+        return names
+    try:
+        if SYSTEM == 'windows':
+            output = subprocess.run(['tasklist', '/fo', 'csv', '/nh'], capture_output=True, text=True).stdout
+            names = {_normalize_process(line.split('","')[0].strip('"')) for line in output.splitlines() if line}
+        else:
+            output = subprocess.run(['ps', '-axco', 'comm'], capture_output=True, text=True).stdout
+            names = {_normalize_process(line.strip()) for line in output.splitlines()[1:] if line.strip()}
+    except OSError:
+        pass
+    return names
+
+
+def cpu_seconds(pid):
+    """CPU time a process has used so far, or None where that can't be read"""
+    try:
+        import psutil
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f'/proc/{pid}/stat', encoding='utf-8') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _wmctrl():
+    return shutil.which('wmctrl')
+
+
+def window_pids():
+    """Pids owning a top-level window, or None without a way to list windows"""
+    if not os.environ.get('DISPLAY') or _wmctrl() is None:
+        return None
+    try:
+        output = subprocess.run([_wmctrl(), '-lp'], capture_output=True, text=True, timeout=1).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return {int(line.split()[2]) for line in output.splitlines() if len(line.split()) > 2}
+
+
+class _Child:
+    """A spawned application we still have to reap (and maybe see come up)"""
+
+    def __init__(self, entry, process, names, spawned, future=None):
+        self.entry = entry
+        self.process = process
+        self.names = names
+        self.spawned = spawned
+        self.future = future  # The launch() request that spawned it, for cancel()
+        self.ready = False
+        self.last_cpu = None
+
+
+class Launcher:
+    """Starts applications on a worker thread, reaps them and times how long they take to come up
+
+    "Ready" is the first of: a window owned by the process appears (with
+    wmctrl), its start-up CPU burst settles, or a hand-off launcher such as
+    `open -a` exits cleanly. Latencies go to metrics as app_launch spans.
+    """
+
+    def __init__(self, poll=0.1, ready_timeout=30.0, settle_cpu=0.02, min_ready=0.3, window_poll=0.25):
+        self.poll = poll
+        self.window_poll = window_poll  # Seconds between window listings; each one runs wmctrl
+        self.ready_timeout = ready_timeout
+        self.settle_cpu = settle_cpu  # CPU seconds per poll below which start-up is over
+        self.min_ready = min_ready
+        self._queue = queue.Queue()
+        self._children = []
+        self._windows = None
+        self._windows_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.launched = self.deduped = self.failed = self.reaped = self.cancelled = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="app-launcher", daemon=True)
+                self._thread.start()
+        return self
+
+    def launch(self, entry):
+        """Queue entry for launching; the Future resolves to STARTED, RUNNING or FAILED"""
+        self.start()
+        future = concurrent.futures.Future()
+        self._queue.put((entry, future, time.perf_counter()))
+        return future
+
+    def cancel(self, future):
+        """Take back a launch(): drop it if it hasn't run yet, else stop the process it spawned
+
+        A launch that found the application already running spawned nothing,
+        so nothing is stopped.
+        """
+        if future.cancel():
+            self.cancelled += 1
+            return
+        self._queue.put((None, future, time.perf_counter()))
+
+    def shutdown(self):
+        """Stop the worker; applications it started keep running"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=self.poll if self._children else None)
+            except queue.Empty:
+                job = None
+            if job is _STOP:
+                return
+            if job is not None:
+                entry, future, queued = job
+                if entry is None:
+                    self._withdraw(future)
+                elif future.set_running_or_notify_cancel():  # False once cancel() got to it first
+                    try:
+                        future.set_result(self._start(entry, queued, future))
+                    except Exception as e:
+                        self.failed += 1
+                        print(f"Error opening {entry.name}: {e}")
+                        future.set_result(FAILED)
+            self._tick()
+
+    def _withdraw(self, future):
+        for child in self._children:
+            if child.future is future and child.process.poll() is None:
+                try:
+                    if SYSTEM == 'windows':
+                        child.process.terminate()
+                    else:
+                        os.killpg(child.process.pid, signal.SIGTERM)  # Its own session, helpers included
+                except OSError:
+                    pass  # Exited in the meantime
+                self.cancelled += 1
+                metrics.record('app_launch', time.perf_counter() - child.spawned,
+                               {'app': child.entry.name, 'stage': 'cancel'})
+
+    def _start(self, entry, queued, future=None):
+        names = process_names(entry)
+        # Our own still-running child, or anything in the process table by that name
+        mine = any(child.names == names and child.process.poll() is None for child in self._children)
+        if mine or names & running_processes():
+            self.deduped += 1
+            metrics.record('app_launch', time.perf_counter() - queued, {'app': entry.name, 'stage': 'spawn',
+                                                                        'status': RUNNING})
+            return RUNNING
+
+        if entry.kind == 'uri':
+            os.startfile(entry.target)  # Windows protocol handler, no shell involved
+            process = None
+        else:
+            process = subprocess.Popen(entry.command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.DEVNULL, start_new_session=SYSTEM != 'windows')
+        spawned = time.perf_counter()
+        self.launched += 1
+        metrics.record('app_launch', spawned - queued, {'app': entry.name, 'stage': 'spawn', 'status': STARTED})
+        if process is not None:
+            self._children.append(_Child(entry, process, names, spawned, future))
+        return STARTED
+
+    def _ready(self, child, probe):
+        child.ready = True
+        metrics.record('app_launch', time.perf_counter() - child.spawned,
+                       {'app': child.entry.name, 'stage': 'ready', 'probe': probe})
+
+    def _window_pids(self, now):
+        """window_pids(), listed again at most every window_poll seconds"""
+        if self._windows_at is None or now - self._windows_at >= self.window_poll:
+            self._windows, self._windows_at = window_pids(), now
+        return self._windows
+
+    def _tick(self):
+        """Reap exited children and check on the ones still starting up"""
+        now = time.perf_counter()
+        for child in list(self._children):
+            code = child.process.poll()
+            if code is not None:
+                self._children.remove(child)
+                self.reaped += 1
+                if not child.ready:
+                    if code == 0:
+                        self._ready(child, 'exit')  # Handed off to an already running instance
+                    else:
+                        metrics.record('app_launch', now - child.spawned,
+                                       {'app': child.entry.name, 'stage': 'ready', 'status': 'error'})
+                continue
+            if child.ready:
+                continue
+            if now - child.spawned > self.ready_timeout:
+                child.ready = True
+                metrics.record('app_launch', now - child.spawned,
+                               {'app': child.entry.name, 'stage': 'ready', 'status': 'timeout'})
+                continue
+            windows = self._window_pids(now)
+            if windows is not None:
+                if child.process.pid in windows:
+                    self._ready(child, 'window')
+                continue
+            cpu = cpu_seconds(child.process.pid)
+            settled = (cpu is not None and child.last_cpu is not None
+                       and cpu - child.last_cpu < self.settle_cpu and now - child.spawned >= self.min_ready)
+            child.last_cpu = cpu
+            if settled:
+                self._ready(child, 'cpu')
+
+    def stats(self):
+        return {
+            'launched': self.launched,
+            'deduped': self.deduped,
+            'failed': self.failed,
+            'reaped': self.reaped,
+            'cancelled': self.cancelled,
+            'children': len(self._children),
+            'starting': sum(1 for child in self._children if not child.ready),
+        }
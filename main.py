@@ -1,26 +1,103 @@
-import speech_recognition as sr
-import pyttsx3
+import contextvars
+import importlib.util
 import time
-import subprocess
-import webbrowser
-import os
-import platform
 import datetime
+import os
 import random
+import threading
+
+import apps
+import cache
+import calibration
+import intents
+import metrics
+import pipeline
+import plugins
+import recognition
+import retry
+import sessionlog
+import speculation
+import tts
+from lazy import Lazy, LazyModule
+
+# speech_recognition pulls in urllib/http/email; only load it when we actually listen
+sr = LazyModule('speech_recognition')
+webbrowser = LazyModule('webbrowser')
+clips = LazyModule('clips')
+
+# Speech output runs on its own thread so the microphone is never deaf while talking
+voice = tts.SpeechWorker(rate=180, volume=0.9, phrase_cache=tts.PhraseCache())
+# Keeps the assistant from hearing itself: its replies neither barge in nor get recognized
+echo_guard = tts.EchoGuard(voice.speaking)
+
+SYSTEM = apps.SYSTEM
+
+# How concurrent recognizer results are picked: ordered, first, confidence or quorum
+RECOGNITION_POLICY = recognition.ORDERED
+_dispatchers = {}
+
+# Recognizer chain: 'online' (Google first, Sphinx dictation last), 'offline_first' (Sphinx against
+# the command grammar, Google only when it is unsure) or 'offline' (never touches the network).
+# The offline modes need pocketsphinx.
+RECOGNITION_MODE = 'online'
+
+# Names handle_open knows besides the launch table, for the offline command grammar
+OPEN_TARGETS = ['youtube', 'gmail', 'email', 'whatsapp', 'calculator']
+
+# Rescored confidence at which the primary recognizer's answer is taken without asking the fallbacks
+CONFIDENT = 0.8
 
-# Initialize TTS engine with better settings
-engine = pyttsx3.init()
-engine.setProperty('rate', 180)  # Slower, clearer speech
-engine.setProperty('volume', 0.9)  # Louder volume
+# Phrase endpointing: 'vad' (adaptive, needs NumPy) or 'energy' (Recognizer.listen rules)
+ENDPOINTER = 'vad'
 
-# Get system information
-SYSTEM = platform.system().lower()
+# Wake word in front of recognition: 'mfcc' (templates from `python wakeword.py enroll`),
+# 'sphinx' (keyphrase search for WAKE_PHRASE), 'auto' (mfcc once enrolled) or None
+WAKE_WORD = 'auto'
+WAKE_PHRASE = 'computer'
 
-def speak(text):
-    """Enhanced text-to-speech with better pronunciation"""
+# Start a launch (or render a reply) from partial transcripts before the phrase has ended, and undo it
+# if the final transcript disagrees. Partials come from a local decoder, so this needs pocketsphinx;
+# it stays off behind a wake word, where a partial can't tell whether the phrase was meant for us.
+SPECULATE = True
+SPECULATION_HOLD = 0.25  # Seconds of audio a partial's action must hold steady before it is started
+
+# Failed turns back off with jitter, and the same apology is not repeated within PROMPT_INTERVAL seconds
+retry_policy = retry.RetryPolicy(attempts=5, budget=20.0)
+PROMPT_INTERVAL = 10.0
+prompt_limiter = retry.PromptLimiter(interval=PROMPT_INTERVAL)
+
+# Repeated commands skip routing, replayed audio skips recognition
+command_cache = cache.TTLCache(maxsize=256, ttl=24 * 3600)
+audio_cache = cache.TTLCache(maxsize=128, ttl=3600)
+
+# Turns, the noise profile and app usage, kept across runs; opened by main()
+session_log = sessionlog.SessionLog()
+
+# Extra commands from plugin manifests; their code is imported on first use
+plugin_registry = plugins.PluginRegistry()
+
+# Set while a server session runs a command, so replies and actions go back to that client
+current_session = contextvars.ContextVar('current_session', default=None)
+
+def speak(text, priority=tts.NORMAL, block=False):
+    """Queue text for speech without waiting for playback to finish"""
+    session = current_session.get()
+    if session is not None:
+        return session.say(text)
     print(f"🤖 Assistant: {text}")
-    engine.say(text)
-    engine.runAndWait()
+    return voice.say(text, priority=priority, block=block)
+
+def prompt(key):
+    """Speak PROMPTS[key] unless it, or another prompt, was said a moment ago"""
+    if prompt_limiter.allow(key):
+        speak(PROMPTS[key])
+
+def open_url(url):
+    """Open url in the local browser, or hand it to the remote client"""
+    session = current_session.get()
+    if session is not None:
+        return session.open_url(url)
+    return webbrowser.open(url)
 
 def setup_microphone_calibration(recognizer, source):
     """One-time microphone setup for better recognition"""
@@ -28,76 +105,31 @@ def setup_microphone_calibration(recognizer, source):
     recognizer.adjust_for_ambient_noise(source, duration=2)
     print(f"✅ Microphone calibrated. Energy threshold: {recognizer.energy_threshold}")
 
-def open_application(app_name):
-    """Open applications based on the operating system"""
+def open_application(app_name, on_failure=None):
+    """Open applications using the launch table resolved at startup
+
+    The launch isn't waited for. If it fails, on_failure() is called later,
+    from the launcher's thread; by default the user is told.
+    """
     app_name = app_name.lower()
     
-    try:
-        if SYSTEM == "windows":
-            # Windows applications
-            apps = {
-                'youtube': lambda: webbrowser.open('https://www.youtube.com'),
-                'whatsapp': lambda: subprocess.Popen(['start', 'whatsapp:'], shell=True),
-                'calculator': lambda: subprocess.Popen(['calc.exe']),
-                'gmail': lambda: webbrowser.open('https://mail.google.com'),
-                'chrome': lambda: subprocess.Popen(['chrome.exe']),
-                'notepad': lambda: subprocess.Popen(['notepad.exe']),
-                'file explorer': lambda: subprocess.Popen(['explorer.exe']),
-                'control panel': lambda: subprocess.Popen(['control.exe']),
-                'paint': lambda: subprocess.Popen(['mspaint.exe']),
-                'word': lambda: subprocess.Popen(['winword.exe']),
-                'excel': lambda: subprocess.Popen(['excel.exe']),
-                'powerpoint': lambda: subprocess.Popen(['powerpnt.exe']),
-                'spotify': lambda: subprocess.Popen(['spotify.exe']),
-                'discord': lambda: subprocess.Popen(['discord.exe']),
-                'steam': lambda: subprocess.Popen(['steam.exe']),
-                'vlc': lambda: subprocess.Popen(['vlc.exe']),
-                'firefox': lambda: webbrowser.get('firefox').open(''),
-                'edge': lambda: subprocess.Popen(['msedge.exe']),
-            }
-        
-        elif SYSTEM == "darwin":  # macOS
-            apps = {
-                'youtube': lambda: webbrowser.open('https://www.youtube.com'),
-                'whatsapp': lambda: subprocess.Popen(['open', '-a', 'WhatsApp']),
-                'calculator': lambda: subprocess.Popen(['open', '-a', 'Calculator']),
-                'gmail': lambda: webbrowser.open('https://mail.google.com'),
-                'safari': lambda: subprocess.Popen(['open', '-a', 'Safari']),
-                'chrome': lambda: subprocess.Popen(['open', '-a', 'Google Chrome']),
-                'finder': lambda: subprocess.Popen(['open', '-a', 'Finder']),
-                'textedit': lambda: subprocess.Popen(['open', '-a', 'TextEdit']),
-                'spotify': lambda: subprocess.Popen(['open', '-a', 'Spotify']),
-                'discord': lambda: subprocess.Popen(['open', '-a', 'Discord']),
-                'vlc': lambda: subprocess.Popen(['open', '-a', 'VLC']),
-            }
-        
-        else:  # Linux
-            apps = {
-                'youtube': lambda: webbrowser.open('https://www.youtube.com'),
-                'whatsapp': lambda: subprocess.Popen(['whatsapp-desktop']),
-                'calculator': lambda: subprocess.Popen(['gnome-calculator']),
-                'gmail': lambda: webbrowser.open('https://mail.google.com'),
-                'firefox': lambda: subprocess.Popen(['firefox']),
-                'chrome': lambda: subprocess.Popen(['google-chrome']),
-                'file manager': lambda: subprocess.Popen(['nautilus']),
-                'terminal': lambda: subprocess.Popen(['gnome-terminal']),
-                'text editor': lambda: subprocess.Popen(['gedit']),
-                'spotify': lambda: subprocess.Popen(['spotify']),
-                'discord': lambda: subprocess.Popen(['discord']),
-                'vlc': lambda: subprocess.Popen(['vlc']),
-            }
-        
-        # Try to find and open the application
-        for key, func in apps.items():
-            if key in app_name or app_name in key:
-                func()
-                return True
-        
-        return False
-        
-    except Exception as e:
-        print(f"Error opening {app_name}: {e}")
+    entry = apps.find_app(app_name)
+    if entry is None or not entry.available:
         return False
+    session = current_session.get()
+    if session is not None:
+        return session.open_app(entry.name)
+    
+    if on_failure is None:
+        def on_failure():
+            speak(f"Sorry, {entry.name} didn't start.")
+    with metrics.span('open_application', app=entry.name) as span:
+        try:
+            return apps.launch(entry, on_failure)
+        except Exception as e:
+            span.labels['status'] = 'error'
+            print(f"Error opening {app_name}: {e}")
+            return False
 
 def get_time():
     """Get current time"""
@@ -109,145 +141,44 @@ def get_date():
     now = datetime.datetime.now()
     return now.strftime("%A, %B %d, %Y")
 
-def process_command(text):
-    """Process voice commands and respond accordingly"""
-    text = text.lower().strip()
-    
-    # Greeting responses
-    if any(word in text for word in ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']):
-        greetings = [
-            "Hello! How can I help you today?",
-            "Hi there! What can I do for you?",
-            "Hey! I'm here to assist you.",
-            "Good to hear from you! How may I help?",
-            "Hello! Ready to help with whatever you need."
-        ]
-        speak(random.choice(greetings))
-        return True
-    
-    # How are you responses
-    elif any(phrase in text for phrase in ['how are you', 'how do you do', 'how are things']):
-        responses = [
-            "I'm doing great, thank you for asking! How are you?",
-            "I'm functioning perfectly and ready to help!",
-            "All systems running smoothly! How can I assist you today?",
-            "I'm excellent, thanks! What would you like me to do?"
-        ]
-        speak(random.choice(responses))
-        return True
-    
-    # Thank you responses
-    elif any(word in text for word in ['thank you', 'thanks', 'appreciate']):
-        responses = [
-            "You're very welcome!",
-            "Happy to help!",
-            "My pleasure!",
-            "Anytime! That's what I'm here for."
-        ]
-        speak(random.choice(responses))
-        return True
-    
-    # Open applications
-    elif 'open' in text:
-        # Extract app name after 'open'
-        parts = text.split('open', 1)
-        if len(parts) > 1:
-            app_name = parts[1].strip()
-            
-            # Handle special cases
-            if 'youtube' in app_name:
-                webbrowser.open('https://www.youtube.com')
-                speak("Opening YouTube for you.")
-                return True
-            elif 'gmail' in app_name or 'email' in app_name:
-                webbrowser.open('https://mail.google.com')
-                speak("Opening Gmail for you.")
-                return True
-            elif 'whatsapp' in app_name:
-                if open_application('whatsapp'):
-                    speak("Opening WhatsApp.")
-                else:
-                    webbrowser.open('https://web.whatsapp.com')
-                    speak("Opening WhatsApp Web.")
-                return True
-            elif 'calculator' in app_name:
-                if open_application('calculator'):
-                    speak("Opening calculator.")
-                else:
-                    speak("Sorry, I couldn't open the calculator.")
-                return True
-            else:
-                # Try to open any other application
-                if open_application(app_name):
-                    speak(f"Opening {app_name}.")
-                else:
-                    speak(f"Sorry, I couldn't find or open {app_name}. Let me try opening it in the browser.")
-                    try:
-                        webbrowser.open(f"https://www.google.com/search?q={app_name}")
-                    except:
-                        pass
-                return True
-    
-    # Time and date queries
-    elif any(word in text for word in ['time', 'clock']):
-        current_time = get_time()
-        speak(f"The current time is {current_time}")
-        return True
-    
-    elif any(word in text for word in ['date', 'today', 'day']):
-        current_date = get_date()
-        speak(f"Today is {current_date}")
-        return True
-    
-    # Search queries
-    elif any(word in text for word in ['search', 'google', 'find']):
-        query = text.replace('search', '').replace('google', '').replace('find', '').strip()
-        if query:
-            webbrowser.open(f"https://www.google.com/search?q={query}")
-            speak(f"Searching for {query} on Google.")
-        else:
-            speak("What would you like me to search for?")
-        return True
-    
-    # Weather (opens weather website)
-    elif 'weather' in text:
-        webbrowser.open('https://www.weather.com')
-        speak("Opening weather information for you.")
-        return True
-    
-    # News
-    elif 'news' in text:
-        webbrowser.open('https://news.google.com')
-        speak("Opening Google News for you.")
-        return True
-    
-    # Music
-    elif any(word in text for word in ['music', 'song', 'play']):
-        if 'spotify' in text:
-            open_application('spotify')
-            speak("Opening Spotify.")
-        else:
-            webbrowser.open('https://music.youtube.com')
-            speak("Opening YouTube Music for you.")
-        return True
-    
-    # Social media
-    elif 'facebook' in text:
-        webbrowser.open('https://www.facebook.com')
-        speak("Opening Facebook.")
-        return True
-    elif 'instagram' in text:
-        webbrowser.open('https://www.instagram.com')
-        speak("Opening Instagram.")
-        return True
-    elif 'twitter' in text:
-        webbrowser.open('https://www.twitter.com')
-        speak("Opening Twitter.")
-        return True
-    
-    # Help command
-    elif 'help' in text or 'what can you do' in text:
-        help_text = """I can help you with many things! Here are some examples:
+GREETINGS = [
+    "Hello! How can I help you today?",
+    "Hi there! What can I do for you?",
+    "Hey! I'm here to assist you.",
+    "Good to hear from you! How may I help?",
+    "Hello! Ready to help with whatever you need."
+]
+
+HOW_ARE_YOU_RESPONSES = [
+    "I'm doing great, thank you for asking! How are you?",
+    "I'm functioning perfectly and ready to help!",
+    "All systems running smoothly! How can I assist you today?",
+    "I'm excellent, thanks! What would you like me to do?"
+]
+
+THANKS_RESPONSES = [
+    "You're very welcome!",
+    "Happy to help!",
+    "My pleasure!",
+    "Anytime! That's what I'm here for."
+]
+
+FAREWELLS = [
+    "Goodbye! Have a great day!",
+    "See you later! Take care!",
+    "Bye! It was nice talking with you!",
+    "Until next time! Have a wonderful day!"
+]
+
+CHAT_RESPONSES = [
+    "That's interesting! Is there anything specific I can help you with?",
+    "I understand. How can I assist you today?",
+    "Thanks for sharing that with me. What would you like me to do?",
+    "I hear you! Is there a task I can help you with?",
+    "That's nice to know. What can I do for you right now?"
+]
+
+HELP_TEXT = """I can help you with many things! Here are some examples:
         - Open applications like YouTube, WhatsApp, Calculator, Gmail
         - Tell you the current time and date
         - Search Google for information
@@ -256,34 +187,429 @@ def process_command(text):
         - Check weather and news
         - Have friendly conversations with you
         Just speak naturally and I'll do my best to help!"""
-        speak(help_text)
-        return True
+
+# Spoken status and retry prompts
+PROMPTS = {
+    'ready': "I'm ready to listen. How can I help you?",
+    'not_caught': "I didn't catch that. Please speak a bit louder and clearer.",
+    'trouble': "I'm having trouble understanding. Let's try again from the beginning.",
+    'network': "I'm having internet connection problems. Let me try offline recognition.",
+    'no_speech': "I didn't hear anything. Please try speaking again.",
+    'check_microphone': "I'm not hearing any speech. Please check your microphone.",
+    'error': "Something went wrong. Let me try again.",
+    'wake': "Yes?",
+    'welcome': "Voice assistant is ready! I can help you open applications, answer questions, and chat with you. How can I help you today?",
+    'stopped': "Voice assistant stopped. Goodbye!",
+    'fatal': "A critical error occurred. Shutting down.",
+}
+
+SOCIAL_SITES = {
+    'facebook': ('https://www.facebook.com', "Opening Facebook."),
+    'instagram': ('https://www.instagram.com', "Opening Instagram."),
+    'twitter': ('https://www.twitter.com', "Opening Twitter."),
+}
+
+# Everything above is said verbatim, so it is rendered once and replayed from disk
+FIXED_PHRASES = (GREETINGS + HOW_ARE_YOU_RESPONSES + THANKS_RESPONSES + FAREWELLS
+                 + CHAT_RESPONSES + [HELP_TEXT] + list(PROMPTS.values()))
+
+def resolve_command(text):
+    """Route text to an (intent, args) pair without performing any action"""
+    text = text.lower().strip()
+    match = intents.router.classify(text)
+    if match is None:
+        return 'chat', {}
+    if match.name in plugin_registry:
+        return match.name, plugin_registry.args(match)
+
+    if match.name == 'open':
+        # Everything after the trigger word is the application name
+        return 'open', {'app_name': text[match.end:].strip()}
+    if match.name == 'search':
+        query = text.replace('search', '').replace('google', '').replace('find', '').strip()
+        return 'search', {'query': query}
+    if match.name == 'social':
+        return 'social', {'site': match.trigger}
+    if match.name == 'music':
+        return 'music', {'spotify': 'spotify' in text}
+    return match.name, {}
+
+def command_fit(text):
+    """How well a transcript reads as a command this assistant can act on (0-1)"""
+    intent, args = resolve_command(text)
+    if intent == 'chat':
+        return 0.0
+    if intent == 'open':
+        return 1.0 if apps.find_app(args['app_name']) else 0.5
+    return 1.0
+
+def handle_greeting(args):
+    speak(random.choice(GREETINGS))
+    return True
+
+def handle_how_are_you(args):
+    speak(random.choice(HOW_ARE_YOU_RESPONSES))
+    return True
+
+def handle_thanks(args):
+    speak(random.choice(THANKS_RESPONSES))
+    return True
+
+def handle_open(args):
+    app_name = args['app_name']
+    # Misheard names ("what's up", "v l c") become the application's own name
+    entry = apps.find_app(app_name)
+    if entry is not None:
+        app_name = entry.name
+        if current_session.get() is None:
+            # Only names that resolved, or misheard ones would skew the usage prior;
+            # remote clients' habits aren't this user's
+            session_log.record_launch(app_name)
+
+    # Handle special cases
+    if 'youtube' in app_name:
+        open_url('https://www.youtube.com')
+        speak("Opening YouTube for you.")
+    elif 'gmail' in app_name or 'email' in app_name:
+        open_url('https://mail.google.com')
+        speak("Opening Gmail for you.")
+    elif 'whatsapp' in app_name:
+        def whatsapp_web():
+            open_url('https://web.whatsapp.com')
+            speak("Opening WhatsApp Web.")
+
+        if open_application('whatsapp', on_failure=whatsapp_web):
+            speak("Opening WhatsApp.")
+        else:
+            whatsapp_web()
+    elif 'calculator' in app_name:
+        def no_calculator():
+            speak("Sorry, I couldn't open the calculator.")
+
+        if open_application('calculator', on_failure=no_calculator):
+            speak("Opening calculator.")
+        else:
+            no_calculator()
+    else:
+        def search_for_it():
+            speak(f"Sorry, I couldn't find or open {app_name}. Let me try opening it in the browser.")
+            try:
+                open_url(f"https://www.google.com/search?q={app_name}")
+            except:
+                pass
+
+        # Try to open any other application
+        if open_application(app_name, on_failure=search_for_it):
+            speak(f"Opening {app_name}.")
+        else:
+            search_for_it()
+    return True
+
+def time_reply():
+    return f"The current time is {get_time()}"
+
+def date_reply():
+    return f"Today is {get_date()}"
+
+def handle_time(args):
+    speak(time_reply())
+    return True
+
+def handle_date(args):
+    speak(date_reply())
+    return True
+
+def handle_search(args):
+    query = args['query']
+    if query:
+        open_url(f"https://www.google.com/search?q={query}")
+        speak(f"Searching for {query} on Google.")
+    else:
+        speak("What would you like me to search for?")
+    return True
+
+def handle_weather(args):
+    open_url('https://www.weather.com')
+    speak("Opening weather information for you.")
+    return True
+
+def handle_news(args):
+    open_url('https://news.google.com')
+    speak("Opening Google News for you.")
+    return True
+
+def handle_music(args):
+    if args['spotify']:
+        open_application('spotify')
+        speak("Opening Spotify.")
+    else:
+        open_url('https://music.youtube.com')
+        speak("Opening YouTube Music for you.")
+    return True
+
+def handle_social(args):
+    url, message = SOCIAL_SITES[args['site']]
+    open_url(url)
+    speak(message)
+    return True
+
+def handle_help(args):
+    speak(HELP_TEXT)
+    return True
+
+def handle_exit(args):
+    speak(random.choice(FAREWELLS))
+    return False  # This will stop the assistant
+
+def handle_chat(args):
+    # Default conversational response
+    speak(random.choice(CHAT_RESPONSES))
+    return True
+
+HANDLERS = {
+    'greeting': handle_greeting,
+    'how_are_you': handle_how_are_you,
+    'thanks': handle_thanks,
+    'open': handle_open,
+    'time': handle_time,
+    'date': handle_date,
+    'search': handle_search,
+    'weather': handle_weather,
+    'news': handle_news,
+    'music': handle_music,
+    'social': handle_social,
+    'help': handle_help,
+    'exit': handle_exit,
+    'chat': handle_chat,
+}
+
+def process_command(text, hypothesis=None):
+    """Process voice commands and respond accordingly"""
+    start = time.perf_counter()
+    with metrics.span('process_command') as span:
+        key = cache.normalize_transcript(text)
+        resolved = command_cache.get(key)
+        if resolved is None:
+            resolved = resolve_command(text)
+            command_cache.put(key, resolved)
+        intent, args = resolved
+        span.labels['intent'] = intent
+        handler = HANDLERS.get(intent)
+        keep_running = handler(args) if handler else plugin_registry.run(intent, args)
+    if current_session.get() is None:
+        session_log.record_turn(text, intent, hypothesis.backend if hypothesis else None,
+                                hypothesis.elapsed if hypothesis else None, time.perf_counter() - start)
+    return keep_running
+
+def speculative_action(text):
+    """What a transcript would set off that can safely start early, as (key, start), or None
+
+    That is launching a program we spawn ourselves (start() returns its undo)
+    or rendering a reply that is known in advance. Browser tabs and hand-offs
+    to another launcher can't be taken back, and near-miss names may be wrong.
+    """
+    intent, args = resolve_command(text)
+    if intent == 'open' or (intent == 'music' and args['spotify']):
+        entry, score = apps.match_app(args['app_name'] if intent == 'open' else 'spotify')
+        if entry is None or score < 1.0 or entry.kind != 'exec' or not entry.available:
+            return None
+
+        def launch():
+            future = apps.launcher.launch(entry)
+            return lambda: apps.launcher.cancel(future)
+
+        return ('launch', entry.name), launch
+    if intent in ('time', 'date'):
+        reply = time_reply() if intent == 'time' else date_reply()
+        return ('reply', reply), lambda: voice.prerender([reply], speculative=True)
+    return None
+
+def warm_command_cache(count=50):
+    """Route the commands said most often in earlier sessions before anyone speaks"""
+    for text in session_log.frequent_commands(count):
+        key = cache.normalize_transcript(text)
+        if command_cache.get(key) is None:
+            command_cache.put(key, resolve_command(text))
+
+def barge_in(chunk, sample_width):
+    """Cut off whatever the assistant is still saying if chunk is the user talking; True if it is"""
+    if not echo_guard.hear(chunk, sample_width):
+        return False  # Our own voice coming back through the microphone
+    if voice.interrupt():
+        print("✋ Interrupted speech output")
+    return True
+
+def listen_for_phrase(recognizer, source, timeout=8, phrase_time_limit=15):
+    """Capture one phrase, interrupting the assistant as soon as the user starts talking
+
+    Phrases that are only the assistant's own voice, heard from the speakers, are skipped.
+    """
+    while True:
+        chunks = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit, stream=True)
+        first = next(chunks)
+        # Barge-in: speech onset cuts off whatever the assistant is still saying
+        user = barge_in(first.frame_data, first.sample_width)
+        # Each chunk is written once into the phrase buffer the recognizers will share
+        buffer = pipeline.PhraseBuffer()
+        buffer.write(first.frame_data)
+        last = first.frame_data
+        for chunk in chunks:
+            if chunk.frame_data is not last:
+                buffer.write(chunk.frame_data)
+                last = chunk.frame_data
+                user = user or barge_in(last, first.sample_width)
+        if user:
+            return clips.Clip(buffer.take(), first.sample_rate, first.sample_width)
+
+def make_segmenter(recognizer, sample_rate, sample_width, chunk_size):
+    """The configured endpointing stage for a stream of PCM chunks"""
+    if ENDPOINTER == 'vad' and sample_width == 2:  # The VAD only reads 16-bit PCM
+        try:
+            import vad
+            return vad.VadSegmenter(sample_rate, sample_width)
+        except ImportError:
+            print("⚠ NumPy is not installed; falling back to energy endpointing")
+    return pipeline.EnergySegmenter(recognizer, sample_rate, sample_width, chunk_size)
+
+def make_gate(recognizer):
+    """The configured wake-word gate, or None to recognize every phrase"""
+    mode = WAKE_WORD
+    if mode == 'auto':
+        mode = 'mfcc' if os.path.exists(os.path.join(tts.CACHE_ROOT, 'wakeword.npz')) else None
+    if mode is None:
+        return None
+    try:
+        import wakeword
+    except ImportError:
+        print("⚠ NumPy is not installed; listening without a wake word")
+        return None
+    if mode == 'sphinx':
+        detector = wakeword.SphinxKeyphrase(recognizer, WAKE_PHRASE)
+    else:
+        detector = wakeword.TemplateDetector.load()
+    print("👂 Say the wake word before each command")
+    return wakeword.WakeGate(detector, on_wake=lambda: speak(PROMPTS['wake'], priority=tts.URGENT))
+
+def prepare_listening(recognizer, source, dispatcher=None):
+    """Build the capture pipeline, starting from the cached noise profile
+
+    Calibration happens in the background on the first seconds of captured
+    audio, so the first listen does not wait on it.
+    """
+    segmenter = make_segmenter(recognizer, source.SAMPLE_RATE, source.SAMPLE_WIDTH, source.CHUNK)
+    calibration.apply_profile(calibration.load_profile(session_log), recognizer, segmenter)
     
-    # Exit commands
-    elif any(word in text for word in ['goodbye', 'bye', 'stop assistant', 'quit', 'exit']):
-        farewell = [
-            "Goodbye! Have a great day!",
-            "See you later! Take care!",
-            "Bye! It was nice talking with you!",
-            "Until next time! Have a wonderful day!"
-        ]
-        speak(random.choice(farewell))
-        return False  # This will stop the assistant
+    # Optimized recognizer settings for better accuracy
+    recognizer.energy_threshold = max(recognizer.energy_threshold, 300)
+    recognizer.dynamic_energy_adjustment_ratio = 1.15
+    recognizer.pause_threshold = 0.8  # Wait longer for complete sentences
+    recognizer.phrase_threshold = 0.3
+    recognizer.non_speaking_duration = 0.5
     
-    # Default conversational response
+    calibrator = calibration.BackgroundCalibration(
+        recognizer, segmenter, source.SAMPLE_RATE, source.SAMPLE_WIDTH, source.CHUNK, log=session_log)
+    dispatcher = dispatcher or get_dispatcher(recognizer)
+    gate = make_gate(recognizer)
+    # Capture keeps running while we recognize, speak and act
+    return pipeline.AudioPipeline(
+        source, recognizer, dispatcher,
+        on_speech_start=voice.interrupt,  # Barge-in, though not by our own voice from the speakers
+        segmenter=segmenter,
+        on_chunk=calibrator.feed,
+        gate=gate,
+        echo=echo_guard,
+        speculator=make_speculator(dispatcher, source) if SPECULATE and gate is None else None,
+    )
+
+def command_grammar():
+    """The offline command grammar: every intent's triggers and every name handle_open knows"""
+    import offline
+    return offline.CommandGrammar.build(list(apps.get_table().keys) + OPEN_TARGETS + list(SOCIAL_SITES),
+                                        intents=intents.INTENTS + plugin_registry.intents())
+
+def make_backends(recognizer, mode=None):
+    """The recognizer chain for mode (RECOGNITION_MODE by default), best first"""
+    mode = mode or RECOGNITION_MODE
+    if mode == 'online':
+        return recognition.default_backends(recognizer)
+    try:
+        import offline
+        local = offline.GrammarBackend(command_grammar())
+    except (ImportError, OSError) as e:
+        print(f"⚠ Offline recognition is unavailable ({e}); using the online recognizers")
+        return recognition.default_backends(recognizer)
+    if mode == 'offline':
+        return [local]
+    # The grammar backend already falls back to dictation, so the old Sphinx pass is dropped
+    return [local] + [backend for backend in recognition.default_backends(recognizer)
+                      if not isinstance(backend, recognition.SphinxBackend)]
+
+def partial_backend(dispatcher):
+    """The local recognizer partial transcripts come from: one of the chain's that streams, else a grammar
+    decoder of its own (raises ImportError without pocketsphinx, OSError without its model)"""
+    for backend in dispatcher.backends:
+        if backend.streaming:
+            return backend
+    import offline
+    return offline.GrammarBackend(command_grammar(), dictation=False, partials_only=True)
+
+def make_speculator(dispatcher, source):
+    """Speculation on partial transcripts, or None without pocketsphinx to produce them
+
+    The local recognizer loads on the speculator's own thread; if that fails, speculation switches itself off.
+    """
+    if importlib.util.find_spec('pocketsphinx') is None:
+        print("⚠ pocketsphinx is not installed; commands will wait for the whole phrase")
+        return None
+    return speculation.Speculator(Lazy(lambda: partial_backend(dispatcher)), speculative_action,
+                                  source.SAMPLE_RATE, source.SAMPLE_WIDTH, source.CHUNK, hold=SPECULATION_HOLD)
+
+def get_dispatcher(recognizer):
+    """One recognition dispatcher (and thread pool) per recognizer"""
+    dispatcher = _dispatchers.get(id(recognizer))
+    if dispatcher is None:
+        dispatcher = recognition.RecognitionDispatcher(
+            make_backends(recognizer), policy=RECOGNITION_POLICY, cache=audio_cache,
+            rescorer=command_fit, confident=CONFIDENT, breaker=retry.CircuitBreaker)
+        _dispatchers[id(recognizer)] = dispatcher
+    return dispatcher
+
+def recognition_error(errors, backends):
+    """What a turn without a transcript failed with: a network error if not one of the backends could be reached"""
+    errors = list(errors.values())
+    if errors and len(errors) == backends and all(retry.classify(e) == retry.NETWORK for e in errors):
+        return errors[0]  # Not one backend could be reached (or all are cooling down)
+    return sr.UnknownValueError()
+
+def retry_after(turn, error, wait=time.sleep):
+    """Report a failed attempt, then wait out its backoff; False once the turn should give up"""
+    kind = retry.classify(error)
+    delay = turn.failed(kind)
+    last = delay is None
+    if kind == retry.UNKNOWN:
+        print("❌ Still couldn't understand after multiple attempts." if last else "❌ Couldn't understand. Let me try again...")
+        prompt('trouble' if last else 'not_caught')
+    elif kind == retry.TIMEOUT:
+        print("⌛ Multiple timeouts." if last else "⌛ Timeout. Trying again...")
+        prompt('check_microphone' if last else 'no_speech')
+    elif kind == retry.NETWORK:
+        print(f"⚠ Network issue: {error}")
+        prompt('network')
     else:
-        responses = [
-            "That's interesting! Is there anything specific I can help you with?",
-            "I understand. How can I assist you today?",
-            "Thanks for sharing that with me. What would you like me to do?",
-            "I hear you! Is there a task I can help you with?",
-            "That's nice to know. What can I do for you right now?"
-        ]
-        speak(random.choice(responses))
-        return True
-
-def listen_and_recognize(recognizer, source, retries=5):
+        print(f"🚨 Unexpected error: {error}")
+        if not last:
+            prompt('error')
+    if last:
+        return False
+    if delay:
+        print(f"⏱ Retrying in {delay:.1f}s")
+        wait(delay)
+    return True
+
+def listen_and_recognize(recognizer, source, retries=5, dispatcher=None):
     """Enhanced speech recognition with multiple engines and better settings"""
+    if dispatcher is None:
+        dispatcher = get_dispatcher(recognizer)
     
     # Optimized recognizer settings for better accuracy
     recognizer.energy_threshold = max(recognizer.energy_threshold, 300)
@@ -292,132 +618,118 @@ def listen_and_recognize(recognizer, source, retries=5):
     recognizer.phrase_threshold = 0.3
     recognizer.non_speaking_duration = 0.5
     
-    for attempt in range(retries):
+    turn = retry_policy.start(attempts=retries)
+    for attempt in turn:
         try:
-            print(f"🎙 Listening... (attempt {attempt + 1}/{retries})")
-            if attempt == 0:
-                speak("I'm ready to listen. How can I help you?")
+            print(f"🎙 Listening... (attempt {attempt}/{retries})")
+            if attempt == 1:
+                speak(PROMPTS['ready'])
             
             # Listen with longer timeout for complete thoughts
-            audio = recognizer.listen(
-                source, 
-                timeout=8,  # Wait longer for user to start speaking
-                phrase_time_limit=15  # Allow longer phrases
-            )
+            with metrics.span('listen', attempt=attempt):
+                audio = listen_for_phrase(
+                    recognizer,
+                    source, 
+                    timeout=8,  # Wait longer for user to start speaking
+                    phrase_time_limit=15  # Allow longer phrases
+                )
             
             print("⏳ Processing your speech...")
             
-            # Primary recognition with Google (most accurate)
-            try:
-                text = recognizer.recognize_google(audio, language='en-US')
-                if text.strip():  # Make sure we got actual text
-                    return text.strip()
-            except:
-                pass
-            
-            # Backup recognition with Google (different language model)
-            try:
-                text = recognizer.recognize_google(audio, language='en-IN')
-                if text.strip():
-                    return text.strip()
-            except:
-                pass
-            
-            # If Google fails, try offline recognition
-            try:
-                text = recognizer.recognize_sphinx(audio)
-                if text.strip():
+            # Run every recognizer at once on the same audio
+            with metrics.span('recognize', attempt=attempt) as span:
+                result = dispatcher.recognize(audio)
+                span.labels['backend'] = result.backend if result else 'none'
+            if result is not None:
+                if result.backend.startswith('sphinx'):
                     print("📱 Used offline recognition")
-                    return text.strip()
-            except:
-                pass
-                
-        except sr.UnknownValueError:
-            if attempt < retries - 1:
-                print("❌ Couldn't understand. Let me try again...")
-                speak("I didn't catch that. Please speak a bit louder and clearer.")
-                time.sleep(0.5)
-            else:
-                print("❌ Still couldn't understand after multiple attempts.")
-                speak("I'm having trouble understanding. Let's try again from the beginning.")
-                
-        except sr.RequestError as e:
-            print(f"⚠ Network issue: {e}")
-            speak("I'm having internet connection problems. Let me try offline recognition.")
-            # Try offline recognition as backup
-            try:
-                text = recognizer.recognize_sphinx(audio)
-                if text.strip():
-                    print("📱 Used offline backup")
-                    return text.strip()
-            except:
-                if attempt < retries - 1:
-                    speak("Let me try again with a different approach.")
-                    time.sleep(1)
-                
-        except sr.WaitTimeoutError:
-            if attempt < retries - 1:
-                print("⌛ Timeout. Trying again...")
-                speak("I didn't hear anything. Please try speaking again.")
-                time.sleep(0.5)
-            else:
-                print("⌛ Multiple timeouts.")
-                speak("I'm not hearing any speech. Please check your microphone.")
-                
+                return result.text
+            error = recognition_error(dispatcher.errors, len(dispatcher.backends))
         except Exception as e:
-            print(f"🚨 Unexpected error: {e}")
-            if attempt < retries - 1:
-                speak("Something went wrong. Let me try again.")
-                time.sleep(0.5)
+            error = e
+        
+        if not retry_after(turn, error):
+            break
     
     return None  # Failed after all retries
 
 def main():
     recognizer = sr.Recognizer()
-    microphone_calibrated = False
+    
+    # ASSISTANT_METRICS=/path/prefix writes prefix.jsonl spans and a prefix.prom histogram file
+    metrics_prefix = os.environ.get('ASSISTANT_METRICS')
+    if metrics_prefix:
+        metrics.enable(jsonl_path=f"{metrics_prefix}.jsonl")
     
     print("🤖 Smart Voice Assistant Starting...")
     print("💡 I can open apps, answer questions, and have conversations!")
     print("📝 Try saying: 'Open YouTube', 'What time is it?', 'Hello', etc.")
     print("🛑 Say 'goodbye' or press Ctrl+C to stop")
     
+    voice.prerender(FIXED_PHRASES)
+    session_log.open()
+    plugin_registry.discover()
+    if plugin_registry.plugins:
+        print(f"🧩 {len(plugin_registry.plugins)} plugin(s): {', '.join(plugin_registry.plugins)}")
+    apps.usage = session_log.app_usage  # Misheard names lean towards the apps this user opens
+    apps.warm_up()
+    threading.Thread(target=warm_command_cache, name="command-cache", daemon=True).start()
+    
     try:
         with sr.Microphone() as source:
-            # One-time calibration
-            if not microphone_calibrated:
-                setup_microphone_calibration(recognizer, source)
-                microphone_calibrated = True
-                speak("Voice assistant is ready! I can help you open applications, answer questions, and chat with you. How can I help you today?")
+            audio_pipeline = prepare_listening(recognizer, source)
+            speak(PROMPTS['welcome'])
             
             print("\n🔁 Voice Assistant is active and listening...")
             
-            while True:
-                result = listen_and_recognize(recognizer, source)
-                
-                if result:
-                    print(f"\n✅ You said: '{result}'")
-                    print("-" * 50)
+            failures = None  # Retry state while phrases keep failing; backoff and prompts come from retry_policy
+            with audio_pipeline:
+                for utterance in audio_pipeline.utterances():
+                    result = utterance.text
+                    if utterance.speculation is not None:
+                        # A launch started on the partials stays if this agrees, and is undone if not
+                        utterance.speculation.settle(result)
                     
-                    # Process the command
-                    continue_running = process_command(result)
+                    if result:
+                        failures = None
+                        print(f"\n✅ You said: '{result}'")
+                        print("-" * 50)
+                        
+                        # Process the command
+                        continue_running = process_command(result, utterance.hypothesis)
+                        
+                        if not continue_running:
+                            voice.wait()  # Let the farewell finish before exiting
+                            break
+                        
+                    else:
+                        error = utterance.error or recognition_error(
+                            utterance.errors, len(audio_pipeline.dispatcher.backends))
+                        if failures is None:
+                            failures = retry_policy.start()
+                            attempts = iter(failures)
+                        next(attempts, None)
+                        # Backing off holds the next recognition; capture carries on meanwhile
+                        if not retry_after(failures, error, wait=audio_pipeline.hold):
+                            failures = None  # Gave up on this run of failures; the next phrase starts afresh
                     
-                    if not continue_running:
-                        break
-                    
-                else:
-                    print("❌ Could not understand speech after multiple attempts.")
-                    speak("I couldn't understand what you said. Please try again or say 'help' to see what I can do.")
-                
-                print("\n" + "="*60)
-                time.sleep(0.5)  # Brief pause before next listening cycle
+                    if metrics_prefix:
+                        metrics.write_prometheus(f"{metrics_prefix}.prom")
+                    print("\n" + "="*60)
                 
     except KeyboardInterrupt:
         print("\n\n🛑 Voice assistant stopped by Harsh.")
-        speak("Voice assistant stopped. Goodbye!")
+        voice.flush()
+        speak(PROMPTS['stopped'], priority=tts.URGENT, block=True)
     except Exception as e:
         print(f"\n🚨 Fatal Error: {e}")
-        speak("A critical error occurred. Shutting down.")
+        speak(PROMPTS['fatal'], priority=tts.URGENT, block=True)
+    finally:
+        session_log.close()  # Writes out any turns still queued
+        plugin_registry.close()
+        if metrics_prefix:
+            metrics.write_prometheus(f"{metrics_prefix}.prom")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,160 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = False
+_lock = threading.Lock()
+_histograms = {}  # (name, sorted label items) -> Histogram
+_values = {}  # (kind, name, sorted label items) -> current gauge value or counter total
+_jsonl = None
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class Span:
+    """Times one stage; labels may be added while it runs (span.labels['intent'] = ...)"""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and 'status' not in self.labels:
+            self.labels['status'] = 'error'
+        record(self.name, time.perf_counter() - self.start, self.labels)
+        return False
+
+
+class _NullSpan:
+    """Shared no-op span handed out while metrics are disabled"""
+
+    @property
+    def labels(self):
+        return {}  # Writes land in a throwaway dict
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def enable(jsonl_path=None):
+    """Start collecting; every finished span is also appended to jsonl_path if given"""
+    global _enabled, _jsonl
+    with _lock:
+        if jsonl_path and _jsonl is None:
+            _jsonl = open(jsonl_path, 'a', encoding='utf-8', buffering=1)
+        _enabled = True
+
+
+def span(name, **labels):
+    """Context manager timing a stage; costs one flag check when disabled"""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, labels)
+
+
+def record(name, seconds, labels=None):
+    """Add one observation to the histogram for name/labels"""
+    if not _enabled:
+        return
+    labels = labels or {}
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+        if _jsonl is not None:
+            _jsonl.write(json.dumps({
+                'ts': time.time(), 'span': name, 'seconds': round(seconds, 6),
+                'labels': {k: str(v) for k, v in labels.items()},
+            }) + '\n')
+
+
+def gauge(name, value, labels=None):
+    """Set a value that can go up and down, such as a circuit breaker's state"""
+    if not _enabled:
+        return
+    with _lock:
+        _values[('gauge', name, tuple(sorted((k, str(v)) for k, v in (labels or {}).items())))] = value
+
+
+def increment(name, labels=None, amount=1):
+    """Add to a running count, such as retries made"""
+    if not _enabled:
+        return
+    key = ('counter', name, tuple(sorted((k, str(v)) for k, v in (labels or {}).items())))
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+
+
+def _prometheus_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+
+def prometheus_text():
+    """Render every histogram in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        by_name = {}
+        for (name, labels), h in sorted(_histograms.items()):
+            by_name.setdefault(name, []).append((labels, h))
+        for name, series in by_name.items():
+            metric = f"assistant_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, h in series:
+                cumulative = 0
+                for bound, count in zip([*map(str, BUCKETS), '+Inf'], h.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_prometheus_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{metric}_sum{_prometheus_labels(labels)} {h.sum:.6f}")
+                lines.append(f"{metric}_count{_prometheus_labels(labels)} {h.count}")
+        typed = {}
+        for (kind, name, labels), value in sorted(_values.items()):
+            typed.setdefault((kind, name), []).append((labels, value))
+        for (kind, name), series in typed.items():
+            metric = f"assistant_{name}_total" if kind == 'counter' else f"assistant_{name}"
+            lines.append(f"# TYPE {metric} {kind}")
+            for labels, value in series:
+                lines.append(f"{metric}{_prometheus_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path):
+    """Write the text exposition to path (for the node_exporter textfile collector)"""
+    text = prometheus_text()
+    partial = f"{path}.tmp"
+    with open(partial, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(partial, path)
@@ -0,0 +1,264 @@
+"""Offline recognition against a grammar of the assistant's own commands
+
+Sphinx decoding open dictation is slow and often wrong. Most of what gets
+said to the assistant is one of a few hundred commands, so those are
+compiled into a JSGF grammar from the intent triggers and the application
+table, and decoded first. Free-form requests ("search for ...", chat)
+and anything outside the grammar fall back to dictation on the same,
+already loaded, decoder. A second grammar decoder can follow a phrase
+while it is still being spoken, for partial transcripts.
+"""
+import audioop
+import functools
+import os
+import re
+import threading
+
+import recognition
+from intents import INTENTS, TOKEN_PATTERN
+from lazy import Lazy, LazyModule
+
+sr = LazyModule('speech_recognition')
+
+# Intents whose wording can't be listed: their openers are in the grammar, the rest is dictated
+FREE_FORM = {'search'}
+FREE_OPENERS = ['search', 'search for', 'google', 'find', 'tell me', 'tell me about', 'who is', 'what is',
+                'why', 'how do i', 'can you']
+
+# Words commands are commonly wrapped in: "what's the time", "open the calculator please"
+POLITE = ['please', 'hey', 'ok', 'okay', 'now']
+FILLERS = ['what', "what's", 'is', 'it', 'the', 'a', 'some', 'me', 'like', "today's", 'today', 'for', 'you']
+
+
+def data_paths(language='en-US'):
+    """(acoustic model dir, language model, dictionary) shipped with speech_recognition"""
+    directory = os.path.join(os.path.dirname(os.path.realpath(sr.__file__)), 'pocketsphinx-data', language)
+    return (os.path.join(directory, 'acoustic-model'),
+            os.path.join(directory, 'language-model.lm.bin'),
+            os.path.join(directory, 'pronounciation-dictionary.dict'))
+
+
+@functools.lru_cache(maxsize=4)
+def load_vocabulary(path):
+    """Every word the pronunciation dictionary knows"""
+    words = set()
+    with open(path, encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            word = line.split(' ', 1)[0]
+            words.add(word.split('(', 1)[0])  # "read(2)" is a second pronunciation of "read"
+    return frozenset(words)
+
+
+def segment_word(word, vocabulary, shortest=2, whole=True):
+    """Fewest dictionary words that spell word ("notepad" -> ["note", "pad"]), or None"""
+    best = [None] * (len(word) + 1)
+    best[0] = []
+    for end in range(1, len(word) + 1):
+        for start in range(end):
+            piece = word[start:end]
+            if best[start] is None or len(piece) < shortest or piece not in vocabulary:
+                continue
+            if not whole and piece == word:
+                continue
+            candidate = best[start] + [piece]
+            # Fewest pieces; on a tie the more lopsided split, which tends to be the real words
+            if best[end] is None or (len(candidate), -sum(len(p) ** 2 for p in candidate)) < \
+                    (len(best[end]), -sum(len(p) ** 2 for p in best[end])):
+                best[end] = candidate
+    return best[-1]
+
+
+def spoken_forms(name, vocabulary):
+    """Ways to say an application name using only dictionary words"""
+    tokens = TOKEN_PATTERN.findall(name.lower())
+    if not tokens:
+        return []
+    words = []
+    for token in tokens:
+        if token in vocabulary:
+            words.append(token)
+            continue
+        # "notepad" -> "note pad", then "gmail" -> "g mail" and "vlc" -> "v l c"
+        for shortest in (3, 2, 1):
+            pieces = segment_word(token, vocabulary, shortest)
+            if pieces:
+                break
+        if not pieces:
+            return []
+        words.append(' '.join(pieces))
+    return [' '.join(words)]
+
+
+class CommandGrammar:
+    """JSGF grammar over the command vocabulary, plus a matcher for complete sentences of it"""
+
+    def __init__(self, triggers, app_names, vocabulary):
+        """triggers maps each intent's name to its trigger phrases"""
+        self.vocabulary = vocabulary
+
+        def known(phrase):
+            return all(word in vocabulary for word in phrase.split())
+
+        # Words of one intent may follow each other ("play some music", "what is the date today");
+        # mixing intents would let the decoder string unrelated triggers together
+        self.intents = {}
+        for intent, phrases in triggers.items():
+            phrases = sorted({t for t in phrases if known(t)})
+            if phrases:
+                self.intents[re.sub(r'\W', '_', intent)] = phrases
+        self.triggers = sorted({t for phrases in self.intents.values() for t in phrases})
+        self.openers = [phrase for phrase in FREE_OPENERS if known(phrase)]
+        self.polite = [word for word in POLITE if word in vocabulary]
+        self.fillers = [word for word in FILLERS if word in vocabulary]
+        self.apps = {}  # Spoken form -> name as the launch table knows it
+        for name in app_names:
+            for form in spoken_forms(name, vocabulary):
+                self.apps.setdefault(form, name)
+        self.skipped = len({t for phrases in triggers.values() for t in phrases}) - len(self.triggers)
+
+        def alternatives(phrases):
+            return '|'.join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+
+        filler = f"(?:{alternatives(self.fillers)})"
+        # A trigger, then maybe another of the same intent: the <intent_*> rules of the grammar
+        intent = '|'.join(rf"{t}(?: (?:{filler} )?{t})?"
+                          for t in (f"(?:{alternatives(phrases)})" for phrases in self.intents.values()))
+        self._sentence = re.compile(
+            rf"(?:(?:{alternatives(self.polite)}) )?"
+            rf"(?P<body>open (?:the )?(?P<app>{alternatives(self.apps)})"
+            rf"|(?:{filler} ){{0,3}}(?:{intent})(?: {filler}){{0,2}})"
+            rf"(?: (?:{alternatives(self.polite)}))?")
+
+    @classmethod
+    def build(cls, app_names, dictionary=None, intents=INTENTS):
+        """Grammar from the router's intents and the launch table's names"""
+        vocabulary = load_vocabulary(dictionary or data_paths()[2])
+        triggers = {intent.name: [' '.join(TOKEN_PATTERN.findall(trigger.lower().replace("'", '')))
+                                  for trigger in intent.triggers]
+                    for intent in intents if intent.name not in FREE_FORM and intent.name != 'open'}
+        return cls(triggers, app_names, vocabulary)
+
+    def jsgf(self, name='commands'):
+        def rule(phrases):
+            return ' | '.join(sorted(phrases))
+
+        intents = sorted(self.intents)
+        return '\n'.join([
+            '#JSGF V1.0;',
+            f'grammar {name};',
+            f'public <{name}> = [<polite>] ( <open> | <command> | <free> ) [<polite>];',
+            '<open> = open [the] <app>;',
+            f"<command> = [<filler>] [<filler>] [<filler>] ( {rule(f'<intent_{i}>' for i in intents)} )"
+            ' [<filler>] [<filler>];',
+            *[f'<intent_{i}> = <trigger_{i}> [[<filler>] <trigger_{i}>];' for i in intents],
+            *[f'<trigger_{i}> = {rule(self.intents[i])};' for i in intents],
+            f'<free> = {rule(self.openers)};',
+            f'<app> = {rule(self.apps)};',
+            f'<filler> = {rule(self.fillers)};',
+            f'<polite> = {rule(self.polite)};',
+            '',
+        ])
+
+    def command(self, text):
+        """The command a decoded sentence stands for, app names restored, or None if it isn't one"""
+        match = self._sentence.fullmatch(' '.join(text.lower().split()))
+        if match is None:
+            return None
+        if match.group('app'):
+            return f"open {self.apps[match.group('app')]}"
+        return match.group('body')
+
+    def stats(self):
+        return {'triggers': len(self.triggers), 'app_forms': len(self.apps), 'skipped': self.skipped}
+
+
+class GrammarBackend(recognition.Backend):
+    """Sphinx with its models loaded once: the command grammar first, open dictation as the fallback"""
+
+    name = 'sphinx-grammar'
+    streaming = True
+
+    def __init__(self, grammar, language='en-US', dictation=True,
+                 beam=1e-30, word_beam=1e-20, timeout=10.0, partials_only=False):
+        super().__init__(timeout)
+        from pocketsphinx import Decoder  # Optional dependency; only the offline modes need it
+
+        hmm, lm, dictionary = data_paths(language)
+        self.grammar = grammar
+        # Beams far narrower than Sphinx's defaults: a small grammar doesn't need the wide search,
+        # and without filler words breaths and clicks can't pad out a wrong sentence
+        def commands(fillers=False):
+            decoder = Decoder(hmm=hmm, dict=dictionary, jsgf=None, lm=None, logfn=os.devnull,
+                              beam=beam, pbeam=beam, wbeam=word_beam, fsgusefiller=fillers)
+            decoder.add_jsgf_string('commands', grammar.jsgf())
+            decoder.activate_search('commands')
+            return decoder
+
+        # Partials get a decoder of their own, so following one phrase never holds up transcribing another.
+        # It starts in the room noise before the onset, which only the filler models can soak up.
+        # The one this backend is for is loaded now; partials_only=True is a backend that only streams.
+        self._commands = Lazy(commands)
+        self._partials = Lazy(lambda: commands(fillers=True))
+        (self._partials if partials_only else self._commands).get()
+        # Dictation keeps the default search width and is only loaded if something needs it
+        self._dictation = Lazy(lambda: Decoder(hmm=hmm, lm=lm, dict=dictionary, logfn=os.devnull)) \
+            if dictation else None
+        self._lock = threading.Lock()  # A decoder takes one utterance at a time
+        self.grammar_hits = self.dictated = 0
+
+    @staticmethod
+    def _decode(decoder, raw):
+        decoder.start_utt()
+        decoder.process_raw(raw, full_utt=True)
+        decoder.end_utt()
+        hypothesis = decoder.hyp()
+        return (hypothesis.hypstr.strip(), hypothesis.prob) if hypothesis is not None else ('', None)
+
+    def transcribe(self, audio):
+        raw = audio.get_raw_data(convert_rate=16000, convert_width=2)
+        if not raw:
+            return '', None
+        with self._lock:
+            text, posterior = self._decode(self._commands.get(), raw)
+            command = self.grammar.command(text)
+            if command is not None:
+                # The sentence's posterior: low when the grammar was only the least bad fit for the audio
+                self.grammar_hits += 1
+                return command, posterior
+            if self._dictation is None:
+                return '', None
+            # Free-form or out-of-grammar speech: decode it again as open dictation
+            self.dictated += 1
+            return self._decode(self._dictation.get(), raw)[0], None
+
+    def stream(self, sample_rate, sample_width):
+        """Follow one phrase chunk by chunk; only one stream can be open at a time"""
+        return GrammarStream(self.grammar, self._partials.get(), sample_rate, sample_width)
+
+    def stats(self):
+        return {'grammar_hits': self.grammar_hits, 'dictated': self.dictated, **self.grammar.stats()}
+
+
+class GrammarStream:
+    """Partial transcripts of one phrase from a grammar decoder fed as the audio arrives"""
+
+    def __init__(self, grammar, decoder, sample_rate, sample_width):
+        self.grammar = grammar
+        self.decoder = decoder
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self._state = None  # Resampler state, carried from one chunk to the next
+        decoder.start_utt()
+
+    def feed(self, chunk):
+        """Decode one more chunk; returns the best sentence so far, as a command when it is one"""
+        raw = chunk if self.sample_width == 2 else audioop.lin2lin(chunk, self.sample_width, 2)
+        if self.sample_rate != 16000:
+            raw, self._state = audioop.ratecv(raw, 2, 1, self.sample_rate, 16000, self._state)
+        self.decoder.process_raw(raw, False, False)
+        hypothesis = self.decoder.hyp()
+        text = hypothesis.hypstr.strip() if hypothesis is not None else ''
+        return self.grammar.command(text) or text
+
+    def close(self):
+        self.decoder.end_utt()
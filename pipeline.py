@@ -0,0 +1,378 @@
+import audioop
+import collections
+import math
+import queue
+import threading
+import time
+
+import metrics
+
+_EOF = object()
+
+# Seconds of audio a phrase buffer holds before it has to grow
+PREALLOCATE_SECONDS = 4
+
+
+class RingBuffer:
+    """Bounded chunk buffer; when full it drops the oldest chunk (or blocks if lossless)"""
+
+    def __init__(self, capacity, lossless=False):
+        self.capacity = capacity
+        self.lossless = lossless
+        self._chunks = collections.deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, chunk):
+        with self._cond:
+            while self.lossless and len(self._chunks) >= self.capacity:
+                self._cond.wait()
+            if len(self._chunks) >= self.capacity:
+                self._chunks.popleft()
+                self.dropped += 1
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Next chunk, or None if nothing arrived within timeout"""
+        with self._cond:
+            if not self._chunks and not self._cond.wait_for(lambda: self._chunks, timeout):
+                return None
+            chunk = self._chunks.popleft()
+            self._cond.notify_all()
+            return chunk
+
+    def __len__(self):
+        return len(self._chunks)
+
+
+class PhraseBuffer:
+    """Preallocated bytearray one phrase's samples are written into, handed off without a copy
+
+    take() returns a memoryview of the samples written so far and starts a
+    fresh buffer, so the view stays valid however long the recognizers keep it.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        self.capacity = capacity
+        self._data = None
+        self.size = 0
+
+    def write(self, chunk):
+        chunk = memoryview(chunk).cast('B')  # NumPy frames are buffers too, but not bytes
+        end = self.size + len(chunk)
+        if self._data is None:
+            self._data = bytearray(max(self.capacity, end))
+        elif end > len(self._data):
+            self._data.extend(bytes(max(end, 2 * len(self._data)) - len(self._data)))
+        self._data[self.size:end] = chunk
+        self.size = end
+
+    def truncate(self, size):
+        self.size = min(self.size, max(0, size))
+
+    def take(self):
+        view = memoryview(self._data or b"")[:self.size]
+        self._data = None
+        self.size = 0
+        return view
+
+    def clear(self):
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+
+class Utterance:
+    """One captured phrase and what the recognizers made of it"""
+
+    def __init__(self, audio, started, ended):
+        self.audio = audio
+        self.started = started  # Seconds of stream time at phrase start / end
+        self.ended = ended
+        self.hypothesis = None
+        self.recognized_at = None
+        self.error = None   # What recognition raised, if it did
+        self.errors = {}    # Backend name -> its exception, when no backend produced a transcript
+        self.speculation = None  # What was started from partial transcripts, for the final one to settle
+
+    @property
+    def text(self):
+        return self.hypothesis.text if self.hypothesis else None
+
+
+class EnergySegmenter:
+    """Splits a chunk stream into phrases with the same energy rules as Recognizer.listen"""
+
+    def __init__(self, recognizer, sample_rate, sample_width, chunk_size, phrase_time_limit=15):
+        self.recognizer = recognizer
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.seconds_per_buffer = chunk_size / sample_rate
+        self.chunk_bytes = chunk_size * sample_width
+        self.phrase_time_limit = phrase_time_limit
+        self.reset()
+
+    def buffer_count(self, seconds):
+        return int(math.ceil(seconds / self.seconds_per_buffer))
+
+    def reset(self):
+        self.frames = collections.deque()  # Leading silence kept until a phrase starts
+        # Room for a typical command up front; longer phrases grow it
+        self.buffer = PhraseBuffer(self.buffer_count(PREALLOCATE_SECONDS) * self.chunk_bytes)
+        self.ends = []  # Buffer size after each chunk of the phrase, for trimming
+        self.in_phrase = False
+        self.pause_count = 0
+        self.phrase_count = 0
+        self.clock = 0.0  # Stream time in seconds
+        self.phrase_start = 0.0
+
+    def _adjust_threshold(self, energy):
+        # Dynamically adjust the energy threshold using asymmetric weighted average
+        r = self.recognizer
+        if r.dynamic_energy_threshold:
+            damping = r.dynamic_energy_adjustment_damping ** self.seconds_per_buffer
+            r.energy_threshold = r.energy_threshold * damping + energy * r.dynamic_energy_ratio * (1 - damping)
+
+    def feed(self, chunk):
+        """Consume one chunk; returns ('start', None), ('phrase', frames) or (None, None)"""
+        r = self.recognizer
+        self.clock += self.seconds_per_buffer
+        energy = audioop.rms(chunk, self.sample_width)
+
+        if not self.in_phrase:
+            self.frames.append(chunk)
+            # Only keep enough leading silence to avoid clipping the first word
+            if len(self.frames) > self.buffer_count(r.non_speaking_duration):
+                self.frames.popleft()
+            if energy > r.energy_threshold:
+                self.in_phrase = True
+                for frame in self.frames:
+                    self._write(frame)
+                self.frames.clear()
+                self.pause_count = self.phrase_count = 0
+                self.phrase_start = self.clock
+                return 'start', None
+            self._adjust_threshold(energy)
+            return None, None
+
+        self._write(chunk)
+        self.phrase_count += 1
+        self.pause_count = 0 if energy > r.energy_threshold else self.pause_count + 1
+        self._adjust_threshold(energy)
+        too_long = self.phrase_time_limit and self.clock - self.phrase_start > self.phrase_time_limit
+        if self.pause_count > self.buffer_count(r.pause_threshold) or too_long:
+            return self._finish()
+        return None, None
+
+    def flush(self):
+        """End of stream: emit whatever phrase is in progress"""
+        if self.in_phrase:
+            return self._finish()
+        return None, None
+
+    def _write(self, chunk):
+        self.buffer.write(chunk)
+        self.ends.append(len(self.buffer))
+
+    def _finish(self):
+        speech = self.phrase_count - self.pause_count
+        # Trim trailing silence down to the non-speaking margin
+        trailing = self.pause_count - self.buffer_count(self.recognizer.non_speaking_duration)
+        if trailing > 0:
+            self.buffer.truncate(self.ends[-trailing - 1] if trailing < len(self.ends) else 0)
+        self.ends = []
+        self.in_phrase = False
+        if speech < self.buffer_count(self.recognizer.phrase_threshold):
+            self.buffer.clear()
+            return None, None  # Too short to be a phrase (a click or a cough)
+        return 'phrase', self.buffer.take()
+
+
+class AudioPipeline:
+    """Capture -> segment -> recognize stages connected by bounded queues
+
+    Capture never pauses for recognition, speech output or command handling.
+    Pass an sr.AudioFile as the source to run the same pipeline over a WAV file.
+    """
+
+    def __init__(self, source, recognizer, dispatcher, on_speech_start=None,
+                 buffer_seconds=10, max_pending=8, phrase_time_limit=15, segmenter=None, on_chunk=None,
+                 gate=None, speculator=None, echo=None):
+        self.source = source
+        self.recognizer = recognizer
+        self.dispatcher = dispatcher
+        self.on_speech_start = on_speech_start
+        self.on_chunk = on_chunk  # Sees every captured chunk on the segmenter thread
+        self.gate = gate  # Optional wake-word gate deciding which phrases get recognized
+        self.speculator = speculator  # Optional speculation.Speculator following phrases as they are spoken
+        self.echo = echo  # Optional tts.EchoGuard: phrases of only our own playback are dropped
+        # A live microphone must never block, a file must never lose audio
+        self.live = not hasattr(source, 'filename_or_fileobject')
+        chunks = max(1, int(buffer_seconds * source.SAMPLE_RATE / source.CHUNK))
+        self.ring = RingBuffer(chunks, lossless=not self.live)
+        self.segments = queue.Queue(maxsize=max_pending)
+        self.transcripts = queue.Queue()
+        self.segmenter = segmenter or EnergySegmenter(
+            recognizer, source.SAMPLE_RATE, source.SAMPLE_WIDTH, source.CHUNK, phrase_time_limit)
+        self.dropped_segments = 0
+        self.gated_segments = 0
+        self.echo_segments = 0
+        self.chunks_captured = 0
+        self._user = None  # Whether the phrase being captured has had a chunk of the user's voice
+        self._stop = threading.Event()
+        self._threads = []
+        self._resume_at = 0.0  # time.monotonic() before which recognition waits, see hold()
+
+    def start(self):
+        if self.speculator is not None:
+            self.speculator.start()
+        for target, name in ((self._capture, 'capture'), (self._segment, 'segmenter'),
+                             (self._recognize, 'recognition')):
+            thread = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+        if self.speculator is not None:
+            self.speculator.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _capture(self):
+        stream, chunk = self.source.stream, self.source.CHUNK
+        while not self._stop.is_set():
+            buffer = stream.read(chunk)
+            if len(buffer) == 0:  # Reached the end of a file source
+                break
+            self.chunks_captured += 1
+            self.ring.put(buffer)
+        self.ring.put(_EOF)
+
+    def _emit(self, frames):
+        import clips
+        segmenter = self.segmenter
+        utterance = Utterance(
+            clips.Clip(frames, self.source.SAMPLE_RATE, self.source.SAMPLE_WIDTH),
+            segmenter.phrase_start, segmenter.clock)
+        if self.speculator is not None:
+            utterance.speculation = self.speculator.finish()
+        try:
+            self.segments.put(utterance, block=not self.live)
+        except queue.Full:
+            self.dropped_segments += 1
+            if utterance.speculation is not None:
+                utterance.speculation.rollback()
+
+    def _drop_echo(self):
+        """The phrase was only the assistant's own voice coming back through the microphone"""
+        self.echo_segments += 1
+        if self.speculator is not None:
+            speculation = self.speculator.finish()
+            if speculation is not None:
+                speculation.rollback()
+
+    def _segment(self):
+        while True:
+            chunk = self.ring.get(timeout=0.5)
+            if chunk is None:
+                if self._stop.is_set():
+                    break
+                continue
+            if chunk is _EOF:
+                while True:
+                    event, frames = self.segmenter.flush()
+                    if event != 'phrase':
+                        break
+                    self._emit(frames)
+                break
+            if self.on_chunk is not None:
+                self.on_chunk(chunk)
+            if self.speculator is not None:
+                self.speculator.feed(chunk)
+            user = self.echo is None or self.echo.hear(chunk, self.source.SAMPLE_WIDTH)
+            event, frames = self.segmenter.feed(chunk)
+            if event == 'start':
+                self._user = False
+                if self.speculator is not None:
+                    self.speculator.begin()
+            if user and self._user is False and self.segmenter.in_phrase:
+                self._user = True
+                if self.on_speech_start is not None:
+                    self.on_speech_start()
+            if event == 'phrase':
+                if self._user is False:
+                    self._drop_echo()
+                else:
+                    self._emit(frames)
+                self._user = None
+        self.segments.put(_EOF)
+
+    def hold(self, seconds):
+        """Start no recognition for the next `seconds` (a retry backoff); phrases queue up meanwhile"""
+        self._resume_at = time.monotonic() + seconds
+
+    def _recognize(self):
+        while True:
+            utterance = self.segments.get()
+            if utterance is _EOF:
+                break
+            delay = self._resume_at - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            try:
+                if self.gate is not None:
+                    with metrics.span('wake_gate'):
+                        audio = self.gate.admit(utterance.audio, utterance.started, utterance.ended)
+                    if audio is None:
+                        self.gated_segments += 1  # Background talk never reaches the recognizers
+                        if utterance.speculation is not None:
+                            utterance.speculation.rollback()
+                        continue
+                    utterance.audio = audio
+                with metrics.span('recognize') as span:
+                    utterance.hypothesis = self.dispatcher.recognize(utterance.audio)
+                    span.labels['backend'] = utterance.hypothesis.backend if utterance.hypothesis else 'none'
+                if utterance.hypothesis is None:
+                    utterance.errors = dict(getattr(self.dispatcher, 'errors', None) or {})
+            except Exception as e:
+                print(f"🚨 Recognition error: {e}")
+                utterance.error = e
+            utterance.recognized_at = time.perf_counter()
+            self.transcripts.put(utterance)
+        self.transcripts.put(None)
+
+    def utterances(self, poll=0.5):
+        """Yield recognized utterances until the source ends or the pipeline stops"""
+        while not self._stop.is_set():
+            try:
+                utterance = self.transcripts.get(timeout=poll)
+            except queue.Empty:
+                continue
+            if utterance is None:
+                return
+            yield utterance
+
+    def stats(self):
+        """Queue depths and drop counters for monitoring"""
+        return {
+            'ring_depth': len(self.ring),
+            'ring_capacity': self.ring.capacity,
+            'ring_dropped': self.ring.dropped,
+            'segments_pending': self.segments.qsize(),
+            'segments_dropped': self.dropped_segments,
+            'segments_gated': self.gated_segments,
+            'segments_echo': self.echo_segments,
+            'transcripts_pending': self.transcripts.qsize(),
+            'chunks_captured': self.chunks_captured,
+        }
@@ -0,0 +1,184 @@
+"""Command handlers added from a plugins directory, imported only when first needed
+
+Each plugin is a JSON manifest in PLUGIN_DIR (or a directory listed in
+$ASSISTANT_PLUGINS) naming its triggers and where its handler lives:
+
+    {"name": "coffee", "triggers": ["make coffee", "brew"], "priority": 60,
+     "module": "coffee", "handler": "handle", "async": true}
+
+The triggers go into the intent router at start-up; the module (coffee.py
+next to the manifest, or any importable module) is imported the first time
+one of them wins. A handler takes the same args dict as the built-in ones,
+here {'text', 'trigger', 'rest'}, and returns False to end the session. An
+async handler (or an `async def` one) runs on a worker thread and the voice
+loop moves on at once.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import glob
+import importlib
+import importlib.util
+import inspect
+import json
+import os
+import threading
+
+import intents
+import metrics
+
+PLUGIN_DIR = os.path.join(os.environ.get('XDG_CONFIG_HOME', os.path.expanduser('~/.config')),
+                          'ai_agents', 'plugins')
+
+# Below the built-in intents unless a manifest asks for more
+DEFAULT_PRIORITY = 5
+
+
+class Plugin:
+    """One manifest: triggers known from the start, handler imported on first use"""
+
+    def __init__(self, name, triggers, module, handler='handle', priority=DEFAULT_PRIORITY,
+                 run_async=False, directory=None):
+        self.name = name
+        self.triggers = list(triggers)
+        self.module = module
+        self.handler_name = handler
+        self.priority = priority
+        self.run_async = run_async
+        self.directory = directory
+        self.handler = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_manifest(cls, path):
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        return cls(manifest['name'], manifest['triggers'], manifest.get('module', manifest['name']),
+                   manifest.get('handler', 'handle'), manifest.get('priority', DEFAULT_PRIORITY),
+                   manifest.get('async', False), os.path.dirname(path))
+
+    def intent(self):
+        return intents.Intent(self.name, self.triggers, self.priority)
+
+    @property
+    def loaded(self):
+        return self.handler is not None
+
+    def load(self):
+        """The handler function, importing the plugin's module the first time"""
+        if self.handler is None:
+            with self._lock:
+                if self.handler is None:
+                    with metrics.span('plugin_load', plugin=self.name):
+                        self.handler = getattr(self._import(), self.handler_name)
+        return self.handler
+
+    def _import(self):
+        path = os.path.join(self.directory, f"{self.module}.py") if self.directory else None
+        if path is None or not os.path.exists(path):
+            return importlib.import_module(self.module)
+        # Plugins share a directory, not a package; keep their module names apart
+        spec = importlib.util.spec_from_file_location(f"assistant_plugins.{self.module}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<plugin {self.name!r} ({state})>"
+
+
+class PluginRegistry:
+    """Plugins found in a set of directories, registered with an intent router"""
+
+    def __init__(self, directories=None, router=None, workers=4):
+        if directories is None:
+            extra = os.environ.get('ASSISTANT_PLUGINS')
+            directories = [PLUGIN_DIR] + (extra.split(os.pathsep) if extra else [])
+        self.directories = list(directories)
+        self.router = router or intents.router
+        self.plugins = {}
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self.failures = 0
+
+    def discover(self):
+        """Read every manifest and register its triggers; no plugin code is imported"""
+        for directory in self.directories:
+            for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+                try:
+                    self.register(Plugin.from_manifest(path))
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    print(f"⚠ Skipping plugin {path}: {e}")
+        return self
+
+    def register(self, plugin):
+        self.router.add(plugin.intent())  # Raises ValueError if the name is taken
+        self.plugins[plugin.name] = plugin
+        return plugin
+
+    def __contains__(self, name):
+        return name in self.plugins
+
+    def intents(self):
+        return [self.router.intents[name] for name in self.plugins]
+
+    def args(self, match):
+        return {'text': match.text, 'trigger': match.trigger, 'rest': match.text[match.end:].strip()}
+
+    def run(self, name, args):
+        """Call plugin name's handler; async ones are queued and report True straight away"""
+        plugin = self.plugins[name]
+        try:
+            handler = plugin.load()
+        except Exception as e:
+            self.failures += 1
+            print(f"🚨 Plugin {name} failed to load: {e}")
+            return True
+        if not (plugin.run_async or inspect.iscoroutinefunction(handler)):
+            with metrics.span('plugin', plugin=name):
+                try:
+                    return self._call(handler, args) is not False
+                except Exception as e:  # A broken plugin must not take the assistant down
+                    self.failures += 1
+                    print(f"🚨 Plugin {name} failed: {e}")
+                    return True
+        # The copied context carries current_session, so a remote client still gets the reply
+        context = contextvars.copy_context()
+        future = self._pool().submit(context.run, self._timed, name, handler, args)
+        future.add_done_callback(lambda done: self._report(name, done))
+        return True
+
+    @staticmethod
+    def _call(handler, args):
+        result = handler(args)
+        if inspect.isawaitable(result):
+            result = asyncio.run(result)
+        return result
+
+    def _timed(self, name, handler, args):
+        with metrics.span('plugin', plugin=name, mode='async'):
+            return self._call(handler, args)
+
+    def _report(self, name, future):
+        error = future.exception()
+        if error is not None:
+            self.failures += 1
+            print(f"🚨 Plugin {name} failed: {error}")
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix='plugin')
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self):
+        return {'plugins': len(self.plugins), 'loaded': sum(p.loaded for p in self.plugins.values()),
+                'failures': self.failures}
@@ -0,0 +1,326 @@
+import collections
+import concurrent.futures
+import time
+
+import metrics
+import retry
+from cache import audio_fingerprint
+from lazy import LazyModule
+
+clips = LazyModule('clips')
+
+# How the dispatcher decides which backend result to return
+ORDERED = 'ordered'        # Best-ranked backend that succeeded, without waiting on lower ranks
+FIRST = 'first'            # First non-empty transcript, whichever backend produced it
+CONFIDENCE = 'confidence'  # Highest confidence once every backend has answered or timed out
+QUORUM = 'quorum'          # First transcript that enough backends agree on
+POLICIES = (ORDERED, FIRST, CONFIDENCE, QUORUM)
+
+
+class Hypothesis:
+    """A transcript produced by one backend"""
+
+    def __init__(self, text, backend, confidence=None, elapsed=0.0, alternatives=None):
+        self.text = text
+        self.backend = backend
+        self.confidence = confidence
+        self.elapsed = elapsed
+        self.alternatives = alternatives or [(text, confidence)]  # n-best (text, confidence), best first
+        self.score = confidence  # Confidence after rescoring against the command vocabulary
+
+    def __repr__(self):
+        return f"Hypothesis({self.text!r}, backend={self.backend!r}, confidence={self.confidence})"
+
+
+class Backend:
+    """A speech recognizer the dispatcher can run; subclasses implement transcribe()"""
+
+    name = 'backend'
+    streaming = False  # Implements stream() for partial transcripts while the phrase is being spoken
+
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+
+    def transcribe(self, audio):
+        """Return (text, confidence) or an n-best list of them for the audio; raise on failure"""
+        raise NotImplementedError
+
+    def stream(self, sample_rate, sample_width):
+        """A decoder for one phrase: feed(chunk) returns the transcript so far, close() ends it"""
+        raise NotImplementedError
+
+
+class GoogleBackend(Backend):
+    """Google Web Speech API through speech_recognition"""
+
+    def __init__(self, recognizer, language='en-US', timeout=5.0):
+        super().__init__(timeout)
+        self.recognizer = recognizer
+        self.language = language
+        self.name = f'google:{language}'
+
+    def transcribe(self, audio):
+        # The raw response carries every alternative; usually only the first has a confidence
+        response = self.recognizer.recognize_google(audio, language=self.language, show_all=True)
+        if not response:
+            return []
+        return [(alternative['transcript'], alternative.get('confidence'))
+                for alternative in response.get('alternative', [])]
+
+
+class SphinxBackend(Backend):
+    """Offline CMU Sphinx recognition"""
+
+    name = 'sphinx'
+
+    def __init__(self, recognizer, timeout=10.0):
+        super().__init__(timeout)
+        self.recognizer = recognizer
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_sphinx(audio), None
+
+
+class StubBackend(Backend):
+    """Deterministic local backend for exercising the dispatcher offline"""
+
+    def __init__(self, name, text='', confidence=None, delay=0.0, error=None, timeout=5.0):
+        super().__init__(timeout)
+        self.name = name
+        self.text = text  # A string or n-best list, or a callable taking the audio
+        self.confidence = confidence
+        self.delay = delay
+        self.error = error
+
+    def transcribe(self, audio):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        text = self.text(audio) if callable(self.text) else self.text
+        if isinstance(text, list):
+            return text  # Already an n-best list
+        return text, self.confidence
+
+
+def default_backends(recognizer):
+    """The recognizer chain the assistant has always used, best first"""
+    return [
+        GoogleBackend(recognizer, 'en-US'),      # Primary recognition (most accurate)
+        GoogleBackend(recognizer, 'en-IN'),      # Different language model
+        SphinxBackend(recognizer),               # Offline recognition
+    ]
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def rescore(hypothesis, fit, weight=0.3):
+    """Re-rank a hypothesis' n-best list by confidence blended with fit(text) in 0-1
+
+    Alternatives without a confidence of their own get the best one seen,
+    discounted by rank. The winning alternative becomes the hypothesis text.
+    """
+    known = [confidence for _, confidence in hypothesis.alternatives if confidence is not None]
+    top = known[0] if known else 0.5
+    best = None
+    for rank, (text, confidence) in enumerate(hypothesis.alternatives):
+        prior = confidence if confidence is not None else top * 0.9 ** rank
+        score = (1 - weight) * prior + weight * fit(text)
+        if best is None or score > best[0]:
+            best = (score, text, confidence)
+    hypothesis.score, hypothesis.text, hypothesis.confidence = best
+    return hypothesis
+
+
+class RecognitionDispatcher:
+    """Runs several recognizer backends concurrently on the same AudioData"""
+
+    def __init__(self, backends, policy=ORDERED, quorum=2, max_workers=None, cache=None,
+                 rescorer=None, rescore_weight=0.3, confident=None, hedge=1.0, breaker=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown recognition policy {policy!r}; expected one of {POLICIES}")
+        self.backends = list(backends)
+        self.policy = policy
+        self.quorum = quorum
+        # Abandoned slow calls keep their thread until they return, so leave headroom
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers or 2 * len(self.backends),
+            thread_name_prefix='recognizer',
+        )
+        self.errors = {}  # Backend name -> exception from the most recent call
+        self.cache = cache  # Optional TTLCache keyed by audio fingerprint
+        self.rescorer = rescorer  # Optional text -> 0-1 fit to the command vocabulary
+        self.rescore_weight = rescore_weight
+        # With a threshold, the first backend runs alone and the rest only when it is unsure
+        self.confident = confident
+        self.hedge = hedge  # ...or when it hasn't answered within this many seconds
+        self.calls = collections.Counter()  # Backend name -> calls made
+        self.turns = 0
+        # Optional name -> CircuitBreaker factory; a backend that keeps failing is skipped for a while
+        self.breakers = {backend.name: breaker(backend.name) for backend in self.backends} if breaker else {}
+
+    def _call(self, backend, audio):
+        start = time.perf_counter()
+        with metrics.span('recognizer', backend=backend.name):
+            result = backend.transcribe(audio)
+        elapsed = time.perf_counter() - start
+        if isinstance(result, list):
+            alternatives = [(text.strip(), confidence) for text, confidence in result if text and text.strip()]
+        else:
+            text, confidence = result if isinstance(result, tuple) else (result, None)
+            alternatives = [((text or '').strip(), confidence)]
+        text, confidence = alternatives[0] if alternatives else ('', None)
+        hypothesis = Hypothesis(text, backend.name, confidence, elapsed, alternatives)
+        if text and self.rescorer is not None:
+            rescore(hypothesis, self.rescorer, self.rescore_weight)
+        return hypothesis
+
+    def recognize(self, audio):
+        """Return the winning Hypothesis under the configured policy, or None"""
+        self.errors = {}
+        self.turns += 1
+        # Every backend reads the same samples, and an encoding one makes is reused by the rest
+        audio = clips.Clip.of(audio)
+        if self.cache is None:
+            return self._race(audio)
+
+        # An exact replay of a clip we've already recognized skips the backends
+        key = audio_fingerprint(audio)
+        hypothesis = self.cache.get(key)
+        if hypothesis is None:
+            hypothesis = self._race(audio)
+            if hypothesis is not None:
+                self.cache.put(key, hypothesis)
+        return hypothesis
+
+    def _race(self, audio):
+        start = time.monotonic()
+        futures = {}  # future -> (rank, backend, started)
+        results = {}  # rank -> Hypothesis
+        settled = set()  # Ranks that answered, failed or timed out
+
+        def launch(ranks):
+            for rank in ranks:
+                backend = self.backends[rank]
+                breaker = self.breakers.get(backend.name)
+                if breaker is not None and not breaker.allow():
+                    settled.add(rank)
+                    self.errors[backend.name] = retry.CircuitOpenError(f"{backend.name} is cooling down")
+                    continue
+                self.calls[backend.name] += 1
+                futures[self._executor.submit(self._call, backend, audio)] = (rank, backend, time.monotonic())
+            return {future for future, (rank, _, _) in futures.items() if rank in ranks}
+
+        tiered = self.confident is not None and len(self.backends) > 1
+        held_back = list(range(1, len(self.backends))) if tiered else []
+        policy = self.policy
+        pending = launch([rank for rank in range(len(self.backends)) if rank not in held_back])
+
+        try:
+            while pending or held_back:
+                now = time.monotonic()
+                # Per-backend timeouts: give up on calls that ran past their own limit
+                for future in list(pending):
+                    rank, backend, started = futures[future]
+                    if now - started >= backend.timeout:
+                        pending.discard(future)
+                        settled.add(rank)
+                        self.errors[backend.name] = TimeoutError(f"{backend.name} timed out after {backend.timeout}s")
+                        self._health(backend, self.errors[backend.name])
+
+                if held_back:
+                    primary = results.get(0)
+                    if primary is not None and (primary.score or 0.0) >= self.confident:
+                        return primary  # Confident enough: the fallbacks are never called
+                    if 0 in settled or now - start >= self.hedge:
+                        # Unsure, failed or slow: bring in the others and keep the most confident
+                        pending |= launch(held_back)
+                        held_back = []
+                        if 0 in settled:
+                            policy = CONFIDENCE
+                else:
+                    winner = self._decide(results, settled, policy=policy)
+                    if winner is not None or not pending:
+                        return winner
+
+                deadlines = [futures[f][2] + futures[f][1].timeout for f in pending]
+                if held_back:
+                    deadlines.append(start + self.hedge)
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=max(0.0, min(deadlines) - time.monotonic()),
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                for future in done:
+                    rank, backend, _ = futures[future]
+                    settled.add(rank)
+                    try:
+                        hypothesis = future.result()
+                    except Exception as e:
+                        self.errors[backend.name] = e
+                        self._health(backend, e)
+                        continue
+                    self._health(backend)
+                    if hypothesis.text:
+                        results[rank] = hypothesis
+            return self._decide(results, settled, final=True, policy=policy)
+        finally:
+            # Losers are ignored; queued ones never start
+            for future in pending:
+                future.cancel()
+
+    def _health(self, backend, error=None):
+        """Tell the backend's circuit breaker how the call went"""
+        breaker = self.breakers.get(backend.name)
+        if breaker is None:
+            return
+        # Audio nobody could make out says nothing about the backend itself
+        if error is None or retry.classify(error) == retry.UNKNOWN:
+            breaker.success()
+        elif retry.classify(error) == retry.NETWORK:
+            breaker.failure()
+
+    def stats(self):
+        return {
+            'turns': self.turns,
+            'calls': dict(self.calls),
+            'breakers': {name: breaker.stats() for name, breaker in self.breakers.items()},
+        }
+
+    def _decide(self, results, settled, final=False, policy=None):
+        if not results:
+            return None
+        policy = policy or self.policy
+        everyone = len(settled) == len(self.backends)
+
+        if policy == FIRST:
+            # results fills in completion order
+            return next(iter(results.values()))
+
+        if policy == ORDERED:
+            best = min(results)
+            # Only answer once every better-ranked backend has had its say
+            if final or all(rank in settled for rank in range(best)):
+                return results[best]
+            return None
+
+        if policy == QUORUM:
+            votes = {}
+            for hypothesis in results.values():
+                votes.setdefault(normalize(hypothesis.text), []).append(hypothesis)
+            for group in votes.values():
+                if len(group) >= self.quorum:
+                    return max(group, key=lambda h: h.score or 0.0)
+            if not (final or everyone):
+                return None
+            # No agreement: fall back to the best-ranked answer
+            return results[min(results)]
+
+        # CONFIDENCE
+        if final or everyone:
+            return max(results.values(), key=lambda h: h.score or 0.0)
+        return None
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,198 @@
+import random
+import threading
+import time
+
+import metrics
+from lazy import LazyModule
+
+sr = LazyModule('speech_recognition')
+
+# Why a listen/recognize attempt failed
+TIMEOUT = 'timeout'   # Nobody spoke before the listen timeout
+UNKNOWN = 'unknown'   # Speech was heard but no backend could transcribe it
+NETWORK = 'network'   # A backend could not be reached or answered with an error
+ERROR = 'error'       # Anything else
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised in place of calling a backend whose circuit is open"""
+
+
+def classify(error):
+    """Failure class of an exception raised while listening or recognizing"""
+    if isinstance(error, sr.WaitTimeoutError):
+        return TIMEOUT
+    if isinstance(error, sr.UnknownValueError):
+        return UNKNOWN
+    if isinstance(error, (sr.RequestError, CircuitOpenError, TimeoutError, ConnectionError)):
+        return NETWORK
+    return ERROR
+
+
+class Backoff:
+    """Exponential backoff with full jitter: a random wait in [0, min(cap, base * factor**n)]"""
+
+    def __init__(self, base=0.25, factor=2.0, cap=4.0, rng=None):
+        self.base = base
+        self.factor = factor
+        self.cap = cap
+        self.rng = rng or random.Random()
+
+    def delay(self, failures):
+        """Seconds to wait after the failures-th consecutive failure (1-based)"""
+        if failures <= 0 or self.base <= 0:
+            return 0.0
+        return self.rng.uniform(0, min(self.cap, self.base * self.factor ** (failures - 1)))
+
+
+class RetryPolicy:
+    """How many times, and how soon, to try again after each kind of failure
+
+    Silence and mumbling are the user's turn to try again, so they retry
+    straight away. Network trouble backs off, and the whole turn gives up
+    once `budget` seconds have gone by, however many attempts are left.
+    """
+
+    def __init__(self, attempts=5, budget=20.0, backoff=None, limits=None):
+        self.attempts = attempts
+        self.budget = budget
+        self.backoffs = {
+            TIMEOUT: Backoff(base=0.0),
+            UNKNOWN: Backoff(base=0.0),
+            NETWORK: backoff or Backoff(),
+            ERROR: Backoff(base=0.5, cap=2.0),
+        }
+        # Per-class attempt limits below the overall one
+        self.limits = {TIMEOUT: 3, **(limits or {})}
+        self.retries = {kind: 0 for kind in self.backoffs}
+        self.gave_up = 0
+
+    def start(self, attempts=None):
+        """Begin a turn, optionally with fewer attempts than the policy allows"""
+        return RetryState(self, attempts or self.attempts)
+
+    def stats(self):
+        return {'retries': dict(self.retries), 'gave_up': self.gave_up}
+
+
+class RetryState:
+    """Attempts made so far in one turn"""
+
+    def __init__(self, policy, attempts):
+        self.policy = policy
+        self.attempts = attempts
+        self.started = time.monotonic()
+        self.attempt = 0
+        self.failures = {}
+
+    def __iter__(self):
+        while self.attempt < self.attempts:
+            self.attempt += 1
+            yield self.attempt
+
+    def failed(self, kind):
+        """Record a failure; returns the delay before the next attempt, or None to give up"""
+        count = self.failures[kind] = self.failures.get(kind, 0) + 1
+        delay = self.policy.backoffs[kind].delay(count)
+        limit = self.policy.limits.get(kind, self.attempts)
+        if self.attempt >= self.attempts or count >= limit or \
+                time.monotonic() - self.started + delay > self.policy.budget:
+            self.policy.gave_up += 1
+            metrics.increment('retry_gave_up', {'failure': kind})
+            self.attempt = self.attempts
+            return None
+        self.policy.retries[kind] += 1
+        metrics.increment('retries', {'failure': kind})
+        return delay
+
+
+class CircuitBreaker:
+    """Stops calling a backend that keeps failing, then lets one trial call through after a cool-down
+
+    Each time the trial fails the cool-down doubles, up to max_cooldown.
+    """
+
+    def __init__(self, name, failures=3, cooldown=30.0, max_cooldown=300.0, clock=time.monotonic):
+        self.name = name
+        self.threshold = failures
+        self.base_cooldown = self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trips = self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go ahead; in half-open state only the one trial call does"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = self.clock()
+            if now - self.opened_at >= self.cooldown:
+                # The first trial after a cool-down, or another if the last one's answer was never awaited
+                self.opened_at = now
+                self._set(HALF_OPEN)
+                return True
+            self.rejected += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            if self.state != CLOSED:
+                self._set(CLOSED)
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self._trip()
+            elif self.state == CLOSED and self.failures >= self.threshold:
+                self._trip()
+
+    def _trip(self):
+        self.trips += 1
+        self.opened_at = self.clock()
+        self._set(OPEN)
+        print(f"⚡ {self.name} is failing; skipping it for {self.cooldown:.0f}s")
+
+    def _set(self, state):
+        self.state = state
+        metrics.gauge('circuit_open', {CLOSED: 0, HALF_OPEN: 0.5, OPEN: 1}[state], {'backend': self.name})
+
+    def stats(self):
+        return {'state': self.state, 'failures': self.failures, 'trips': self.trips,
+                'rejected': self.rejected, 'cooldown': self.cooldown}
+
+
+class PromptLimiter:
+    """Lets a spoken prompt through at most once per `interval` seconds, and any prompt once per `spacing`"""
+
+    def __init__(self, interval=10.0, spacing=2.0, clock=time.monotonic):
+        self.interval = interval
+        self.spacing = spacing
+        self.clock = clock
+        self._last = {}
+        self._last_any = None
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        with self._lock:
+            now = self.clock()
+            last = self._last.get(key)
+            if (last is not None and now - last < self.interval) or \
+                    (self._last_any is not None and now - self._last_any < self.spacing):
+                self.suppressed += 1
+                return False
+            self._last[key] = self._last_any = now
+            return True
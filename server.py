@@ -0,0 +1,332 @@
+"""Multi-session server: thin clients stream PCM audio, the assistant answers each one
+
+    python server.py --port 8765 --workers 4 --audio
+
+Every connection is a session with its own endpointer, pending-utterance
+queue and reply state. Recognition and command handling share one bounded
+thread pool. A session can have only a few utterances in recognition at
+once. When its queue of unanswered utterances is full, the server stops
+reading that client's socket, so TCP flow control slows the sender down.
+
+Wire protocol: frames of a 1-byte type, a 4-byte big-endian length and the payload.
+    client -> server   H hello JSON {"sample_rate", "sample_width", "audio"}
+                       A PCM chunk, E end of utterance, Q quit
+    server -> client   R reply JSON {"transcript", "responses", "actions", "end"}
+                       W WAV bytes of one spoken response (clients that asked for audio)
+                       D done with everything sent before E, X error JSON
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import struct
+import time
+
+import main
+import metrics
+import recognition
+import retry
+from lazy import LazyModule
+
+sr = LazyModule('speech_recognition')
+clips = LazyModule('clips')
+
+HELLO, AUDIO, END, QUIT = b'H', b'A', b'E', b'Q'
+REPLY, WAV, DONE, ERROR = b'R', b'W', b'D', b'X'
+
+HEADER = struct.Struct('>cI')
+MAX_FRAME = 4 * 1024 * 1024
+
+_END_MARK = object()
+
+
+async def read_frame(reader):
+    """Next (type, payload), or (None, None) once the peer has gone"""
+    try:
+        kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+        if length > MAX_FRAME:
+            raise ValueError(f"Frame of {length} bytes exceeds the {MAX_FRAME} byte limit")
+        return kind, await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None, None
+
+
+def write_frame(writer, kind, payload=b''):
+    if isinstance(payload, (dict, list)):
+        payload = json.dumps(payload).encode('utf-8')
+    writer.write(HEADER.pack(kind, len(payload)) + payload)
+
+
+class Session:
+    """Per-client state; main.speak and friends write here while its command runs"""
+
+    def __init__(self, session_id, sample_rate, sample_width, segmenter, want_audio,
+                 concurrency=1, max_pending=4):
+        self.id = session_id
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.segmenter = segmenter
+        self.want_audio = want_audio
+        self.slots = asyncio.Semaphore(concurrency)  # Utterances in recognition at once
+        self.pending = asyncio.Queue(maxsize=max_pending)  # Recognitions waiting to be answered
+        self.history = []
+        self.responses = []
+        self.actions = []
+        self.closed = False
+
+    def say(self, text):
+        self.responses.append(text)
+
+    def open_url(self, url):
+        self.actions.append({'type': 'open_url', 'url': url})
+        return True
+
+    def open_app(self, name):
+        self.actions.append({'type': 'open_app', 'app': name})
+        return True
+
+
+class AssistantServer:
+    """Accepts many streaming sessions and runs the assistant for each of them"""
+
+    def __init__(self, dispatcher, workers=4, max_sessions=64, session_concurrency=1, max_pending=4):
+        self.dispatcher = dispatcher
+        self.workers = workers
+        self.max_sessions = max_sessions
+        self.session_concurrency = session_concurrency
+        self.max_pending = max_pending
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='server')
+        self._ids = itertools.count(1)
+        self.sessions = {}
+        self.sessions_total = self.rejected = self.utterances = 0
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=8765):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _reject(self, writer, error):
+        self.rejected += 1
+        write_frame(writer, ERROR, {'error': error})
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            kind, payload = await read_frame(reader)
+            if kind != HELLO:
+                writer.close()
+                return
+            if len(self.sessions) >= self.max_sessions:
+                await self._reject(writer, 'busy')
+                return
+            hello = json.loads(payload)
+            rate, width = int(hello.get('sample_rate', 16000)), int(hello.get('sample_width', 2))
+            chunk = int(hello.get('chunk', 1024))
+            if rate <= 0 or chunk <= 0 or width not in (1, 2, 3, 4):
+                raise ValueError(f"unsupported audio format ({rate} Hz, {width}-byte samples, {chunk}-sample chunks)")
+            # Each session gets its own recognizer so energy endpointing adapts per client
+            segmenter = main.make_segmenter(sr.Recognizer(), rate, width, chunk)
+        except (ValueError, TypeError, AttributeError) as e:  # Oversized frame, or a hello that isn't our JSON
+            await self._reject(writer, f"bad hello: {e}")
+            return
+        session = Session(next(self._ids), rate, width, segmenter, bool(hello.get('audio')),
+                          self.session_concurrency, self.max_pending)
+        self.sessions[session.id] = session
+        self.sessions_total += 1
+        responder = asyncio.create_task(self._respond(session, writer))
+        try:
+            while not session.closed:
+                kind, payload = await read_frame(reader)
+                if kind is None or kind == QUIT:
+                    break
+                if kind == AUDIO:
+                    event, frames = session.segmenter.feed(payload)
+                    if event == 'phrase':
+                        await self._submit(session, frames)
+                elif kind == END:
+                    while True:
+                        event, frames = session.segmenter.flush()
+                        if event != 'phrase':
+                            break
+                        await self._submit(session, frames)
+                    await session.pending.put(_END_MARK)
+        except Exception as e:
+            print(f"🚨 Session {session.id} error: {e}")
+            write_frame(writer, ERROR, {'error': str(e)})
+        finally:
+            await session.pending.put(None)
+            await responder
+            del self.sessions[session.id]
+            writer.close()
+
+    async def _submit(self, session, frames):
+        # Waiting here (for a slot or for queue space) stops us reading the client's socket
+        await session.slots.acquire()
+        audio = clips.Clip(frames, session.sample_rate, session.sample_width)
+        task = asyncio.ensure_future(self._recognize(session, audio))
+        await session.pending.put((task, time.perf_counter()))
+        self.utterances += 1
+
+    async def _recognize(self, session, audio):
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.span('recognize', mode='server') as span:
+                hypothesis = await loop.run_in_executor(self._pool, self.dispatcher.recognize, audio)
+                span.labels['backend'] = hypothesis.backend if hypothesis else 'none'
+            return hypothesis
+        except Exception as e:
+            print(f"🚨 Recognition error in session {session.id}: {e}")
+            return None
+        finally:
+            session.slots.release()
+
+    async def _respond(self, session, writer):
+        """Answer a session's utterances in the order they were spoken"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await session.pending.get()
+            if item is None:
+                return
+            if session.closed:
+                if item is not _END_MARK:
+                    await item[0]  # Drain; the client said goodbye
+                continue
+            try:
+                if item is _END_MARK:
+                    write_frame(writer, DONE)
+                else:
+                    task, queued = item
+                    hypothesis = await task
+                    try:
+                        reply, wavs = await loop.run_in_executor(self._pool, self._run_command, session, hypothesis)
+                    except Exception as e:  # A failing handler costs this turn, not the session
+                        print(f"🚨 Command error in session {session.id}: {e}")
+                        write_frame(writer, ERROR, {'error': str(e)})
+                    else:
+                        write_frame(writer, REPLY, reply)
+                        for wav in wavs:
+                            write_frame(writer, WAV, wav)
+                        session.closed = reply['end']
+                    metrics.record('server_turn', time.perf_counter() - queued, {})
+                await writer.drain()  # A client that stops reading holds up only its own session
+            except ConnectionError:
+                session.closed = True
+
+    def _run_command(self, session, hypothesis):
+        """Runs on the pool: process_command with output captured for this session"""
+        session.responses, session.actions = [], []
+        text = hypothesis.text if hypothesis else None
+        token = main.current_session.set(session)
+        try:
+            if text:
+                session.history.append(text)
+                keep_running = main.process_command(text)
+            else:
+                main.speak(main.PROMPTS['not_caught'])
+                keep_running = True
+        finally:
+            main.current_session.reset(token)
+
+        wavs = []
+        if session.want_audio:
+            for response in session.responses:
+                path = main.voice.cached(response)
+                if path:
+                    with open(path, 'rb') as f:
+                        wavs.append(f.read())
+        reply = {
+            'session': session.id,
+            'transcript': text,
+            'backend': hypothesis.backend if hypothesis else None,
+            'responses': session.responses,
+            'actions': session.actions,
+            'audio': len(wavs),
+            'end': not keep_running,
+        }
+        return reply, wavs
+
+    def stats(self):
+        return {
+            'sessions_active': len(self.sessions),
+            'sessions_total': self.sessions_total,
+            'sessions_rejected': self.rejected,
+            'utterances': self.utterances,
+            'pool_backlog': self._pool._work_queue.qsize(),
+            'breakers': {name: breaker.stats() for name, breaker in self.dispatcher.breakers.items()},
+        }
+
+
+def build_dispatcher(backends='default', workers=4, stub_text='what time is it', stub_latency=0.0,
+                     audio_cache=True):
+    if backends == 'stub':
+        chain = [recognition.StubBackend('stub', stub_text, confidence=1.0, delay=stub_latency,
+                                         timeout=max(5.0, 2 * stub_latency))]
+    else:
+        chain = main.make_backends(sr.Recognizer(), None if backends == 'default' else backends)
+    # Every worker may be waiting on a full set of backend calls at once
+    return recognition.RecognitionDispatcher(chain, policy=main.RECOGNITION_POLICY,
+                                             max_workers=2 * workers * len(chain),
+                                             cache=main.audio_cache if audio_cache else None,
+                                             rescorer=main.command_fit, confident=main.CONFIDENT,
+                                             breaker=retry.CircuitBreaker)
+
+
+async def run(args):
+    server = AssistantServer(
+        build_dispatcher(args.backends, args.workers, args.stub_text, args.stub_latency,
+                         audio_cache=not args.no_audio_cache),
+        workers=args.workers, max_sessions=args.max_sessions,
+        session_concurrency=args.session_concurrency, max_pending=args.max_pending)
+    host, port = await server.start(args.host, args.port)
+    print(f"🌐 Listening on {host}:{port}", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        server.close()
+        print(f"📊 {server.stats()}")
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Serve the assistant to many streaming audio clients")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help="0 picks a free port")
+    parser.add_argument('--workers', type=int, default=4, help="Threads shared by recognition and commands")
+    parser.add_argument('--max-sessions', type=int, default=64)
+    parser.add_argument('--session-concurrency', type=int, default=1,
+                        help="Utterances of one session recognized at the same time")
+    parser.add_argument('--max-pending', type=int, default=4,
+                        help="Unanswered utterances per session before its socket stops being read")
+    parser.add_argument('--audio', action='store_true', help="Render fixed phrases so replies can carry audio")
+    parser.add_argument('--backends', choices=['default', 'online', 'offline_first', 'offline', 'stub'],
+                        default='default', help="'default' follows main.RECOGNITION_MODE")
+    parser.add_argument('--stub-text', default='what time is it')
+    parser.add_argument('--stub-latency', type=float, default=0.0)
+    parser.add_argument('--no-audio-cache', action='store_true',
+                        help="Recognize every clip, even exact replays of one already heard")
+    args = parser.parse_args()
+
+    if args.audio:
+        main.voice.prerender(main.FIXED_PHRASES)
+    main.plugin_registry.discover()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("\n🛑 Server stopped.")
+
+
+if __name__ == "__main__":
+    cli()
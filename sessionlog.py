@@ -0,0 +1,295 @@
+"""What the assistant remembers between runs: turns, the noise profile and app usage
+
+State lives in one append-only binary log. Each record is a small header
+(CRC-32, payload length, kind, timestamp) and a packed payload. At start-up
+the file is memory-mapped and replayed in a single pass; a record torn by a
+crash fails its checksum and everything from it on is cut off. Appends are
+encoded on the caller's thread and written by a background thread, so the
+voice loop never waits on the disk. Once the file outgrows compact_bytes it
+is rewritten as the latest noise profile, one app-usage snapshot and the
+most recent keep_turns turns.
+"""
+import collections
+import math
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+from tts import CACHE_ROOT
+
+LOG_PATH = os.path.join(CACHE_ROOT, 'session.log')
+MAGIC = b'AISLOG\x00\x01'
+
+# Record kinds
+TURN = 1         # transcript, intent, backend, recognize seconds, handling seconds
+CALIBRATION = 2  # energy threshold and VAD noise floor
+LAUNCH = 3       # one "open <app>" request
+USAGE = 4        # app name -> count snapshot written by compaction
+
+HEADER = struct.Struct('<IHBd')  # crc32, payload length, kind, unix time
+_CHECKED = struct.Struct('<HBd')  # The part of the header the checksum covers
+_SECONDS = struct.Struct('<ff')
+_LEVELS = struct.Struct('<dd')
+_COUNT = struct.Struct('<I')
+_LENGTH = struct.Struct('<H')
+MAX_TEXT = 1024  # Bytes of a transcript kept
+
+_STOP = object()
+
+
+def _pack_text(text):
+    data = (text or '').encode('utf-8')[:MAX_TEXT]
+    return _LENGTH.pack(len(data)) + data
+
+
+def _unpack_text(buffer, offset):
+    (length,) = _LENGTH.unpack_from(buffer, offset)
+    start = offset + _LENGTH.size
+    return bytes(buffer[start:start + length]).decode('utf-8', 'replace'), start + length
+
+
+def _number(value):
+    return math.nan if value is None else float(value)
+
+
+def _optional(value):
+    return None if math.isnan(value) else value
+
+
+def _turn_payload(transcript, intent, backend, recognize_seconds, handle_seconds):
+    return (_SECONDS.pack(_number(recognize_seconds), _number(handle_seconds))
+            + _pack_text(transcript) + _pack_text(intent) + _pack_text(backend))
+
+
+def _calibration_payload(profile):
+    return _LEVELS.pack(profile['energy_threshold'], _number(profile.get('noise_floor')))
+
+
+def encode(kind, timestamp, payload):
+    checked = _CHECKED.pack(len(payload), kind, timestamp)
+    return HEADER.pack(zlib.crc32(payload, zlib.crc32(checked)), len(payload), kind, timestamp) + payload
+
+
+def records(buffer, offset=len(MAGIC)):
+    """Yield (kind, timestamp, payload, end offset) for each intact record from offset on"""
+    while offset + HEADER.size <= len(buffer):
+        crc, length, kind, timestamp = HEADER.unpack_from(buffer, offset)
+        start = offset + HEADER.size
+        payload = buffer[start:start + length]
+        if len(payload) < length or zlib.crc32(payload, zlib.crc32(_CHECKED.pack(length, kind, timestamp))) != crc:
+            return  # Torn by a crash mid-write
+        offset = start + length
+        yield kind, timestamp, payload, offset
+
+
+class SessionLog:
+    """In-memory session state backed by the append-only log at path
+
+    Until open() is called nothing touches the disk: records only update
+    the in-memory state, which keeps benchmarks and tests off the real log.
+    """
+
+    def __init__(self, path=LOG_PATH, keep_turns=1000, compact_bytes=1 << 20):
+        self.path = path
+        self.keep_turns = keep_turns
+        self.compact_bytes = compact_bytes
+        self.turns = collections.deque(maxlen=keep_turns)  # Dicts, oldest first
+        self.calibration = {}
+        self.app_usage = collections.Counter()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._fd = None
+        self.size = 0
+        self.loaded = False
+        self.written = self.compactions = self.discarded = 0
+
+    def open(self):
+        """Replay the log, then start the writer thread"""
+        with self._lock:
+            if self.loaded:
+                return self
+            self._replay()
+            self.loaded = True
+            self._thread = threading.Thread(target=self._run, name="session-log", daemon=True)
+            self._thread.start()
+        return self
+
+    def _replay(self):
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except FileNotFoundError:
+            return
+        except OSError as e:  # Unreadable, read-only or a directory: run without the history
+            print(f"⚠ Could not read the session log: {e}")
+            return
+        try:
+            size = self.size = os.fstat(fd).st_size
+            if size < len(MAGIC):
+                return
+            end = len(MAGIC)
+            with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as view:
+                if view[:len(MAGIC)] != MAGIC:
+                    print(f"⚠ {self.path} is not a session log; starting a new one")
+                    self.discarded = size
+                    end = 0
+                else:
+                    for kind, timestamp, payload, end in records(view):
+                        self._apply(kind, timestamp, payload)
+            if end < size:
+                self.discarded += size - end
+                self.size = end
+                os.ftruncate(fd, end)  # Appends must not land after a torn record
+        finally:
+            os.close(fd)
+
+    def _apply(self, kind, timestamp, payload):
+        if kind == TURN:
+            recognize, handle = _SECONDS.unpack_from(payload)
+            transcript, offset = _unpack_text(payload, _SECONDS.size)
+            intent, offset = _unpack_text(payload, offset)
+            backend, offset = _unpack_text(payload, offset)
+            self.turns.append({'time': timestamp, 'transcript': transcript, 'intent': intent,
+                               'backend': backend or None, 'recognize_seconds': _optional(recognize),
+                               'handle_seconds': _optional(handle)})
+        elif kind == CALIBRATION:
+            threshold, floor = _LEVELS.unpack_from(payload)
+            self.calibration = {'energy_threshold': threshold, 'noise_floor': _optional(floor),
+                                'saved_at': timestamp}
+        elif kind == LAUNCH:
+            self.app_usage[_unpack_text(payload, 0)[0]] += 1
+        elif kind == USAGE:
+            offset = 0
+            while offset < len(payload):
+                name, offset = _unpack_text(payload, offset)
+                (count,) = _COUNT.unpack_from(payload, offset)
+                offset += _COUNT.size
+                self.app_usage[name] += count
+
+    def _append(self, kind, payload, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        record = encode(kind, timestamp, payload)
+        with self._lock:  # Compaction must see a record in both the state and the queue, or in neither
+            self._apply(kind, timestamp, payload)
+            if self.loaded:
+                self._queue.put(record)
+
+    def record_turn(self, transcript, intent, backend=None, recognize_seconds=None, handle_seconds=None):
+        self._append(TURN, _turn_payload(transcript, intent, backend, recognize_seconds, handle_seconds))
+
+    def record_calibration(self, profile):
+        self._append(CALIBRATION, _calibration_payload(profile), profile.get('saved_at'))
+
+    def record_launch(self, app_name):
+        self._append(LAUNCH, _pack_text(app_name))
+
+    def frequent_commands(self, count=50):
+        """The transcripts said most often, most frequent first"""
+        with self._lock:  # record_turn() appends from the voice loop
+            transcripts = [turn['transcript'] for turn in self.turns]
+        said = collections.Counter(text for text in transcripts if text)
+        return [text for text, _ in said.most_common(count)]
+
+    def _run(self):
+        stop = False
+        while not stop:
+            items = [self._queue.get()]
+            while True:  # Whatever else queued up meanwhile goes out in the same write
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            data = b''.join(item for item in items if isinstance(item, bytes))
+            try:
+                if data:
+                    self._write(data)
+                if self.size > self.compact_bytes:
+                    items += self._compact()
+            except OSError as e:
+                print(f"⚠ Could not write the session log: {e}")
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()  # A flush() waiting on this point
+                stop = stop or item is _STOP
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _write(self, data):
+        if self._fd is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            self.size = os.fstat(self._fd).st_size
+            if self.size == 0:
+                os.write(self._fd, MAGIC)
+                self.size = len(MAGIC)
+        os.write(self._fd, data)
+        self.size += len(data)
+        self.written += 1
+
+    def _compact(self):
+        """Rewrite the log as the current state: noise profile, app-usage snapshot, recent turns
+
+        Runs on the writer thread. Records still queued are already part of
+        the state, so they are dropped; flush and stop requests are returned.
+        """
+        with self._lock:
+            waiting = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if not isinstance(item, bytes):
+                    waiting.append(item)
+            state = [MAGIC]
+            if self.calibration:
+                state.append(encode(CALIBRATION, self.calibration['saved_at'], _calibration_payload(self.calibration)))
+            usage = b''
+            for name, count in self.app_usage.most_common():
+                usage += _pack_text(name) + _COUNT.pack(count)
+                if len(usage) > 0xFFFF - MAX_TEXT - 8:  # Payload lengths are 16-bit
+                    state.append(encode(USAGE, time.time(), usage))
+                    usage = b''
+            if usage:
+                state.append(encode(USAGE, time.time(), usage))
+            for turn in self.turns:
+                state.append(encode(TURN, turn['time'], _turn_payload(
+                    turn['transcript'], turn['intent'], turn['backend'],
+                    turn['recognize_seconds'], turn['handle_seconds'])))
+        data = b''.join(state)
+        partial = f"{self.path}.tmp"
+        with open(partial, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, self.path)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self.size = len(data)
+        self.compactions += 1
+        return waiting
+
+    def flush(self, timeout=5.0):
+        """Wait until everything recorded so far is on disk"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self):
+        return {'turns': len(self.turns), 'apps': len(self.app_usage), 'bytes': self.size,
+                'writes': self.written, 'compactions': self.compactions, 'discarded_bytes': self.discarded,
+                'pending': self._queue.qsize()}
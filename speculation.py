@@ -0,0 +1,243 @@
+"""Starting a command's slow side effect before the phrase is over
+
+While a phrase is still being captured, a local recognizer follows it and
+reports partial transcripts: natively for a backend that streams (the
+grammar decoder), or by decoding the phrase so far again every few hundred
+milliseconds. Each partial is routed, and once the same action has held
+for `hold` seconds of audio it is started: an application launch, a reply
+rendered ahead of time. The final transcript settles it. The action stays
+if the final one plans the same, and is undone if it doesn't.
+"""
+import collections
+import math
+import queue
+import threading
+import time
+
+import metrics
+from lazy import LazyModule
+
+sr = LazyModule('speech_recognition')
+
+OPEN = 'open'
+COMMITTED = 'committed'
+ROLLED_BACK = 'rolled_back'
+SETTLED = 'settled'  # Nothing had been started
+
+_STOP = object()
+
+
+def transcript(result):
+    """The best text out of anything Backend.transcribe() returns"""
+    if isinstance(result, list):
+        return result[0][0] if result else ''
+    return (result[0] if isinstance(result, tuple) else result) or ''
+
+
+class ChunkedStream:
+    """Partial transcripts from a backend that only takes whole phrases: decode the phrase so far every interval"""
+
+    def __init__(self, backend, sample_rate, sample_width, interval=0.4):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.step = int(interval * sample_rate) * sample_width
+        self.audio = bytearray()
+        self.decoded = 0  # Bytes of audio the last decode covered
+
+    def feed(self, chunk):
+        """Add one chunk; returns the transcript so far when a decode was due, else None"""
+        import clips
+        self.audio += chunk
+        if len(self.audio) - self.decoded < self.step:
+            return None
+        self.decoded = len(self.audio)
+        try:
+            return transcript(self.backend.transcribe(clips.Clip(bytes(self.audio), self.sample_rate,
+                                                                 self.sample_width)))
+        except sr.UnknownValueError:
+            return ''  # Nothing recognizable yet
+
+    def close(self):
+        self.audio = bytearray()
+
+
+class Speculation:
+    """What was started early for one phrase; settle() keeps or undoes it"""
+
+    def __init__(self, speculator):
+        self.speculator = speculator
+        self.state = OPEN
+        self.candidate = None  # Key of the action the latest partials plan
+        self.since = 0.0       # Audio seconds into the phrase when they started planning it
+        self.key = None        # Key of the action started, if any
+        self.undo = None
+        self.started = None    # perf_counter() when it was started
+        self._lock = threading.Lock()
+
+    def hear(self, plan, at):
+        """One partial's plan, (key, start) or None, at `at` seconds into the phrase"""
+        key = plan[0] if plan else None
+        if key != self.candidate:
+            self.candidate, self.since = key, at
+        if key is None or at - self.since < self.speculator.hold:
+            return
+        with self._lock:
+            if self.state != OPEN or self.key is not None:
+                return
+            self.key, self.started = key, time.perf_counter()
+            self.undo = plan[1]()
+            self.speculator.speculated += 1
+
+    def settle(self, text):
+        """Final transcript in (None if nothing was recognized); True if the early action stands"""
+        plan = self.speculator.planner(text) if text else None
+        with self._lock:
+            if self.state != OPEN:
+                return self.state == COMMITTED
+            if self.key is None:
+                self.state = SETTLED
+                return False
+            if plan is not None and plan[0] == self.key:
+                self.state = COMMITTED
+                self.speculator.committed += 1
+            else:
+                self.state = ROLLED_BACK
+                self.speculator.rolled_back += 1
+                if self.undo is not None:
+                    try:
+                        self.undo()
+                    except Exception as e:
+                        print(f"🚨 Could not undo {self.key}: {e}")
+        metrics.record('speculation', time.perf_counter() - self.started, {'action': self.key[0],
+                                                                          'outcome': self.state})
+        return self.state == COMMITTED
+
+    def rollback(self):
+        """The phrase was dropped (too short, or not for us): undo whatever was started"""
+        self.settle(None)
+
+    def __repr__(self):
+        return f"<speculation {self.key!r} ({self.state})>"
+
+
+class Speculator:
+    """Follows each phrase on a worker thread and starts its action once the partials agree
+
+    The capture pipeline calls feed() with every chunk, begin() at speech
+    onset and finish() when the phrase is emitted; none of them wait on
+    decoding. backend is a lazy.Lazy, so the local recognizer is built on
+    the worker thread. planner(text) returns (key, start) for the action a
+    transcript would trigger, or None; start() returns the undo, or None.
+    """
+
+    def __init__(self, backend, planner, sample_rate, sample_width, chunk_size, hold=0.25, interval=0.4,
+                 preroll=0.3):
+        self.backend = backend
+        self.planner = planner
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.hold = hold
+        self.interval = interval  # Between decodes of a backend that doesn't stream
+        # Chunks from just before the onset, so the first word isn't cut off
+        self._ring = collections.deque(maxlen=max(1, math.ceil(preroll * sample_rate / chunk_size)))
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._current = None  # Speculation for the phrase being captured; segmenter thread only
+        self.disabled = False
+        self.phrases = self.partials = self.speculated = self.committed = self.rolled_back = 0
+        self.decode_seconds = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="speculation", daemon=True)
+                self._thread.start()
+        return self
+
+    def feed(self, chunk):
+        if not self.disabled:
+            self._queue.put(chunk)
+
+    def begin(self):
+        if self.disabled:
+            return
+        if self._current is not None:
+            self._current.rollback()  # The segmenter threw that phrase away
+        self._current = Speculation(self)
+        self._queue.put(self._current)
+
+    def finish(self):
+        """The phrase just emitted is over; returns its Speculation for the final transcript to settle"""
+        speculation, self._current = self._current, None
+        self._queue.put(None)
+        return speculation
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _load(self):
+        if self.disabled:
+            return None
+        try:
+            return self.backend.get()
+        except Exception as e:
+            self.disabled = True
+            print(f"⚠ No partial transcripts ({e}); commands will wait for the whole phrase")
+            return None
+
+    def _open(self):
+        backend = self._load()
+        if backend is None:
+            return None
+        if backend.streaming:
+            return backend.stream(self.sample_rate, self.sample_width)
+        return ChunkedStream(backend, self.sample_rate, self.sample_width, self.interval)
+
+    def _run(self):
+        self._load()  # Before the first phrase rather than during it
+        stream = speculation = None
+        heard = 0  # Bytes of the current phrase decoded
+        while True:
+            item = self._queue.get()
+            if item is _STOP or item is None or isinstance(item, Speculation):
+                if stream is not None:
+                    stream.close()
+                stream = speculation = None
+                if item is _STOP:
+                    return
+                if item is None:
+                    continue
+                speculation, stream, heard = item, self._open(), 0
+                self.phrases += 1
+                chunks = list(self._ring)
+                self._ring.clear()
+            elif stream is None:
+                self._ring.append(item)
+                continue
+            else:
+                chunks = [item]
+            for chunk in chunks:
+                start = time.perf_counter()
+                try:
+                    text = stream.feed(chunk)
+                except Exception as e:
+                    print(f"🚨 Partial recognition error: {e}")
+                    stream.close()
+                    stream = None
+                    break
+                finally:
+                    self.decode_seconds += time.perf_counter() - start
+                heard += len(chunk)
+                if text:
+                    self.partials += 1
+                    speculation.hear(self.planner(text), heard / (self.sample_rate * self.sample_width))
+
+    def stats(self):
+        return {'phrases': self.phrases, 'partials': self.partials, 'speculated': self.speculated,
+                'committed': self.committed, 'rolled_back': self.rolled_back,
+                'decode_seconds': self.decode_seconds, 'pending': self._queue.qsize()}
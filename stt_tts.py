@@ -1,25 +1,58 @@
-import speech_recognition as sr
-import pyttsx3
 import time
 
-# Initialize TTS engine with better settings
-engine = pyttsx3.init()
-engine.setProperty('rate', 180)  # Slower, clearer speech
-engine.setProperty('volume', 0.9)  
+import calibration
+import recognition
+import sessionlog
+import tts
+from lazy import LazyModule
 
-def speak(text):
-    """Enhanced text-to-speech with better pronunciation"""
-    engine.say(text)
-    engine.runAndWait()
+sr = LazyModule('speech_recognition')  # Imported on first use; it is the slowest import by far
 
-def setup_microphone_calibration(recognizer, source):
-    """One-time microphone setup for better recognition"""
-    print("🔧 Setting up microphone... Please be quiet for 2 seconds.")
-    recognizer.adjust_for_ambient_noise(source, duration=2)
-    print(f" Microphone calibrated. Energy threshold: {recognizer.energy_threshold}")
+# Speech output runs on its own thread so the microphone is never deaf while talking
+voice = tts.SpeechWorker(rate=180, volume=0.9)
+# Keeps the assistant from hearing itself: its replies neither barge in nor get recognized
+echo_guard = tts.EchoGuard(voice.speaking)
 
-def listen_and_recognize(recognizer, source, retries=5):
+def speak(text, priority=tts.NORMAL, block=False):
+    """Queue text for speech without waiting for playback to finish"""
+    return voice.say(text, priority=priority, block=block)
+
+def barge_in(chunk, sample_width):
+    """Cut off whatever the assistant is still saying if chunk is the user talking; True if it is"""
+    if not echo_guard.hear(chunk, sample_width):
+        return False  # Our own voice coming back through the microphone
+    voice.interrupt()
+    return True
+
+def listen_for_phrase(recognizer, source, timeout=8, phrase_time_limit=15):
+    """Capture one phrase, interrupting the assistant as soon as the user starts talking
+
+    Phrases that are only the assistant's own voice, heard from the speakers, are skipped.
+    """
+    while True:
+        chunks = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit, stream=True)
+        first = next(chunks)
+        # Barge-in: speech onset cuts off whatever the assistant is still saying
+        user = barge_in(first.frame_data, first.sample_width)
+        frames = [first.frame_data]
+        for chunk in chunks:
+            if chunk.frame_data is not frames[-1]:
+                frames.append(chunk.frame_data)
+                user = user or barge_in(chunk.frame_data, first.sample_width)
+        if user:
+            return sr.AudioData(b"".join(frames), first.sample_rate, first.sample_width)
+
+def start_calibration(recognizer, source, log):
+    """Start from the cached noise profile and calibrate on the audio listening reads anyway"""
+    calibration.apply_profile(calibration.load_profile(log), recognizer, None)
+    calibrator = calibration.BackgroundCalibration(
+        recognizer, None, source.SAMPLE_RATE, source.SAMPLE_WIDTH, source.CHUNK, log=log)
+    source.stream = calibration.TappedStream(source.stream, calibrator.feed)
+
+def listen_and_recognize(recognizer, source, retries=5, dispatcher=None):
     """Enhanced speech recognition with multiple engines and better settings"""
+    if dispatcher is None:
+        dispatcher = recognition.RecognitionDispatcher(recognition.default_backends(recognizer))
     
     # Optimized recognizer settings for better accuracy
     recognizer.energy_threshold = max(recognizer.energy_threshold, 300)
@@ -35,7 +68,8 @@ def listen_and_recognize(recognizer, source, retries=5):
                 speak("I'm ready to listen. Please speak clearly.")
             
             # Listen with longer timeout for complete thoughts
-            audio = recognizer.listen(
+            audio = listen_for_phrase(
+                recognizer,
                 source, 
                 timeout=8,  # Wait longer for user to start speaking
                 phrase_time_limit=15  # Allow longer phrases
@@ -43,30 +77,12 @@ def listen_and_recognize(recognizer, source, retries=5):
             
             print(" Processing your speech...")
             
-            # Primary recognition with Google (most accurate)
-            try:
-                text = recognizer.recognize_google(audio, language='en-US')
-                if text.strip():  # Make sure we got actual text
-                    return text.strip()
-            except:
-                pass
-            
-            # Backup recognition with Google (different language model)
-            try:
-                text = recognizer.recognize_google(audio, language='en-IN')
-                if text.strip():
-                    return text.strip()
-            except:
-                pass
-            
-            # If Google fails, try offline recognition
-            try:
-                text = recognizer.recognize_sphinx(audio)
-                if text.strip():
+            # Run every recognizer at once on the same audio
+            result = dispatcher.recognize(audio)
+            if result is not None:
+                if result.backend == 'sphinx':
                     print(" Used offline recognition")
-                    return text.strip()
-            except:
-                pass
+                return result.text
                 
         except sr.UnknownValueError:
             if attempt < retries - 1:
@@ -86,7 +102,7 @@ def listen_and_recognize(recognizer, source, retries=5):
                 if text.strip():
                     print(" Used offline backup")
                     return text.strip()
-            except:
+            except (sr.UnknownValueError, sr.RequestError):
                 if attempt < retries - 1:
                     speak("Let me try again with a different approach.")
                     time.sleep(1)
@@ -110,7 +126,8 @@ def listen_and_recognize(recognizer, source, retries=5):
 
 def main():
     recognizer = sr.Recognizer()
-    microphone_calibrated = False
+    dispatcher = recognition.RecognitionDispatcher(recognition.default_backends(recognizer))
+    log = sessionlog.SessionLog().open()  # Only the noise profile is read and written here
     
     print(" Enhanced Voice Assistant Starting...")
     print(" Tip: Speak clearly and at normal pace for best results")
@@ -118,16 +135,14 @@ def main():
     
     try:
         with sr.Microphone() as source:
-            # One-time calibration
-            if not microphone_calibrated:
-                setup_microphone_calibration(recognizer, source)
-                microphone_calibrated = True
-                speak("Voice assistant is ready! I will repeat everything you say.")
+            # Calibration runs in the background, so the first prompt doesn't wait on it
+            start_calibration(recognizer, source, log)
+            speak("Voice assistant is ready! I will repeat everything you say.")
             
             print("\n Voice Assistant is active and listening...")
             
             while True:
-                result = listen_and_recognize(recognizer, source)
+                result = listen_and_recognize(recognizer, source, dispatcher=dispatcher)
                 
                 if result:
                     print(f"\n You said: '{result}'")
@@ -137,6 +152,7 @@ def main():
                     if any(word in result.lower() for word in ['goodbye', 'bye', 'stop assistant', 'quit', 'exit']):
                         speak(f"You said: {result}")
                         speak("Goodbye! Voice assistant is shutting down.")
+                        voice.wait()  # Let the goodbye finish before exiting
                         break
                     
                     # Repeat what user said
@@ -151,10 +167,13 @@ def main():
                 
     except KeyboardInterrupt:
         print("\n\n Voice assistant stopped by Harsh.")
-        speak("Voice assistant stopped. Goodbye!")
+        voice.flush()
+        speak("Voice assistant stopped. Goodbye!", priority=tts.URGENT, block=True)
     except Exception as e:
         print(f"\n Fatal Error: {e}")
-        speak("A critical error occurred. Shutting down.")
+        speak("A critical error occurred. Shutting down.", priority=tts.URGENT, block=True)
+    finally:
+        log.close()  # Writes out the noise profile if calibration finished
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,234 @@
+"""Batch transcription of recorded voice commands
+
+    python transcribe.py archive/ --output commands.jsonl
+    python transcribe.py archive/manifest.jsonl --workers 8 --policy confidence
+
+Takes a directory (searched recursively for WAV, AIFF and FLAC files) or a
+manifest.jsonl with one {"file": ...} object per line. Each file is decoded,
+split into phrases by the configured endpointer and transcribed by the
+recognizer chain. Files are spread over a process pool with one process per
+core by default. One JSONL line per file is written as soon as that file is
+done. The output doubles as the checkpoint: run the same command again after
+an interruption and finished files are skipped. Files that failed, or had
+phrases no backend could be reached for, are tried again.
+"""
+import argparse
+import audioop
+import concurrent.futures
+import json
+import os
+import time
+
+import main
+import recognition
+import retry
+from lazy import LazyModule
+
+sr = LazyModule('speech_recognition')
+clips = LazyModule('clips')
+
+AUDIO_EXTENSIONS = ('.wav', '.aif', '.aiff', '.flac')
+CHUNK = 1024
+
+# Per-process state, built once by _init_worker
+_recognizer = None
+_dispatcher = None
+_expected = ''  # Transcript the stub backend answers with for the current file
+
+
+def find_inputs(target):
+    """(path, expected transcript or None) for every audio file named by target"""
+    if os.path.isdir(target):
+        paths = []
+        for root, _, files in os.walk(target):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(AUDIO_EXTENSIONS))
+        return [(path, None) for path in sorted(paths)]
+
+    inputs = []
+    base = os.path.dirname(target)
+    with open(target, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                inputs.append((os.path.join(base, entry['file']), entry.get('transcript')))
+    return inputs
+
+
+def load_checkpoint(output):
+    """Files already transcribed in the output
+
+    Failed records are dropped from the output so the next run replaces
+    them, as is a half-written last line from an interrupted run.
+    """
+    done = set()
+    if not os.path.exists(output):
+        return done
+    valid = []
+    with open(output, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('error') is not None:
+                continue
+            done.add(record['file'])
+            valid.append(line if line.endswith('\n') else line + '\n')
+    with open(output, 'w', encoding='utf-8') as f:
+        f.writelines(valid)
+    return done
+
+
+def _init_worker(backends, policy):
+    global _recognizer, _dispatcher
+    _recognizer = sr.Recognizer()
+    if backends == 'stub':
+        chain = [recognition.StubBackend('stub', lambda audio: _expected, confidence=1.0)]
+    else:
+        chain = main.make_backends(_recognizer, None if backends == 'default' else backends)
+    _dispatcher = recognition.RecognitionDispatcher(chain, policy=policy, rescorer=main.command_fit,
+                                                    confident=main.CONFIDENT)
+
+
+def decode(path):
+    """Mono 16-bit PCM and sample rate of an audio file"""
+    with sr.AudioFile(path) as source:
+        audio = _recognizer.record(source)
+    frames = audio.frame_data
+    if audio.sample_width != 2:
+        frames = audioop.lin2lin(frames, audio.sample_width, 2)
+    return frames, audio.sample_rate
+
+
+def segment(frames, sample_rate):
+    """(start, end, pcm) of each phrase the endpointer finds in the file"""
+    segmenter = main.make_segmenter(_recognizer, sample_rate, 2, CHUNK)
+    phrases = []
+    step = CHUNK * 2
+    frames = memoryview(frames)  # Chunks are views of the decoded file, not copies
+
+    def collect(event, pcm):
+        if event == 'phrase':
+            phrases.append((segmenter.phrase_start, segmenter.clock, pcm))
+
+    for offset in range(0, len(frames), step):
+        collect(*segmenter.feed(frames[offset:offset + step]))
+    while True:
+        event, pcm = segmenter.flush()
+        if event != 'phrase':
+            break
+        collect(event, pcm)
+    return phrases
+
+
+def transcribe_file(path, expected=None):
+    """Runs in a worker process: decode, segment, recognize and route one file"""
+    global _expected
+    _expected = expected or ''
+    record = {'file': path, 'transcript': None, 'backend': None, 'intent': None,
+              'segments': [], 'error': None, 'seconds': {}}
+    timings = record['seconds']
+    start = time.perf_counter()
+    try:
+        frames, sample_rate = decode(path)
+        decoded = time.perf_counter()
+        timings['decode'] = decoded - start
+        record['duration'] = len(frames) / 2 / sample_rate
+
+        phrases = segment(frames, sample_rate)
+        segmented = time.perf_counter()
+        timings['segment'] = segmented - decoded
+
+        for phrase_start, phrase_end, pcm in phrases:
+            hypothesis = _dispatcher.recognize(clips.Clip(pcm, sample_rate, 2))
+            text = hypothesis.text if hypothesis else None
+            error = None
+            if hypothesis is None:
+                # Speech the backends didn't understand is an answer; one they couldn't be asked about isn't
+                unreached = [e for e in _dispatcher.errors.values() if retry.classify(e) == retry.NETWORK]
+                if unreached:
+                    error = f"{type(unreached[0]).__name__}: {unreached[0]}"
+            record['segments'].append({
+                'start': round(phrase_start, 3), 'end': round(phrase_end, 3), 'transcript': text,
+                'backend': hypothesis.backend if hypothesis else None,
+                'confidence': hypothesis.confidence if hypothesis else None,
+                'intent': main.resolve_command(text)[0] if text else None,
+                'error': error,
+            })
+        recognized = time.perf_counter()
+        timings['recognize'] = recognized - segmented
+        failed = [s for s in record['segments'] if s['error']]
+        if failed:
+            record['error'] = f"{len(failed)} of {len(record['segments'])} phrases failed: {failed[0]['error']}"
+
+        heard = [s for s in record['segments'] if s['transcript']]
+        if heard:
+            record['transcript'] = ' '.join(s['transcript'] for s in heard)
+            record['backend'] = heard[0]['backend']
+            record['intent'] = main.resolve_command(record['transcript'])[0]
+        timings['route'] = time.perf_counter() - recognized
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    timings['total'] = time.perf_counter() - start
+    return record
+
+
+def run(inputs, output, workers, backends, policy):
+    """Transcribe inputs on a process pool, appending each record to output as it finishes"""
+    counts = {'done': 0, 'errors': 0}
+    with open(output, 'a', encoding='utf-8') as out, concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(backends, policy)) as pool:
+        # Keep a few files queued per worker rather than submitting the whole archive
+        inputs = iter(inputs)
+        in_flight = set()
+        while True:
+            for path, expected in inputs:
+                in_flight.add(pool.submit(transcribe_file, path, expected))
+                if len(in_flight) >= 4 * workers:
+                    break
+            if not in_flight:
+                break
+            finished, in_flight = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                record = future.result()
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+                counts['done'] += 1
+                counts['errors'] += record['error'] is not None
+                status = f"❌ {record['error']}" if record['error'] else f"{record['intent']}: {record['transcript']!r}"
+                print(f"📝 {record['file']} ({record['seconds']['total']:.2f}s) {status}")
+    return counts
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Transcribe and route an archive of recorded voice commands")
+    parser.add_argument('target', help="Directory of audio files or a manifest.jsonl")
+    parser.add_argument('--output', default='transcripts.jsonl', help="JSONL results, also used to resume")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--policy', choices=recognition.POLICIES, default=main.RECOGNITION_POLICY)
+    parser.add_argument('--backends', choices=['default', 'online', 'offline_first', 'offline', 'stub'],
+                        default='default',
+                        help="default follows main.RECOGNITION_MODE; stub answers with the manifest transcript")
+    parser.add_argument('--restart', action='store_true', help="Ignore and overwrite an existing output file")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    done = load_checkpoint(args.output)
+    inputs = [(path, expected) for path, expected in find_inputs(args.target) if path not in done]
+    if done:
+        print(f"⏩ Resuming: {len(done)} files already transcribed")
+    print(f"🎧 Transcribing {len(inputs)} files with {args.workers} workers")
+
+    start = time.perf_counter()
+    try:
+        counts = run(inputs, args.output, args.workers, args.backends, args.policy)
+    except KeyboardInterrupt:
+        print(f"\n🛑 Interrupted; run the same command again to resume from {args.output}")
+        return
+    elapsed = time.perf_counter() - start
+    print(f"✅ {counts['done']} files in {elapsed:.1f}s ({counts['errors']} errors), written to {args.output}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,332 @@
+import audioop
+import collections
+import hashlib
+import itertools
+import os
+import platform
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import metrics
+
+# Lower numbers are spoken first
+URGENT = 0
+NORMAL = 5
+BACKGROUND = 9
+
+SAY = 'say'
+RENDER = 'render'
+SPECULATIVE = 'speculative'  # Render of a reply that may never be said
+MARK = 'mark'
+STOP = 'stop'
+
+CACHE_ROOT = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'ai_agents')
+
+
+class WavPlayer:
+    """Plays pre-rendered audio files with whatever the platform ships"""
+
+    def __init__(self):
+        self.system = platform.system().lower()
+        self.command = None
+        if self.system == 'darwin':
+            self.command = shutil.which('afplay')
+        elif self.system != 'windows':
+            self.command = shutil.which('paplay') or shutil.which('aplay')
+        self._process = None
+
+    @property
+    def available(self):
+        return self.system == 'windows' or self.command is not None
+
+    def play(self, path):
+        """Play path to the end, or until stop() is called"""
+        if self.system == 'windows':
+            import winsound
+            winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_NODEFAULT)
+            return
+        self._process = subprocess.Popen([self.command, path],
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._process.wait()
+        self._process = None
+
+    def stop(self):
+        if self.system == 'windows':
+            import winsound
+            winsound.PlaySound(None, winsound.SND_PURGE)
+        elif self._process is not None:
+            self._process.terminate()
+
+
+class PhraseCache:
+    """On-disk WAV renders of fixed phrases, keyed by text plus voice, rate and volume"""
+
+    def __init__(self, directory=os.path.join(CACHE_ROOT, 'tts')):
+        self.directory = directory
+        self.hits = self.misses = 0
+
+    def path(self, text, voice, rate, volume):
+        key = hashlib.sha1(f"{voice}|{rate}|{volume}|{text}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def get(self, text, voice, rate, volume):
+        """Path of the cached render, or None"""
+        path = self.path(text, voice, rate, volume)
+        try:
+            if os.path.getsize(path) > 0:
+                self.hits += 1
+                return path
+        except OSError:
+            pass
+        self.misses += 1
+        return None
+
+
+class EchoGuard:
+    """Tells the user's voice from the assistant's own, picked up by the microphone from the speakers
+
+    While speech output plays (and for `tail` seconds after, while the room
+    rings), every captured chunk counts as playback unless it is `ratio`
+    times louder than the playback has been heard at. The first `warmup`
+    seconds of each playback only teach the guard that level. It carries
+    over to the next playback, since speakers and room stay the same,
+    halving every `half_life` seconds of playback.
+    """
+
+    def __init__(self, speaking, ratio=2.0, warmup=0.5, tail=0.3, half_life=2.0, clock=time.monotonic):
+        self.speaking = speaking  # SpeechWorker.speaking
+        self.ratio = ratio
+        self.warmup = warmup
+        self.tail = tail
+        self.half_life = half_life
+        self.clock = clock
+        self.level = 0.0
+        self.started = None  # When the current playback was first heard
+        self.heard = None    # When a chunk was last heard during playback
+        self.echoes = 0
+
+    def _playing(self, now):
+        if self.speaking.is_set():
+            if self.started is None:
+                self.started = now
+            return True
+        if self.heard is not None and now - self.heard < self.tail:
+            return True
+        self.started = None
+        return False
+
+    def hear(self, chunk, sample_width):
+        """Learn the playback level from one captured chunk; True if it may be the user speaking"""
+        now = self.clock()
+        if not self._playing(now):
+            return True
+        energy = audioop.rms(chunk, sample_width)
+        if self.heard is not None:
+            self.level *= 0.5 ** (min(now - self.heard, self.tail) / self.half_life)
+        self.heard = now
+        if now - self.started >= self.warmup and energy > self.level * self.ratio:
+            return True
+        self.level = max(self.level, energy)
+        self.echoes += 1
+        return False
+
+
+class SpeechWorker:
+    """Owns the single pyttsx3 engine on a background thread fed by a priority queue"""
+
+    def __init__(self, rate=180, volume=0.9, phrase_cache=None, player=None, speculative_limit=4):
+        self.rate = rate
+        self.volume = volume
+        self.speculative_limit = speculative_limit
+        self._speculative = collections.OrderedDict()  # Text -> path; only the worker thread touches it
+        self._speculative_dir = None
+        self.player = player or WavPlayer()
+        # Without a way to play files every phrase is synthesized live
+        self.phrases = phrase_cache if self.player.available else None
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()  # Keeps equal-priority phrases in FIFO order
+        self._thread = None
+        self._lock = threading.Lock()
+        self._engine = None
+        self._voice = None
+        self._generation = 0  # Bumped by interrupt(); older phrases are dropped
+        self._playing = None
+        self.speaking = threading.Event()
+
+    def start(self):
+        """Start the worker thread if it isn't already running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="speech-output", daemon=True)
+                self._thread.start()
+        return self
+
+    def _put(self, priority, action, text, done=None):
+        self._queue.put((priority, next(self._order), action, text, done, self._generation))
+
+    def _run(self):
+        # pyttsx3 drivers must be created and driven from the same thread
+        import pyttsx3
+        engine = pyttsx3.init()
+        engine.setProperty('rate', self.rate)  # Slower, clearer speech
+        engine.setProperty('volume', self.volume)
+        engine.connect('started-word', self._on_word)
+        self._engine = engine
+        self._voice = engine.getProperty('voice')
+
+        while True:
+            _, _, action, text, done, generation = self._queue.get()
+            try:
+                if action == STOP:
+                    return
+                if action == RENDER:
+                    self._render(text)
+                    continue
+                if action == SPECULATIVE:
+                    self._render_speculative(text)
+                    continue
+                if action == MARK:
+                    continue
+                if generation != self._generation:
+                    continue
+                self._playing = generation
+                self.speaking.set()
+                cached = self.phrases and self.phrases.get(text, self._voice, self.rate, self.volume)
+                speculative = None if cached else self._speculative.pop(text, None)
+                with metrics.span('speak', source='cache' if cached or speculative else 'live'):
+                    if cached or speculative:
+                        self.player.play(cached or speculative)
+                    else:
+                        engine.say(text)
+                        engine.runAndWait()
+                if speculative:
+                    self._remove(speculative)
+            except Exception as e:
+                print(f"🚨 Speech error: {e}")
+            finally:
+                self._playing = None
+                self.speaking.clear()
+                if done is not None:
+                    done.set()
+                self._queue.task_done()
+
+    def _render(self, text, path=None):
+        """Render text to path (its phrase cache file by default); True once the file is there"""
+        path = path or self.phrases.path(text, self._voice, self.rate, self.volume)
+        if os.path.exists(path):
+            return True
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = path[:-len('.wav')] + '.part.wav'  # Drivers pick the format from the extension
+        self._engine.save_to_file(text, partial)
+        self._engine.runAndWait()
+        if os.path.exists(partial) and os.path.getsize(partial) > 0:
+            os.replace(partial, path)
+            return True
+        return False
+
+    def _render_speculative(self, text):
+        """Render a reply that may never be said, keeping only the latest few
+
+        Such replies (the time, the date) rarely repeat, so they stay out of
+        the phrase cache. Each file is deleted once spoken or crowded out.
+        """
+        if text in self._speculative or os.path.exists(self.phrases.path(text, self._voice, self.rate, self.volume)):
+            return
+        if self._speculative_dir is None:
+            self._speculative_dir = os.path.join(self.phrases.directory, 'speculative')
+            shutil.rmtree(self._speculative_dir, ignore_errors=True)  # Left over from an earlier run
+        name = os.path.basename(self.phrases.path(text, self._voice, self.rate, self.volume))
+        path = os.path.join(self._speculative_dir, name)
+        if not self._render(text, path):
+            return
+        self._speculative[text] = path
+        while len(self._speculative) > self.speculative_limit:
+            self._remove(self._speculative.popitem(last=False)[1])
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _on_word(self, name, location, length):
+        # Runs on the worker thread between words, so stopping here is safe
+        if self._playing is not None and self._playing != self._generation:
+            self._engine.stop()
+
+    def say(self, text, priority=NORMAL, block=False):
+        """Queue text for speaking; returns an Event set once it has been spoken"""
+        self.start()
+        done = threading.Event()
+        self._put(priority, SAY, text, done)
+        if block:
+            done.wait()
+        return done
+
+    def prerender(self, phrases, speculative=False):
+        """Render fixed phrases to the phrase cache in the background
+
+        speculative=True is for replies rendered ahead of a command that may
+        not come: they are kept only until spoken, and only the latest few.
+        """
+        if self.phrases is None:
+            return
+        self.start()
+        for text in dict.fromkeys(phrases):
+            self._put(BACKGROUND, SPECULATIVE if speculative else RENDER, text)
+
+    def cached(self, text):
+        """Path of a finished render of text, or None (renders need the worker running)"""
+        if self.phrases is None or self._voice is None:
+            return None
+        return self.phrases.get(text, self._voice, self.rate, self.volume)
+
+    def flush(self):
+        """Drop everything that is queued but not yet being spoken; returns how many"""
+        kept = []
+        dropped = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[2] in (SAY, MARK):
+                dropped += item[2] == SAY
+                if item[4] is not None:
+                    item[4].set()
+            else:
+                kept.append(item)  # Renders and a pending shutdown survive a flush
+            self._queue.task_done()
+        for item in kept:
+            self._queue.put(item)
+        return dropped
+
+    def interrupt(self):
+        """Barge-in: flush the queue and cut off the phrase currently playing"""
+        was_speaking = self.speaking.is_set()
+        self._generation += 1
+        dropped = self.flush()
+        if was_speaking:
+            self.player.stop()
+        return was_speaking or dropped > 0
+
+    def wait(self):
+        """Block until everything queued has been spoken (background renders excluded)"""
+        if self._thread is not None:
+            done = threading.Event()
+            self._put(BACKGROUND - 1, MARK, None, done)
+            done.wait()
+
+    def shutdown(self, flush=False):
+        """Stop the worker after the queue drains (or immediately with flush=True)"""
+        if self._thread is None:
+            return
+        if flush:
+            self.interrupt()
+        self._put(BACKGROUND + 1, STOP, None)
+        self._thread.join()
+        self._thread = None
@@ -0,0 +1,158 @@
+import collections
+
+import numpy as np
+
+from pipeline import PREALLOCATE_SECONDS, PhraseBuffer
+
+
+class VadSegmenter:
+    """Streaming energy + zero-crossing VAD with an adaptive noise floor
+
+    Drop-in replacement for pipeline.EnergySegmenter. Audio is analysed in
+    short frames, the noise floor is tracked continuously (no up-front
+    calibration), and the end of a phrase is declared after a short silence
+    when the level has clearly dropped back to the floor, or after a longer
+    one when it is only hovering just above it.
+    """
+
+    def __init__(self, sample_rate, sample_width, frame_ms=20, onset_db=9.0, offset_db=3.0,
+                 min_speech=0.06, min_silence=0.4, max_silence=0.8, padding=0.15,
+                 phrase_time_limit=15, min_phrase=0.2, gap_factor=1.3):
+        if sample_width != 2:
+            raise ValueError("VadSegmenter expects 16-bit PCM audio")
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.frame_seconds = self.frame_len / sample_rate
+        self.onset_db = onset_db      # Level above the noise floor that counts as speech
+        self.offset_db = offset_db    # Below this margin the speaker has clearly stopped
+        self.min_speech_frames = max(1, round(min_speech / self.frame_seconds))
+        self.min_silence_frames = max(1, round(min_silence / self.frame_seconds))
+        self.max_silence_frames = max(1, round(max_silence / self.frame_seconds))
+        self.padding_frames = max(0, round(padding / self.frame_seconds))
+        self.gap_factor = gap_factor  # Silence needed, relative to the longest pause so far
+        self.phrase_time_limit = phrase_time_limit
+        self.min_phrase_frames = max(1, round(min_phrase / self.frame_seconds))
+        self.noise_floor = None  # dBFS, learnt from the first frames and tracked from then on
+        self.reset()
+
+    def reset(self):
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._preroll = collections.deque(maxlen=self.padding_frames + self.min_speech_frames)
+        # The phrase's samples, copied once from the analysed frames and handed off as a view
+        self.buffer = PhraseBuffer(int(PREALLOCATE_SECONDS * self.sample_rate) * self.sample_width)
+        self.in_phrase = False
+        self.speech_run = 0
+        self.quiet_run = 0  # Frames clearly back at the floor
+        self.soft_run = 0   # Frames merely below the onset level
+        self.speech_frames = 0
+        self.longest_gap = 0  # Longest pause inside the current phrase, in frames
+        self.clock = 0.0
+        self.phrase_start = 0.0
+        self.speech_end = 0.0
+
+    def analyse(self, samples):
+        """Per-frame level (dBFS) and zero-crossing rate for a whole number of frames"""
+        frames = samples.reshape(-1, self.frame_len).astype(np.float32) / 32768.0
+        power = np.mean(frames * frames, axis=1)
+        level = 10.0 * np.log10(power + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.frame_len
+        return level, zcr
+
+    def _track_floor(self, level):
+        if self.noise_floor is None:
+            self.noise_floor = level
+        elif level < self.noise_floor:
+            self.noise_floor += 0.3 * (level - self.noise_floor)   # Fall quickly
+        else:
+            self.noise_floor += 0.005 * (level - self.noise_floor)  # Rise slowly
+
+    def feed(self, chunk):
+        """Consume one chunk; returns ('start', None), ('phrase', frames) or (None, None)"""
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        if self._pending.size:
+            samples = np.concatenate((self._pending, samples))
+        usable = samples.size - samples.size % self.frame_len
+        self._pending = samples[usable:]
+        if not usable:
+            return None, None
+        levels, zcrs = self.analyse(samples[:usable])
+        frames = samples[:usable].reshape(-1, self.frame_len)
+
+        result = (None, None)
+        for i, (frame, level, zcr) in enumerate(zip(frames, levels, zcrs)):
+            event = self._step(frame, float(level), float(zcr))
+            if event[0] == 'phrase':
+                # Hold the rest of the chunk back for the next phrase search
+                self._pending = np.concatenate((frames[i + 1:].ravel(), self._pending))
+                return event
+            if event[0] == 'start':
+                result = event
+        return result
+
+    def _step(self, frame, level, zcr):
+        self.clock += self.frame_seconds
+        if self.noise_floor is None:
+            self.noise_floor = level
+        margin = level - self.noise_floor
+        # Unvoiced consonants are quiet but noisy; count them when the level is borderline
+        speechy = margin > self.onset_db or (margin > self.onset_db / 2 and 0.25 < zcr < 0.6)
+
+        if not self.in_phrase:
+            self._preroll.append(frame)
+            self.speech_run = self.speech_run + 1 if speechy else 0
+            if not speechy:
+                self._track_floor(level)
+            if self.speech_run >= self.min_speech_frames:
+                self.in_phrase = True
+                for frame in self._preroll:
+                    self.buffer.write(frame)
+                self._preroll.clear()
+                self.phrase_start = self.clock - self.speech_run * self.frame_seconds
+                self.speech_frames = self.speech_run
+                self.quiet_run = self.soft_run = self.longest_gap = 0
+                return 'start', None
+            return None, None
+
+        self.buffer.write(frame)
+        if speechy:
+            self.speech_frames += 1
+            self.longest_gap = max(self.longest_gap, self.soft_run)
+            self.quiet_run = self.soft_run = 0
+            self.speech_end = self.clock
+        else:
+            self.soft_run += 1
+            self.quiet_run = self.quiet_run + 1 if margin < self.offset_db else 0
+            self._track_floor(level)
+
+        # Confident endpoint: back at the floor for clearly longer than this speaker's own pauses
+        needed = min(self.max_silence_frames, max(self.min_silence_frames, int(self.gap_factor * self.longest_gap)))
+        if self.quiet_run >= needed or self.soft_run >= self.max_silence_frames:
+            return self._finish()
+        if self.phrase_time_limit and self.clock - self.phrase_start > self.phrase_time_limit:
+            return self._finish()
+        return None, None
+
+    def flush(self):
+        """End of stream: emit the next phrase still buffered, if any"""
+        if self._pending.size >= self.frame_len:
+            event = self.feed(b"")
+            if event[0] == 'phrase':
+                return event
+        if self.in_phrase:
+            return self._finish()
+        return None, None
+
+    def _finish(self):
+        # Keep a little trailing audio after the last speech frame
+        trailing = self.soft_run - self.padding_frames
+        if trailing > 0:
+            self.buffer.truncate(len(self.buffer) - trailing * self.frame_len * self.sample_width)
+        speech_frames = self.speech_frames
+        self.in_phrase = False
+        self.speech_run = self.quiet_run = self.soft_run = 0
+        if speech_frames < self.min_phrase_frames:
+            self.buffer.clear()
+            return None, None  # A click or a cough
+        return 'phrase', self.buffer.take()
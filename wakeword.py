@@ -0,0 +1,260 @@
+"""Wake-word gate in front of the recognizer chain
+
+    python wakeword.py enroll --count 3            # say the wake word three times
+    python wakeword.py enroll --wavs a.wav b.wav   # or enroll from recordings
+
+Enrolled utterances are kept as MFCC templates. A phrase passes the gate
+when its beginning matches a template under dynamic time warping. The rest
+of that phrase, or the next phrase if the wake word was said on its own, is
+what gets recognized.
+"""
+import argparse
+import functools
+import os
+
+import numpy as np
+
+from lazy import LazyModule
+from tts import CACHE_ROOT
+
+sr = LazyModule('speech_recognition')
+clips = LazyModule('clips')
+
+TEMPLATES_PATH = os.path.join(CACHE_ROOT, 'wakeword.npz')
+
+# Used when a single template gives no spread to calibrate against
+DEFAULT_THRESHOLD = 6.0
+
+
+@functools.lru_cache(maxsize=8)
+def mel_filterbank(n_mels, n_fft, sample_rate):
+    def to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def to_hz(mel):
+        return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+    points = to_hz(np.linspace(to_mel(60.0), to_mel(sample_rate / 2), n_mels + 2))
+    bins = np.floor((n_fft + 1) * points / sample_rate).astype(int)
+    bank = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for m in range(1, n_mels + 1):
+        left, centre, right = bins[m - 1], bins[m], bins[m + 1]
+        if centre > left:
+            bank[m - 1, left:centre] = (np.arange(left, centre) - left) / (centre - left)
+        if right > centre:
+            bank[m - 1, centre:right] = (right - np.arange(centre, right)) / (right - centre)
+    return bank
+
+
+@functools.lru_cache(maxsize=8)
+def dct_matrix(n_in, n_out):
+    n = np.arange(n_in)
+    return np.cos(np.pi / n_in * (n + 0.5)[None, :] * np.arange(n_out)[:, None]).astype(np.float32)
+
+
+def mfcc(samples, sample_rate, n_mfcc=13, n_mels=26, frame_ms=25, hop_ms=10):
+    """MFCC frames (c1..c12, without the loudness term c0) of int16 samples"""
+    x = samples.astype(np.float32) / 32768.0
+    x = np.append(x[:1], x[1:] - 0.97 * x[:-1])  # Pre-emphasis
+    frame = int(sample_rate * frame_ms / 1000)
+    hop = int(sample_rate * hop_ms / 1000)
+    if len(x) < frame:
+        x = np.pad(x, (0, frame - len(x)))
+    count = 1 + (len(x) - frame) // hop
+    frames = x[np.arange(frame)[None, :] + hop * np.arange(count)[:, None]] * np.hamming(frame).astype(np.float32)
+    n_fft = 1 << (frame - 1).bit_length()
+    power = np.abs(np.fft.rfft(frames, n_fft)) ** 2 / n_fft
+    energies = np.log(power @ mel_filterbank(n_mels, n_fft, sample_rate).T + 1e-10)
+    return (energies @ dct_matrix(n_mels, n_mfcc).T)[:, 1:]
+
+
+def dtw_prefix(template, features, min_ratio=0.6, max_ratio=1.5):
+    """(cost, frames) of the template against the best-matching prefix of features
+
+    Symmetric steps, cost normalized by path length. The prefix may be
+    between min_ratio and max_ratio times the template's length.
+    """
+    rows = len(template)
+    cols = min(len(features), int(rows * max_ratio) + 1)
+    first = max(1, int(np.ceil(rows * min_ratio)))
+    if cols < first:
+        return np.inf, 0
+    cost = np.sqrt(((template[:, None, :] - features[None, :cols, :]) ** 2).sum(axis=2))
+    previous = np.full(cols + 1, np.inf)
+    previous[0] = 0.0
+    for i in range(rows):
+        # D[i, j] = c[j] + min(D[i-1, j], D[i-1, j-1], D[i, j-1]), the last term as a running minimum
+        from_above = np.minimum(previous[1:], previous[:-1])
+        running = np.cumsum(cost[i])
+        row = running + np.minimum.accumulate(from_above - (running - cost[i]))
+        previous = np.concatenate(([np.inf], row))
+    totals = previous[first:] / (rows + np.arange(first, cols + 1))
+    best = int(np.argmin(totals))
+    return float(totals[best]), first + best
+
+
+class TemplateDetector:
+    """Matches the start of a phrase against enrolled MFCC templates"""
+
+    def __init__(self, templates, threshold=DEFAULT_THRESHOLD, sample_rate=16000):
+        self.templates = [np.asarray(t, dtype=np.float32) for t in templates]
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.longest = max(len(t) for t in self.templates)
+
+    @classmethod
+    def enroll(cls, clips, sample_rate, margin=1.0):
+        """Build templates from int16 clips; the threshold comes from how much they differ
+
+        A live phrase is scored against its nearest template, which is usually
+        closer than the average pair of enrolled takes, so that average is
+        already a generous threshold.
+        """
+        templates = [mfcc(clip, sample_rate) for clip in clips]
+        spread = [dtw_prefix(a, b, 0.5, 2.0)[0] for i, a in enumerate(templates) for b in templates[i + 1:]]
+        threshold = margin * sum(spread) / len(spread) if spread else DEFAULT_THRESHOLD
+        return cls(templates, threshold, sample_rate)
+
+    def save(self, path=TEMPLATES_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, *self.templates, threshold=self.threshold, sample_rate=self.sample_rate)
+
+    @classmethod
+    def load(cls, path=TEMPLATES_PATH):
+        with np.load(path) as data:
+            templates = [data[key] for key in sorted(data.files) if key.startswith('arr_')]
+            return cls(templates, float(data['threshold']), int(data['sample_rate']))
+
+    def score(self, samples, sample_rate):
+        """(cost, end sample) of the best template match at the start of samples"""
+        if sample_rate != self.sample_rate:
+            raise ValueError(f"Templates were enrolled at {self.sample_rate} Hz, got {sample_rate} Hz")
+        # Only the opening of the phrase can hold the wake word
+        hop = sample_rate // 100
+        head = samples[:int((self.longest * 1.5 + 3) * hop)]
+        features = mfcc(head, sample_rate)
+        best = (np.inf, 0)
+        for template in self.templates:
+            best = min(best, dtw_prefix(template, features))
+        return best[0], best[1] * hop
+
+    def match(self, samples, sample_rate):
+        """(matched, end sample of the wake word)"""
+        cost, end = self.score(samples, sample_rate)
+        return cost <= self.threshold, end
+
+
+class SphinxKeyphrase:
+    """Offline CMU Sphinx keyphrase search as the wake-word detector (needs pocketsphinx)"""
+
+    # On speech_recognition's 0-1 scale; the keyphrase threshold becomes 1e(100 * sensitivity - 110), so
+    # 0.85 is 1e-25, in the 1e-30..1e-20 range Sphinx suggests for a three-syllable phrase like "computer"
+    def __init__(self, recognizer, phrase, sensitivity=0.85):
+        self.recognizer = recognizer
+        self.phrase = phrase.lower()
+        self.sensitivity = sensitivity
+
+    def match(self, samples, sample_rate):
+        audio = clips.Clip(memoryview(samples).cast('B'), sample_rate, 2)
+        try:
+            decoder = self.recognizer.recognize_sphinx(
+                audio, keyword_entries=[(self.phrase, self.sensitivity)], show_all=True)
+        except sr.UnknownValueError:
+            return False, 0
+        if decoder.hyp() is None:
+            return False, 0  # The keyphrase wasn't heard; pocketsphinx 5 has no segments to list then
+        for segment in decoder.seg() or ():
+            if segment.word.strip().lower() == self.phrase:
+                end_frame = getattr(segment, 'end_frame', None)
+                if end_frame is None:
+                    end_frame = segment.end
+                return True, (end_frame + 1) * sample_rate // 100  # Sphinx frames are 10 ms
+        return False, 0
+
+
+class WakeGate:
+    """Lets a phrase through to recognition only after the wake word
+
+    "computer, open youtube" passes as "open youtube". A lone "computer"
+    arms the gate so the next phrase, if it starts within `window` seconds,
+    passes whole.
+    """
+
+    def __init__(self, detector, window=8.0, min_command=0.3, on_wake=None):
+        self.detector = detector
+        self.window = window
+        self.min_command = min_command
+        self.on_wake = on_wake
+        self.armed_until = None
+        self.admitted = self.blocked = self.woken = 0
+
+    def admit(self, audio, started, ended):
+        """AudioData to recognize, or None to drop the phrase"""
+        if self.armed_until is not None:
+            armed, self.armed_until = self.armed_until, None
+            if started <= armed:
+                self.admitted += 1
+                return audio
+
+        audio = clips.Clip.of(audio)
+        # Templates only compare at the rate they were enrolled at; microphones mostly run at 44.1 or 48 kHz
+        rate = getattr(self.detector, 'sample_rate', audio.sample_rate)
+        samples = np.frombuffer(audio.get_raw_data(convert_rate=rate, convert_width=2), dtype=np.int16)
+        matched, end = self.detector.match(samples, rate)
+        if not matched:
+            self.blocked += 1
+            return None
+        self.woken += 1
+        if len(samples) - end < self.min_command * rate:
+            # Just the wake word: wait for the command
+            self.armed_until = ended + self.window
+            if self.on_wake is not None:
+                self.on_wake()
+            return None
+        self.admitted += 1
+        return audio.tail(end * audio.sample_rate // rate)
+
+    def stats(self):
+        return {'admitted': self.admitted, 'blocked': self.blocked, 'woken': self.woken}
+
+
+def record_clips(count):
+    """Record count utterances from the default microphone as int16 arrays"""
+    recognizer = sr.Recognizer()
+    clips = []
+    with sr.Microphone(sample_rate=16000) as source:
+        recognizer.adjust_for_ambient_noise(source, duration=1)
+        for i in range(count):
+            print(f"🎙 Say the wake word ({i + 1}/{count})...")
+            audio = recognizer.listen(source, timeout=10, phrase_time_limit=3)
+            clips.append(np.frombuffer(audio.get_raw_data(convert_rate=16000, convert_width=2), dtype=np.int16))
+    return clips, 16000
+
+
+def read_clips(paths):
+    recognizer = sr.Recognizer()
+    clips = []
+    for path in paths:
+        with sr.AudioFile(path) as source:
+            audio = recognizer.record(source)
+        clips.append(np.frombuffer(audio.get_raw_data(convert_rate=16000, convert_width=2), dtype=np.int16))
+    return clips, 16000
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Enroll the wake word used to gate recognition")
+    commands = parser.add_subparsers(dest='command', required=True)
+    enroll = commands.add_parser('enroll')
+    enroll.add_argument('--count', type=int, default=3, help="Recordings to take from the microphone")
+    enroll.add_argument('--wavs', nargs='+', help="Enroll from these recordings instead")
+    enroll.add_argument('--output', default=TEMPLATES_PATH)
+    args = parser.parse_args()
+
+    clips, sample_rate = read_clips(args.wavs) if args.wavs else record_clips(args.count)
+    detector = TemplateDetector.enroll(clips, sample_rate)
+    detector.save(args.output)
+    print(f"✅ Enrolled {len(clips)} templates (threshold {detector.threshold:.2f}) in {args.output}")
+
+
+if __name__ == "__main__":
+    cli()